@@ -0,0 +1,65 @@
+# Copyright 2013 MakerBot Industries
+
+import atexit
+import threading
+import time
+
+import build_hooks
+import persistent
+
+'''
+How long building each target took the last time it was built.
+
+Once recording is enabled, every task that actually runs is timed, and its
+duration is stored for all of its targets in the project's .mb_cache.
+Targets that were retrieved from a build cache are not recorded, their
+retrieval time says nothing about the action.
+'''
+
+NAME = 'action_durations'
+
+_lock = threading.Lock()
+# absolute target path -> seconds
+_durations = None
+_path = None
+_dirty = False
+_recording = False
+
+def _load(env):
+    global _durations, _path
+    if _durations is None:
+        _path = persistent.cache_path(env, NAME)
+        _durations = persistent.load(_path, {})
+    return _durations
+
+def _save():
+    global _dirty
+    if _dirty:
+        with _lock:
+            persistent.save(_path, _durations)
+            _dirty = False
+
+def _record(task, execute):
+    global _dirty
+    start = time.time()
+    result = execute()
+    seconds = time.time() - start
+    if not any(getattr(t, 'cached', 0) for t in task.targets):
+        with _lock:
+            for t in task.targets:
+                _durations[t.get_abspath()] = seconds
+            _dirty = True
+    return result
+
+def durations(env):
+    ''' Returns the recorded durations by absolute target path '''
+    return _load(env)
+
+def record(env):
+    ''' Time every task run from now on '''
+    global _recording
+    if not _recording:
+        _recording = True
+        _load(env)
+        build_hooks.add(_record)
+        atexit.register(_save)
@@ -0,0 +1,230 @@
+# Copyright 2013 MakerBot Industries
+
+import atexit
+import errno
+import os
+import threading
+import time
+
+import SCons.CacheDir
+import SCons.Defaults
+import SCons.Errors
+
+import action_durations
+import persistent
+import remote_cache
+
+'''
+A size capped CacheDir shared between builds, for --build-cache.
+
+Every derived file SCons builds is pushed into the cache under its build
+signature, and retrieved instead of being built again when the signature
+matches. Entries are touched when they are retrieved, so their mtime is
+the last time they were used. When a build pushed anything, the least
+recently used entries are removed at the end until the cache is below
+LOW_WATER of its maximum size. Only one build at a time evicts, the others
+skip it.
+
+With --build-cache-remote, the local cache is backed by a cache server,
+see remote_cache.py.
+
+Hits, misses and the bytes that came from the cache are counted and
+printed at the end, with the build time the hits saved according to
+action_durations.
+'''
+
+DEFAULT_MAX_SIZE = '10G'
+
+# Local cache for a remote one, when no --build-cache is given
+NAME = 'build_cache'
+
+# Evicting down to below the maximum leaves room for the next builds to
+# push without evicting again right away
+LOW_WATER = 0.9
+
+LOCK_NAME = 'mb_eviction.lock'
+# An eviction lock older than this was left by a build that died
+STALE_LOCK_SECONDS = 60 * 60
+
+_UNITS = {'': 1, 'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3, 'T': 1024 ** 4}
+
+_lock = threading.Lock()
+_stats = {
+    'hits': 0,
+    'misses': 0,
+    'bytes_retrieved': 0,
+    'bytes_pushed': 0,
+    'seconds_saved': 0.0,
+}
+_path = None
+_max_size = None
+_durations = {}
+_original_retrieve = None
+_original_push = None
+
+def parse_size(text):
+    ''' Returns the bytes in a size like 500M or 10G '''
+    size = text.strip().upper()
+    if size.endswith('B'):
+        size = size[:-1]
+    unit = size[-1:] if size[-1:] in _UNITS else ''
+    number = size[:len(size) - len(unit)]
+    try:
+        size = float(number) * _UNITS[unit]
+    except ValueError:
+        raise SCons.Errors.UserError(
+            'Not a size, use something like 500M or 10G: ' + repr(text))
+    return int(size)
+
+def _megabytes(size):
+    return '{:.1f} MiB'.format(size / float(1024 ** 2))
+
+def _touch(path):
+    try:
+        os.utime(path, None)
+    except OSError:
+        pass
+
+def _retrieve(self, node):
+    if self.is_enabled():
+        remote_cache.fetch(self.cachepath(node)[1])
+    hit = _original_retrieve(self, node)
+    if not self.is_enabled():
+        return hit
+    if not hit:
+        with _lock:
+            _stats['misses'] += 1
+        return hit
+    cachefile = self.cachepath(node)[1]
+    _touch(cachefile)
+    try:
+        size = os.path.getsize(cachefile)
+    except OSError:
+        size = 0
+    with _lock:
+        _stats['hits'] += 1
+        _stats['bytes_retrieved'] += size
+        _stats['seconds_saved'] += _durations.get(node.get_abspath(), 0.0)
+    return hit
+
+def _push(self, node):
+    result = _original_push(self, node)
+    if self.is_enabled() and not node.nocache:
+        cachefile = self.cachepath(node)[1]
+        try:
+            size = os.path.getsize(cachefile)
+        except OSError:
+            size = 0
+        with _lock:
+            _stats['bytes_pushed'] += size
+        remote_cache.upload(cachefile)
+    return result
+
+def _entries(path):
+    ''' Yields (mtime, size, path) of everything in the cache '''
+    for subdir in os.listdir(path):
+        subdir = os.path.join(path, subdir)
+        if not os.path.isdir(subdir):
+            continue
+        for name in os.listdir(subdir):
+            # Pushes in progress
+            if '.tmp' in name:
+                continue
+            entry = os.path.join(subdir, name)
+            try:
+                st = os.lstat(entry)
+            except OSError:
+                continue
+            yield st.st_mtime, st.st_size, entry
+
+def _take_lock(path):
+    lock_path = os.path.join(path, LOCK_NAME)
+    for attempt in range(2):
+        try:
+            os.close(os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            return lock_path
+        except OSError as e:
+            if e.errno != errno.EEXIST:
+                return None
+        try:
+            if time.time() - os.path.getmtime(lock_path) < STALE_LOCK_SECONDS:
+                return None
+            os.remove(lock_path)
+        except OSError:
+            pass
+    return None
+
+def evict(path, max_size):
+    ''' Remove the least recently used entries of the cache at path, if
+        it is over max_size. Returns (entries, bytes) removed. '''
+    if not os.path.isdir(path):
+        return 0, 0
+    lock_path = _take_lock(path)
+    if lock_path is None:
+        return 0, 0
+    try:
+        entries = sorted(_entries(path))
+        total = sum(size for mtime, size, entry in entries)
+        if total <= max_size:
+            return 0, 0
+        goal = max_size * LOW_WATER
+        removed = removed_bytes = 0
+        for mtime, size, entry in entries:
+            if total <= goal:
+                break
+            try:
+                os.remove(entry)
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+            removed_bytes += size
+        return removed, removed_bytes
+    finally:
+        try:
+            os.remove(lock_path)
+        except OSError:
+            pass
+
+def _finish():
+    hits = _stats['hits']
+    misses = _stats['misses']
+    if hits + misses:
+        print('Build cache: {} hits, {} misses, {}% hit rate, {} retrieved '
+              '(about {:.0f}s of building saved), {} pushed'.format(
+                hits, misses, 100 * hits // (hits + misses),
+                _megabytes(_stats['bytes_retrieved']),
+                _stats['seconds_saved'],
+                _megabytes(_stats['bytes_pushed'])))
+    if _stats['bytes_pushed']:
+        removed, removed_bytes = evict(_path, _max_size)
+        if removed:
+            print('Build cache: removed {} least recently used entries ({}) '
+                  'to stay below {}'.format(
+                    removed, _megabytes(removed_bytes),
+                    _megabytes(_max_size)))
+
+def default_path(env):
+    ''' The project's own cache directory '''
+    return persistent.cache_path(env, NAME)
+
+def setup(env, path, max_size):
+    ''' Cache derived files in the directory path, keeping it below
+        max_size bytes '''
+    global _path, _max_size, _durations
+    global _original_retrieve, _original_push
+    path = env.Dir(path).abspath
+    SCons.Defaults.DefaultEnvironment().CacheDir(path)
+    env.CacheDir(path)
+    if _original_retrieve is not None:
+        return
+    _path = path
+    _max_size = max_size
+    # For the time saved by hits
+    action_durations.record(env)
+    _durations = action_durations.durations(env)
+    _original_retrieve = SCons.CacheDir.CacheDir.retrieve
+    _original_push = SCons.CacheDir.CacheDir.push
+    SCons.CacheDir.CacheDir.retrieve = _retrieve
+    SCons.CacheDir.CacheDir.push = _push
+    atexit.register(_finish)
@@ -0,0 +1,36 @@
+# Copyright 2013 MakerBot Industries
+
+import SCons.Script.Main
+
+'''
+Hooks around the execution of each build task.
+
+SCons has no extension point for this, so the first hook that is added
+replaces BuildTask.execute. Hooks run in the order they were added, each
+one wrapping the ones added after it. Nothing is replaced until a hook is
+added, so features that aren't turned on cost nothing.
+'''
+
+_hooks = []
+_original_execute = None
+
+def _execute(task):
+    def call(index):
+        if index == len(_hooks):
+            return _original_execute(task)
+        return _hooks[index](task, lambda: call(index + 1))
+    return call(0)
+
+def add(hook):
+    ''' Call hook(task, execute) instead of executing each build task
+
+        The hook has to call execute() to actually run the task, and
+        should pass on its return value and exceptions. Adding the same
+        hook twice does nothing. '''
+    global _original_execute
+    if hook in _hooks:
+        return
+    if _original_execute is None:
+        _original_execute = SCons.Script.Main.BuildTask.execute
+        SCons.Script.Main.BuildTask.execute = _execute
+    _hooks.append(hook)
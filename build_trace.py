@@ -0,0 +1,118 @@
+# Copyright 2013 MakerBot Industries
+
+import atexit
+import json
+import os
+import threading
+import time
+
+import build_hooks
+
+'''
+Records when every build action runs, for --build-trace.
+
+Each executed task becomes a complete ('X') event in Chrome's trace event
+format, which chrome://tracing and Perfetto can open. Every thread SCons
+runs tasks on (one per -j slot) gets its own row, so gaps in the rows show
+how well -j is used. Events are categorized by the builder that made the
+target, or by the program that ran for Command targets.
+
+The file is written when SCons exits.
+'''
+
+_lock = threading.Lock()
+_events = []
+# thread ident -> row in the trace
+_slots = {}
+_start_time = time.time()
+_path = None
+
+def _slot():
+    ident = threading.current_thread().ident
+    with _lock:
+        try:
+            return _slots[ident]
+        except KeyError:
+            slot = len(_slots)
+            _slots[ident] = slot
+            return slot
+
+def _microseconds(t):
+    return int((t - _start_time) * 1000000)
+
+def category(node):
+    ''' A short name for what building node does '''
+    builder = node.get_builder()
+    if builder is None:
+        return 'none'
+    env = node.get_env()
+    name = builder.get_name(env)
+    if name in env['BUILDERS']:
+        return name
+    # Command and friends: name the function or program that runs
+    executor = node.get_executor()
+    action = executor.get_action_list()[0]
+    function = getattr(action, 'execfunction', None)
+    if function is not None:
+        return getattr(function, '__name__', 'function')
+    try:
+        command = env.subst(
+            str(executor),
+            target=executor.get_all_targets(),
+            source=executor.get_all_sources())
+    except Exception:
+        return 'Command'
+    words = command.split()
+    if not words:
+        return 'Command'
+    return os.path.basename(words[0])
+
+def _trace(task, execute):
+    start = time.time()
+    failed = True
+    try:
+        result = execute()
+        failed = False
+        return result
+    finally:
+        end = time.time()
+        targets = [str(t) for t in task.targets]
+        event = {
+            'name': targets[0],
+            'cat': category(task.targets[0]),
+            'ph': 'X',
+            'ts': _microseconds(start),
+            'dur': _microseconds(end) - _microseconds(start),
+            'pid': 0,
+            'tid': _slot(),
+            'args': {'targets': targets},
+        }
+        if failed:
+            event['args']['failed'] = True
+        with _lock:
+            _events.append(event)
+
+def _write():
+    events = list(_events)
+    for ident, slot in _slots.items():
+        events.append({
+            'name': 'thread_name',
+            'ph': 'M',
+            'pid': 0,
+            'tid': slot,
+            'args': {'name': 'job {}'.format(slot)},
+        })
+    with open(_path, 'w') as trace_file:
+        json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'},
+                  trace_file)
+    print('Build trace with {} actions written to {}'.format(
+        len(_events), _path))
+
+def enable(path):
+    ''' Trace the build into path '''
+    global _path
+    if _path is not None:
+        return
+    _path = os.path.abspath(path)
+    build_hooks.add(_trace)
+    atexit.register(_write)
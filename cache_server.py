@@ -0,0 +1,130 @@
+# Copyright 2013 MakerBot Industries
+
+import argparse
+import os
+import re
+import threading
+
+try:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+except ImportError:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+
+'''
+A build cache server for --build-cache-remote, with nothing but the
+standard library.
+
+    python cache_server.py --directory /var/cache/mb-build --port 8080
+
+and build with --build-cache-remote=http://host:8080. Entries are stored
+as files named by their signature, GET returns one (or 404), PUT stores
+one. It doesn't evict anything, point a --build-cache-size limited build at
+the same directory or clean it from cron.
+
+There is no authentication, only run it on a trusted network.
+'''
+
+# Build signatures are hex MD5s, nothing else can name a file
+_KEY = re.compile('^/([0-9a-fA-F]{8,64})$')
+
+class CacheRequestHandler(BaseHTTPRequestHandler):
+    ''' GET and PUT of cache entries in self.server.directory '''
+
+    def _path(self):
+        match = _KEY.match(self.path)
+        if match is None:
+            return None
+        key = match.group(1)
+        # The same layout as a CacheDir
+        return os.path.join(self.server.directory, key[0].upper(), key)
+
+    def _reply(self, code, body=b''):
+        self.send_response(code)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if body and self.command != 'HEAD':
+            self.wfile.write(body)
+
+    def do_GET(self):
+        path = self._path()
+        if path is None:
+            return self._reply(400)
+        try:
+            with open(path, 'rb') as f:
+                body = f.read()
+        except (IOError, OSError):
+            return self._reply(404)
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/octet-stream')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(body)
+
+    do_HEAD = do_GET
+
+    def do_PUT(self):
+        path = self._path()
+        length = int(self.headers.get('Content-Length') or -1)
+        if path is None or length < 0:
+            return self._reply(400)
+        if length > self.server.max_entry_size:
+            return self._reply(413)
+        body = self.rfile.read(length)
+        directory = os.path.dirname(path)
+        if not os.path.isdir(directory):
+            try:
+                os.makedirs(directory)
+            except OSError:
+                pass
+        tempfile = '{}.tmp{}_{}'.format(
+            path, os.getpid(), threading.current_thread().ident)
+        try:
+            with open(tempfile, 'wb') as f:
+                f.write(body)
+            os.rename(tempfile, path)
+        except (IOError, OSError):
+            return self._reply(500)
+        self._reply(201)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            BaseHTTPRequestHandler.log_message(self, format, *args)
+
+class CacheServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, directory, max_entry_size, verbose=False):
+        HTTPServer.__init__(self, address, CacheRequestHandler)
+        self.directory = os.path.abspath(directory)
+        self.max_entry_size = max_entry_size
+        self.verbose = verbose
+
+def main():
+    parser = argparse.ArgumentParser(description='Serves a build cache')
+    parser.add_argument('--directory', required=True,
+                        help='where the entries are stored')
+    parser.add_argument('--host', default='127.0.0.1',
+                        help='address to listen on (default 127.0.0.1)')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--max-entry-size', type=int, default=1024 ** 3,
+                        help='biggest entry accepted, in bytes')
+    parser.add_argument('--verbose', action='store_true',
+                        help='log every request')
+    args = parser.parse_args()
+    server = CacheServer(
+        (args.host, args.port),
+        args.directory,
+        args.max_entry_size,
+        args.verbose)
+    print('Serving the build cache in {} on http://{}:{}'.format(
+        server.directory, args.host, args.port))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == '__main__':
+    main()
@@ -8,6 +8,13 @@ import string
 import sys
 import SCons
 
+sys.path.append(os.path.dirname(__file__))
+import compiler_features
+import dependencies
+import dir_index
+import persistent
+import pools
+
 '''
 Some conventions to keep this sane:
   * function definitions are in lowercase_with_underscores
@@ -38,6 +45,45 @@ MB_OPENMESH_32_LIBPATH = 'MB_OPENMESH_32_LIBPATH'
 MB_OPENMESH_32 = 'MB_OPENMESH_32'
 MB_THIRD_PARTY = 'MB_THIRD_PARTY'
 
+THIRD_PARTY_PATHS = [
+    MB_VTK_CPPPATH,
+    MB_VTK_LIBPATH,
+    MB_OPENCV_CPPPATH,
+    MB_OPENCV_LIBPATH,
+    MB_BOOST_CPPPATH,
+    MB_BOOST_LIBPATH,
+    MB_OPENMESH_CPPPATH,
+    MB_OPENMESH_LIBPATH,
+    MB_BOOST_64_CPPPATH,
+    MB_BOOST_64_LIBPATH,
+    MB_BOOST_32_CPPPATH,
+    MB_BOOST_32_LIBPATH,
+    MB_OPENMESH_64_CPPPATH,
+    MB_OPENMESH_64_LIBPATH,
+    MB_OPENMESH_64,
+    MB_OPENMESH_32_CPPPATH,
+    MB_OPENMESH_32_LIBPATH,
+    MB_OPENMESH_32,
+    MB_THIRD_PARTY]
+
+# A header that has to be found in an include path for it to be the right one
+_OPENMESH_HEADER = os.path.join('OpenMesh', 'Core', 'Mesh', 'PolyMeshT.hh')
+THIRD_PARTY_HEADERS = {
+    MB_VTK_CPPPATH: 'vtkVersion.h',
+    MB_OPENCV_CPPPATH: os.path.join('opencv2', 'core', 'core.hpp'),
+    MB_BOOST_CPPPATH: os.path.join('boost', 'version.hpp'),
+    MB_BOOST_64_CPPPATH: os.path.join('boost', 'version.hpp'),
+    MB_BOOST_32_CPPPATH: os.path.join('boost', 'version.hpp'),
+    MB_OPENMESH_CPPPATH: _OPENMESH_HEADER,
+    MB_OPENMESH_64_CPPPATH: _OPENMESH_HEADER,
+    MB_OPENMESH_32_CPPPATH: _OPENMESH_HEADER,
+}
+
+# Problems found with the third party paths, keyed by variable
+THIRD_PARTY_PATH_PROBLEMS = 'MB_THIRD_PARTY_PATH_PROBLEMS'
+
+THIRD_PARTY_CACHE_NAME = 'third_party_paths'
+
 # Set up command line args used by every scons script
 def common_arguments(env):
     env.MBAddOption(
@@ -47,6 +93,14 @@ def common_arguments(env):
         default=False,
         help='Builds in debug mode')
 
+    env.MBAddOption(
+        '--dependency-report',
+        dest='dependency_report',
+        action='store_true',
+        default=False,
+        help='Reports how much CPPPATH/LIBS/etc. were shortened by not '
+            'applying the same MBDependsOn* dependency twice.')
+
     env.MBAddOption(
         '--no-devel-libs',
         dest='devel_libs',
@@ -54,27 +108,18 @@ def common_arguments(env):
         default=True,
         help='Uses sibling repositories for libraries, rather than using installed libs.')
 
-    env_vars = [
-            MB_VTK_CPPPATH,
-            MB_VTK_LIBPATH,
-            MB_OPENCV_CPPPATH,
-            MB_OPENCV_LIBPATH,
-            MB_BOOST_CPPPATH,
-            MB_BOOST_LIBPATH,
-            MB_OPENMESH_CPPPATH,
-            MB_OPENMESH_LIBPATH,
-            MB_BOOST_64_CPPPATH,
-            MB_BOOST_64_LIBPATH,
-            MB_BOOST_32_CPPPATH,
-            MB_BOOST_32_LIBPATH,
-            MB_OPENMESH_64_CPPPATH,
-            MB_OPENMESH_64_LIBPATH,
-            MB_OPENMESH_64,
-            MB_OPENMESH_32_CPPPATH,
-            MB_OPENMESH_32_LIBPATH,
-            MB_OPENMESH_32,
-            MB_THIRD_PARTY]
-    for ev in env_vars:
+    env.MBAddOption(
+        '--pool',
+        dest='pools',
+        metavar='NAME:N',
+        type='string',
+        action='append',
+        default=[],
+        help='Runs at most N actions of pool NAME at once, e.g. link:2 or compile:16. '
+            'The link pool is sized from the available memory by default. '
+            'Can be given more than once.')
+
+    for ev in THIRD_PARTY_PATHS:
         flag = ev.lower()
         flag = re.sub('_', '-', flag)
         env.MBAddOption(
@@ -118,44 +163,79 @@ def mb_recursive_file_glob(env, root, pattern, exclude = None):
 
     If exclude is not None, it should be a glob pattern or list of
     glob patterns. Any results matching a glob in exclude will be
-    excluded from the returned list."""
-    def excluded(filename, exclude):
-        if exclude:
-            if isinstance(exclude, str):
-                exclude = [exclude]
-            for pattern in exclude:
-                if fnmatch.fnmatch(filename, pattern):
-                    return True
-        return False
-
-    matches = []
+    excluded from the returned list.
+
+    Directory listings come from the persistent directory index, so
+    only directories that changed since the last run are read again."""
     if root.startswith('#'):
         raise Exception('Directories starting with "#" not supported yet')
     project_root = env.Dir('#').abspath
-    for parent, dirnames, filenames in os.walk(os.path.join(
-            project_root, root)):
-        for filename in fnmatch.filter(filenames, pattern):
-            if not excluded(filename, exclude):
-                p = os.path.join(parent, filename)
-                rp = os.path.relpath(p, project_root)
-                matches.append(env.File(rp))
-    return matches
+    index = dir_index.get_index(env)
+    matches = index.recursive_glob(os.path.join(project_root, root),
+                                   pattern, exclude)
+    return [env.File(os.path.normpath(os.path.join(root, m))) for m in matches]
+
+# Directories that never hold python modules we want to package
+DEFAULT_PYTHON_GLOB_EXCLUDE_DIRS = ('.git', '__pycache__')
 
 # I'm not sure who made this, but we use it for all of our python globbing
-def mb_magic_python_glob(env, dir):
-    files = []
-    for curpath, dirnames, filenames in os.walk(str(env.Dir(dir))):
-        files.append(
-            filter(lambda f:
-                (os.path.exists(str(f)) and not os.path.isdir(str(f))),
-                env.Glob(os.path.join(curpath, '*.py'))))
-    return files
+def mb_magic_python_glob(env, dir, include='*.py', exclude=None,
+                         exclude_dirs=None):
+    """Recursively find the python files under 'dir'
+
+    Returns a sorted list of SCons.Node.FS.File nodes. 'include' and
+    'exclude' are glob patterns or lists of glob patterns matched
+    against file names. 'exclude_dirs' are matched against directory
+    names, and excluded directories are not descended into. It defaults
+    to DEFAULT_PYTHON_GLOB_EXCLUDE_DIRS.
+
+    The tree is walked once using the directory index, so the type
+    of each entry is known without another stat."""
+    def patterns(p):
+        if p is None:
+            return []
+        elif isinstance(p, str):
+            return [p]
+        return list(p)
+    include = patterns(include)
+    exclude = patterns(exclude)
+    if exclude_dirs is None:
+        exclude_dirs = DEFAULT_PYTHON_GLOB_EXCLUDE_DIRS
+    exclude_dirs = patterns(exclude_dirs)
+
+    def matches(name, globs):
+        return any(fnmatch.fnmatch(name, g) for g in globs)
+
+    base = env.Dir(dir)
+    # Walk the source directory so this also works from a variant dir
+    # before anything has been duplicated into it
+    root = base.srcnode().abspath
+    relpaths = []
+    for parent, dirnames, filenames in dir_index.get_index(env).walk(root):
+        dirnames[:] = [d for d in dirnames if not matches(d, exclude_dirs)]
+        relparent = os.path.relpath(parent, root)
+        for filename in filenames:
+            if (matches(filename, include) and
+                    not matches(filename, exclude)):
+                relpaths.append(os.path.normpath(
+                    os.path.join(relparent, filename)))
+    return [base.File(p) for p in sorted(relpaths)]
+
+def split_path(env, value):
+    ''' Break a path string on the path separator (either ':' or ';') '''
+    if env.MBIsWindows():
+        return value.split(';')
+    else:
+        return value.split(':')
 
 def mb_get_path(env, pathname):
     ''' Get a variable from the environment interpreted as a path.
 
         If it's a list return it as-is,
-        If it's a string break it on the path separator (either ':' or ';') '''
+        If it's a string break it on the path separator (either ':' or ';')
+
+        Third party paths that failed validation when they were configured
+        raise an error here, rather than failing later in the compile. '''
     var = env.GetOption(pathname)
 
     if None == var:
@@ -165,23 +245,23 @@ def mb_get_path(env, pathname):
             raise KeyError(
                 'This SConscript expects you to have an '
                 'environment variable ' + pathname + ' defined.')
+    problem = env.get(THIRD_PARTY_PATH_PROBLEMS, {}).get(pathname)
+    if problem is not None and problem[0] == repr(var):
+        raise SCons.Errors.UserError(problem[1])
     if SCons.Util.is_List(var):
         return var
     else:
-        if env.MBIsWindows:
-            return var.split(';')
-        else:
-            return value.split(':')
+        return split_path(env, var)
 
-def set_third_party_paths(env):
-    ''' Sets the default locations for third-party libs and headers.
+def third_party_defaults(env):
+    ''' Returns the default locations for third-party libs and headers.
 
         We assume that if anything is in a non-standard location the
         user has set the appropriate environment variable. '''
     e = os.environ
-    # SetDefault sets if the variable is not already set.
+    defaults = {}
     if env.MBIsMac():
-        env.SetDefault(
+        defaults.update(
             MB_VTK_CPPPATH =
                 e.get(MB_VTK_CPPPATH,
                 '/usr/local/vtk/include/vtk-5.10'),
@@ -207,7 +287,7 @@ def set_third_party_paths(env):
                 e.get(MB_OPENMESH_LIBPATH,
                 '/usr/local/openmesh-3.2/lib/OpenMesh'))
     elif env.MBIsLinux():
-        env.SetDefault(
+        defaults.update(
             MB_VTK_CPPPATH = e.get(MB_VTK_CPPPATH, []),
             MB_VTK_LIBPATH = e.get(MB_VTK_LIBPATH, []),
             MB_OPENCV_CPPPATH = e.get(MB_OPENCV_CPPPATH, []),
@@ -217,13 +297,13 @@ def set_third_party_paths(env):
             MB_OPENMESH_CPPPATH = e.get(MB_OPENMESH_CPPPATH, []),
             MB_OPENMESH_LIBPATH = e.get(MB_OPENMESH_LIBPATH, []))
     elif env.MBIsWindows():
-        env.SetDefault(
+        defaults.update(
             MB_THIRD_PARTY = e.get(MB_THIRD_PARTY, os.path.join(
                 'C:\\', 'third-party-win')))
         # This could probably be replaced with a scons variable like ${MB_THIRD_PARTY}
         # Which should then just be replaced correctly by scons
-        third_party_dir = env[MB_THIRD_PARTY]
-        env.SetDefault(
+        third_party_dir = env.get(MB_THIRD_PARTY, defaults[MB_THIRD_PARTY])
+        defaults.update(
             MB_VTK_CPPPATH = e.get(MB_VTK_CPPPATH, []),
             MB_VTK_LIBPATH = e.get(MB_VTK_LIBPATH, []),
             MB_OPENCV_CPPPATH = e.get(MB_OPENCV_CPPPATH, []),
@@ -250,21 +330,80 @@ def set_third_party_paths(env):
             MB_OPENMESH_32 =
                 e.get(MB_OPENMESH_32,
                 os.path.join(third_party_dir, 'OpenMesh-3.2', 'openmesh-32')))
+    return defaults
+
+def third_party_path_problem(env, name, value):
+    ''' Returns a description of what's wrong with a third party path,
+        or None if it looks usable.
+
+        Empty paths are fine, they mean "use the system location". '''
+    if not value:
+        return None
+    if not SCons.Util.is_List(value):
+        value = split_path(env, value)
+    value = [str(v) for v in SCons.Util.flatten(value) if v]
+    for path in value:
+        if not os.path.isdir(path):
+            return 'directory {} does not exist'.format(path)
+    header = THIRD_PARTY_HEADERS.get(name)
+    if header is not None:
+        if not any(os.path.isfile(os.path.join(p, header)) for p in value):
+            return '{} not found in {}'.format(header, os.pathsep.join(value))
+    elif name.endswith('_LIBPATH'):
+        if not any(os.listdir(p) for p in value):
+            return 'no libraries found in {}'.format(os.pathsep.join(value))
+    return None
 
-def mb_depends_on_openmesh(env):
+def set_third_party_paths(env):
+    ''' Sets the default locations for third-party libs and headers
+        and checks that the configured locations look right.
+
+        Both steps are cached in the project's .mb_cache, keyed on
+        everything they depend on: the MB_* variables in os.environ,
+        the matching command line options and anything already set on
+        the environment. They only run again when one of those
+        changes, or when a location failed the check, so fixing a
+        broken install is noticed on the next run. '''
+    inputs = repr((sys.platform,
+                   [os.environ.get(v) for v in THIRD_PARTY_PATHS],
+                   [env.GetOption(v) for v in THIRD_PARTY_PATHS],
+                   [env.get(v) for v in THIRD_PARTY_PATHS]))
+    cache_file = persistent.cache_path(env, THIRD_PARTY_CACHE_NAME)
+    cache = persistent.load(cache_file, {})
+    if cache.get('inputs') != inputs or cache.get('problems'):
+        defaults = third_party_defaults(env)
+        problems = {}
+        for name in THIRD_PARTY_PATHS:
+            value = env.GetOption(name)
+            if value is None:
+                value = env.get(name, defaults.get(name))
+            problem = third_party_path_problem(env, name, value)
+            if problem is not None:
+                problems[name] = (repr(value), '{} is set to {!r}, but {}. '
+                    'Set the {} environment variable or pass --{} to point '
+                    'at the right location.'.format(
+                        name, value, problem, name,
+                        name.lower().replace('_', '-')))
+        cache = {'inputs': inputs, 'defaults': defaults, 'problems': problems}
+        persistent.save(cache_file, cache)
+    # SetDefault sets if the variable is not already set.
+    env.SetDefault(**cache['defaults'])
+    env[THIRD_PARTY_PATH_PROBLEMS] = cache['problems']
+
+def add_openmesh_flags(env):
     libs = ['OpenMeshCore', 'OpenMeshTools']
 
     if env.MBIsWindows():
         bitness = '64' if env.MBWindowsIs64Bit() else '32'
-        env.Append(LIBPATH = env.MBGetPath('MB_OPENMESH_' + bitness + '_LIBPATH'))
-        env.Append(CPPPATH = env.MBGetPath('MB_OPENMESH_' + bitness + '_CPPPATH'))
+        env.AppendUnique(LIBPATH = env.MBGetPath('MB_OPENMESH_' + bitness + '_LIBPATH'))
+        env.AppendUnique(CPPPATH = env.MBGetPath('MB_OPENMESH_' + bitness + '_CPPPATH'))
         env.Append(CPPDEFINES = '_USE_MATH_DEFINES')
 
         if env.MBDebugBuild():
             libs = [lib + 'd' for lib in libs]
     else:
-        env.Append(LIBPATH = env.MBGetPath(MB_OPENMESH_LIBPATH))
-        env.Append(CPPPATH = env.MBGetPath(MB_OPENMESH_CPPPATH))
+        env.AppendUnique(LIBPATH = env.MBGetPath(MB_OPENMESH_LIBPATH))
+        env.AppendUnique(CPPPATH = env.MBGetPath(MB_OPENMESH_CPPPATH))
         if env.MBIsMac():
             if env.MBDebugBuild():
                  libs = [lib + 'd' for lib in libs]
@@ -273,56 +412,91 @@ def mb_depends_on_openmesh(env):
     if env.MBDebugBuild():
         env.Append(CPPDEFINES = 'OPENMESH_DEBUG')
 
-    env.Append(LIBS=libs)
+    env.AppendUnique(LIBS=libs)
 
-def mb_depends_on_boost(env):
+def add_boost_flags(env):
     if env.MBIsWindows():
         bitness = '64' if env.MBWindowsIs64Bit() else '32'
-        env.Append(LIBPATH = env.MBGetPath('MB_BOOST_' + bitness + '_LIBPATH'))
-        env.Append(CPPPATH = env.MBGetPath('MB_BOOST_' + bitness + '_CPPPATH'))
+        env.AppendUnique(LIBPATH = env.MBGetPath('MB_BOOST_' + bitness + '_LIBPATH'))
+        env.AppendUnique(CPPPATH = env.MBGetPath('MB_BOOST_' + bitness + '_CPPPATH'))
     elif env.MBIsMac():
         # Adding -isystem to silence compiler warnings when building boost
         # just mac for now because I can't be bothered to test on linux.
-        env.Append(LIBPATH = env.MBGetPath(MB_BOOST_LIBPATH))
-        env.Append(CCFLAGS="-isystem %s" % env[MB_BOOST_CPPPATH])
+        env.AppendUnique(LIBPATH = env.MBGetPath(MB_BOOST_LIBPATH))
+        for path in env.MBGetPath(MB_BOOST_CPPPATH):
+            env.Append(CCFLAGS=['-isystem', path])
     else:
-        env.Append(LIBPATH = env.MBGetPath(MB_BOOST_LIBPATH))
-        env.Append(CPPPATH = env.MBGetPath(MB_BOOST_CPPPATH))
+        env.AppendUnique(LIBPATH = env.MBGetPath(MB_BOOST_LIBPATH))
+        env.AppendUnique(CPPPATH = env.MBGetPath(MB_BOOST_CPPPATH))
 
-def mb_depends_on_opencv(env):
-    env.Append(LIBPATH = env.MBGetPath(MB_OPENCV_LIBPATH))
-    env.Append(CPPPATH = env.MBGetPath(MB_OPENCV_CPPPATH))
+def add_opencv_flags(env):
+    env.AppendUnique(LIBPATH = env.MBGetPath(MB_OPENCV_LIBPATH))
+    env.AppendUnique(CPPPATH = env.MBGetPath(MB_OPENCV_CPPPATH))
 
-def mb_depends_on_vtk(env):
-    env.Append(LIBPATH = env.MBGetPath(MB_VTK_LIBPATH))
-    env.Append(CPPPATH = env.MBGetPath(MB_VTK_CPPPATH))
+def add_vtk_flags(env):
+    env.AppendUnique(LIBPATH = env.MBGetPath(MB_VTK_LIBPATH))
+    env.AppendUnique(CPPPATH = env.MBGetPath(MB_VTK_CPPPATH))
 
-def mb_depends_on_yajl(env):
+def add_yajl_flags(env):
     #TODO: switch this to dynamic on all platforms
     #TODO: make this overridable like everything else
     if env.MBIsWindows():
         bitness = '32' if env.MBWindowsIs32Bit() else '64'
         yajl_base = env['MB_THIRD_PARTY'] + '/yajl-2.1.0/yajl-{}'.format(bitness)
-        env.Append(CPPPATH=yajl_base + '/include')
-        env.Append(LIBPATH=yajl_base + '/lib')
+        env.AppendUnique(CPPPATH=[yajl_base + '/include'])
+        env.AppendUnique(LIBPATH=[yajl_base + '/lib'])
         yajl = 'yajl_s'
     elif env.MBIsMac():
-        env.Append(CPPPATH='/usr/local/yajl/include')
-        env.Append(LIBPATH='/usr/local/yajl/lib/')
+        env.AppendUnique(CPPPATH=['/usr/local/yajl/include'])
+        env.AppendUnique(LIBPATH=['/usr/local/yajl/lib/'])
         yajl = 'yajl_s'
     elif env.MBIsLinux():
         yajl = 'yajl'
-    env.Append(LIBS = [yajl])
+    env.AppendUnique(LIBS = [yajl])
 
-def mb_depends_on_python34(env):
+def add_python34_flags(env):
     # On linux we expect headers and libs to already be installed to the
     # system, and on OSX/Windows the Python3.4 distributable should put
     # headers and libs on the install target.
     if env.MBIsWindows():
-        env.Append(LIBS='python34')
+        env.AppendUnique(LIBS=['python34'])
     else:
         # TODO: deal with debug builds
-        env.Append(LIBS='python3.4m')
+        env.AppendUnique(LIBS=['python3.4m'])
+
+def mb_depends_on(env, name):
+    """Set up env to build against dependency 'name'
+
+    'name' and everything it pulls in are applied once, in link order,
+    and anything already applied to env is skipped, its libraries moved
+    after the ones that need them. See dependencies.py."""
+    dependencies.depend(env, name, report=env.MBGetOption('dependency_report'))
+
+def mb_depends_on_openmesh(env):
+    env.MBDependsOn('openmesh')
+
+def mb_depends_on_boost(env):
+    env.MBDependsOn('boost')
+
+def mb_depends_on_opencv(env):
+    env.MBDependsOn('opencv')
+
+def mb_depends_on_vtk(env):
+    env.MBDependsOn('vtk')
+
+def mb_depends_on_yajl(env):
+    env.MBDependsOn('yajl')
+
+def mb_depends_on_python34(env):
+    env.MBDependsOn('python34')
+
+def register_dependencies():
+    dependencies.register('openmesh', add_openmesh_flags)
+    dependencies.register('boost', add_boost_flags)
+    dependencies.register('opencv', add_opencv_flags)
+    dependencies.register('vtk', add_vtk_flags)
+    dependencies.register('yajl', add_yajl_flags)
+    dependencies.register('python34', add_python34_flags)
 
 def _windows_boost_format(lib, debug):
     return lib + ('-vc120-mt-gd-1_56' if debug else '-vc120-mt-1_56')
@@ -347,6 +521,26 @@ def mb_install_boost_libs(env, libs):
         libs = [libpath + '/' + lib + '.dll' for lib in libs]
         env.MBInstallResources(libs)
 
+def mb_compiler_supports_flag(env, flag, link=False):
+    """True if the C++ compiler accepts 'flag' (when linking, if 'link')
+
+    Probed once per toolchain and cached, see compiler_features.py.
+    If the compiler can't be run at all this returns True, so that
+    projects that never compile anything get the same flags as before."""
+    return compiler_features.supports_flag(env, flag, link) != False
+
+def mb_compiler_supports_openmp(env):
+    """True if the C++ compiler can build and link an OpenMP program"""
+    return bool(compiler_features.supports_openmp(env))
+
+def mb_compiler_family(env):
+    """Returns 'gcc', 'clang' or 'unknown' for the C++ compiler"""
+    return compiler_features.family(env) or 'unknown'
+
+def mb_compiler_linkers(env):
+    """Returns the linkers ('lld', 'gold', 'bfd') usable with -fuse-ld"""
+    return compiler_features.linkers(env)
+
 def add_openmp_option(env):
     """Add a '--disable-openmp' command-line option"""
     env.MBAddOption(
@@ -361,26 +555,32 @@ def mb_setup_openmp(env):
     Calls add_openmp_option() to add a SCons flag for disabling
     OpenMP.
 
-    If OpenMP is enabled, the appropriate flags are set for MSVC and
-    G++. Clang does not support OpenMP yet."""
+    If OpenMP is enabled, the appropriate flags are set for MSVC, or
+    for any other compiler that can actually build an OpenMP program
+    (g++, clang with libomp, versioned or ccache-wrapped compilers)."""
     add_openmp_option(env)
     if env.GetOption('openmp_enabled') != False:
-        compiler = env['CXX']
-        if compiler == 'g++':
-            print('OpenMP enabled')
-            env.Append(CCFLAGS=['-fopenmp'])
-            env.Append(LINKFLAGS=['-fopenmp'])
-        elif env.MBIsWindows():
+        if env.MBIsWindows():
             # This is technically wrong, should check if compiler is
             # MVSC rather than just "on Windows"
             print('OpenMP enabled')
             env.Append(CCFLAGS=['/openmp'])
+        elif env.MBCompilerSupportsOpenMP():
+            print('OpenMP enabled')
+            env.Append(CCFLAGS=['-fopenmp'])
+            env.Append(LINKFLAGS=['-fopenmp'])
         else:
-            # clang doesn't support OpenMP yet
-            print('OpenMP enabled but not supported')
+            print('OpenMP enabled but not supported by ' + env.subst('$CXX'))
     else:
         print('OpenMP disabled')
 
+def mb_set_pool(env, targets, pool):
+    """Limits how many of the actions building targets run at once
+
+    The size of pool comes from --pool, or from the defaults in
+    pools.py. Returns targets."""
+    pools.tag(env.Flatten(targets), pool)
+    return targets
 
 def generate(env):
     # let anything using mw-scons-tools easily access anything here
@@ -403,6 +603,7 @@ def generate(env):
 
     env.AddMethod(mb_get_path, 'MBGetPath')
 
+    env.AddMethod(mb_depends_on, 'MBDependsOn')
     env.AddMethod(mb_depends_on_openmesh, 'MBDependsOnOpenMesh')
     env.AddMethod(mb_depends_on_boost, 'MBDependsOnBoost')
     env.AddMethod(mb_depends_on_opencv, 'MBDependsOnOpenCV')
@@ -412,9 +613,17 @@ def generate(env):
     env.AddMethod(mb_add_boost_libs, 'MBAddBoostLibs')
     env.AddMethod(mb_install_boost_libs, 'MBInstallBoostLibs')
 
+    env.AddMethod(mb_compiler_supports_flag, 'MBCompilerSupportsFlag')
+    env.AddMethod(mb_compiler_supports_openmp, 'MBCompilerSupportsOpenMP')
+    env.AddMethod(mb_compiler_family, 'MBCompilerFamily')
+    env.AddMethod(mb_compiler_linkers, 'MBCompilerLinkers')
     env.AddMethod(mb_setup_openmp, 'MBSetupOpenMP')
 
+    env.AddMethod(mb_set_pool, 'MBSetPool')
+    pools.enable(env.MBGetOption('pools'))
+
     set_third_party_paths(env)
+    register_dependencies()
 
 def exists(env) :
     return True
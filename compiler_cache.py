@@ -0,0 +1,147 @@
+# Copyright 2013 MakerBot Industries
+
+import atexit
+import json
+import os
+import subprocess
+
+import SCons.Util
+
+import path_normalization
+
+'''
+Runs C and C++ compiles through ccache or sccache.
+
+The cache program is put in front of the compile commands inside $( $), so
+turning the cache on or off doesn't change any command signature and
+doesn't cause a rebuild.
+
+ccache is given a base directory above the project and the install prefix.
+It rewrites absolute paths under that directory (like the MB_PREFIX include
+paths) to relative ones before hashing, so checkouts in different places can
+share cache entries. sccache has no equivalent.
+
+The cache's hit and miss counts are read before the build and again at the
+end, and the difference is printed.
+'''
+
+CACHES = ['ccache', 'sccache']
+
+LAUNCHER = 'MB_COMPILER_LAUNCHER'
+
+COMMANDS = ['CCCOM', 'SHCCCOM', 'CXXCOM', 'SHCXXCOM']
+
+# Environment variables the cache programs read
+_PASSED_VARIABLES = ['HOME', 'TMPDIR', 'XDG_CACHE_HOME', 'XDG_CONFIG_HOME']
+_PASSED_PREFIXES = ['CCACHE_', 'SCCACHE_']
+
+# launcher path -> (name, environment, (hits, misses) before the build)
+_started = {}
+# cache programs we've already warned about
+_missing = set()
+
+def _output(command, environment):
+    try:
+        process = subprocess.Popen(
+            command,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            env=environment)
+    except OSError:
+        return None
+    output = process.communicate()[0]
+    if process.returncode != 0:
+        return None
+    if not isinstance(output, str):
+        output = output.decode('utf-8', 'replace')
+    return output
+
+def _ccache_stats(launcher, environment):
+    ''' Returns (hits, misses), needs ccache 3.7 or newer '''
+    output = _output([launcher, '--print-stats'], environment)
+    if output is None:
+        return None
+    stats = {}
+    for line in output.splitlines():
+        fields = line.split('\t')
+        if len(fields) == 2 and fields[1].strip().isdigit():
+            stats[fields[0]] = int(fields[1])
+    hits = (stats.get('direct_cache_hit', 0) +
+            stats.get('preprocessed_cache_hit', 0))
+    return hits, stats.get('cache_miss', 0)
+
+def _sccache_count(value):
+    # Newer versions count per language
+    if isinstance(value, dict):
+        return sum(value.get('counts', {}).values())
+    return value or 0
+
+def _sccache_stats(launcher, environment):
+    output = _output(
+        [launcher, '--show-stats', '--stats-format=json'], environment)
+    if output is None:
+        return None
+    try:
+        stats = json.loads(output)['stats']
+    except (ValueError, KeyError, TypeError):
+        return None
+    return (_sccache_count(stats.get('cache_hits')),
+            _sccache_count(stats.get('cache_misses')))
+
+_stats = {
+    'ccache': _ccache_stats,
+    'sccache': _sccache_stats,
+}
+
+def _print_stats():
+    for launcher, (name, environment, before) in sorted(_started.items()):
+        after = _stats[name](launcher, environment)
+        if before is None or after is None:
+            print('Compiler cache ({}): statistics not available'.format(name))
+            continue
+        hits = after[0] - before[0]
+        misses = after[1] - before[1]
+        if hits + misses == 0:
+            continue
+        print('Compiler cache ({}): {} hits, {} misses, {}% hit rate'.format(
+            name, hits, misses, 100 * hits // (hits + misses)))
+
+def setup(env, name, base_paths):
+    ''' Compile through the cache program name
+
+        base_paths are the directories whose absolute paths end up in
+        command lines. Returns False if the cache program wasn't found. '''
+    launcher = env.WhereIs(name) or SCons.Util.WhereIs(name)
+    if launcher is None:
+        if name not in _missing:
+            _missing.add(name)
+            print('Compiler cache {} not found, compiling without it'.format(
+                name))
+        return False
+
+    for variable, value in os.environ.items():
+        if (variable in _PASSED_VARIABLES or
+                any(variable.startswith(p) for p in _PASSED_PREFIXES)):
+            env['ENV'].setdefault(variable, value)
+    if name == 'ccache':
+        basedir = path_normalization.common_parent(base_paths)
+        # A base directory of / would make every path relative
+        if os.path.dirname(basedir) != basedir:
+            env['ENV'].setdefault('CCACHE_BASEDIR', basedir)
+        # Objects compiled with a precompiled header can't be cached
+        # without these
+        env['ENV'].setdefault('CCACHE_SLOPPINESS', 'pch_defines,time_macros')
+
+    env[LAUNCHER] = launcher
+    for command in COMMANDS:
+        if '$' + LAUNCHER not in env[command]:
+            env[command] = '$( $' + LAUNCHER + ' $) ' + env[command]
+
+    if launcher not in _started and not env.GetOption('no_exec'):
+        if not _started:
+            atexit.register(_print_stats)
+        environment = dict(os.environ)
+        environment.update((str(k), str(v)) for k, v in env['ENV'].items())
+        _started[launcher] = (
+            name, environment, _stats[name](launcher, environment))
+    return True
@@ -0,0 +1,200 @@
+# Copyright 2013 MakerBot Industries
+
+import atexit
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+import SCons.Node.FS
+import SCons.Util
+
+import persistent
+
+'''
+Finds out what the C++ compiler of an environment can do by compiling tiny
+test programs.
+
+Results are stored in the project's .mb_cache keyed on a fingerprint of the
+toolchain: the CXX command plus the size and mtime of every program in it.
+Swapping or upgrading the compiler changes the fingerprint, so the probes
+run again. Otherwise a warm run never starts the compiler.
+
+Flag and OpenMP probes compile with the environment's own flags (CXXFLAGS,
+CCFLAGS, the preprocessor flags, and LINKFLAGS and LIBPATH when linking), so
+a -std= flag or an OpenMP runtime in a non-default prefix is taken into
+account. Those flags are part of the key a result is stored under.
+
+When the compiler can't be run at all the probes return None, and it's up to
+the caller to decide what that means.
+'''
+
+CACHE_NAME = 'compiler_features'
+
+_EMPTY_PROGRAM = 'int main() { return 0; }\n'
+
+_OPENMP_PROGRAM = '''#include <omp.h>
+int main() { return omp_get_max_threads() > 0 ? 0 : 1; }
+'''
+
+_FAMILY_PROGRAM = '''#if defined(__clang__)
+mb_compiler_family=clang
+#elif defined(__GNUC__)
+mb_compiler_family=gcc
+#else
+mb_compiler_family=unknown
+#endif
+'''
+
+# Linkers we know how to ask for with -fuse-ld, fastest first
+LINKERS = ['lld', 'gold', 'bfd']
+
+class _Cache(object):
+    def __init__(self, path):
+        self.path = path
+        self.results = persistent.load(path, {})
+        self.dirty = False
+
+    def save(self):
+        if self.dirty:
+            persistent.save(self.path, self.results)
+            self.dirty = False
+
+_caches = {}
+_fingerprints = {}
+
+def _cache(env):
+    path = persistent.cache_path(env, CACHE_NAME)
+    try:
+        return _caches[path]
+    except KeyError:
+        pass
+    cache = _Cache(path)
+    _caches[path] = cache
+    atexit.register(cache.save)
+    return cache
+
+def _command(env):
+    return SCons.Util.CLVar(env.subst('$CXX'))
+
+_COMPILE_FLAGS = '$CXXFLAGS $CCFLAGS $_CCCOMCOM'
+_LINK_FLAGS = '$LINKFLAGS $_LIBDIRFLAGS'
+
+def _env_flags(env, link=False):
+    ''' The flags env compiles, and links if link is set, with '''
+    flags = _COMPILE_FLAGS
+    if link:
+        flags += ' ' + _LINK_FLAGS
+    return tuple(SCons.Util.CLVar(env.subst(flags)))
+
+def _cwd():
+    # Relative paths in the flags are relative to the SConscript being read
+    return SCons.Node.FS.get_default_fs().getcwd().get_abspath()
+
+def _subprocess_env(env):
+    return dict((str(k), str(v)) for k, v in env['ENV'].items())
+
+def fingerprint(env):
+    ''' Identifies the toolchain that CXX refers to in env '''
+    command = _command(env)
+    key = (tuple(command), env['ENV'].get('PATH'))
+    try:
+        return _fingerprints[key]
+    except KeyError:
+        pass
+    programs = []
+    for word in command:
+        path = env.WhereIs(word)
+        if path is None:
+            continue
+        path = os.path.realpath(path)
+        st = os.stat(path)
+        programs.append((path, st.st_size, st.st_mtime))
+    result = repr((sys.platform, key, programs))
+    _fingerprints[key] = result
+    return result
+
+def _run(env, args, source, link=False, preprocess=False, flags=()):
+    ''' Compile source with flags and args, returning (succeeded, output)
+
+        Returns (None, '') if the compiler couldn't be started. '''
+    tmp = tempfile.mkdtemp(prefix='mb_probe')
+    try:
+        source_path = os.path.join(tmp, 'probe.cpp')
+        with open(source_path, 'w') as source_file:
+            source_file.write(source)
+        if preprocess:
+            mode = ['-E']
+        elif link:
+            mode = ['-o', os.path.join(tmp, 'probe')]
+        else:
+            mode = ['-c', '-o', os.path.join(tmp, 'probe.o')]
+        command = (list(_command(env)) + list(flags) + list(args) + mode +
+                   [source_path])
+        try:
+            process = subprocess.Popen(
+                command,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+                env=_subprocess_env(env),
+                cwd=_cwd() if flags else tmp)
+        except OSError:
+            return None, ''
+        output = process.communicate()[0]
+        if not isinstance(output, str):
+            output = output.decode('utf-8', 'replace')
+        return process.returncode == 0, output
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+def _probe(env, name, function):
+    cache = _cache(env)
+    results = cache.results.setdefault(fingerprint(env), {})
+    try:
+        return results[name]
+    except KeyError:
+        pass
+    result = function()
+    if result is not None:
+        results[name] = result
+        cache.dirty = True
+    return result
+
+def supports_flag(env, flag, link=False):
+    ''' True if the compiler accepts flag without complaint
+
+        Warnings count as complaints, since that's how clang reports
+        most flags it doesn't understand. '''
+    args = SCons.Util.CLVar(flag) + ['-Werror']
+    flags = _env_flags(env, link)
+    return _probe(
+        env,
+        ('flag', flag, link, flags, _cwd()),
+        lambda: _run(env, args, _EMPTY_PROGRAM, link=link, flags=flags)[0])
+
+def supports_openmp(env):
+    ''' True if the compiler can build and link an OpenMP program '''
+    flags = _env_flags(env, link=True)
+    return _probe(
+        env,
+        ('openmp', flags, _cwd()),
+        lambda: _run(env, ['-fopenmp'], _OPENMP_PROGRAM, link=True,
+                     flags=flags)[0])
+
+def family(env):
+    ''' Returns 'gcc', 'clang' or 'unknown' '''
+    def detect():
+        succeeded, output = _run(env, [], _FAMILY_PROGRAM, preprocess=True)
+        if not succeeded:
+            return None
+        for line in output.splitlines():
+            if line.startswith('mb_compiler_family='):
+                return line.split('=', 1)[1].strip()
+        return 'unknown'
+    return _probe(env, ('family',), detect)
+
+def linkers(env):
+    ''' Returns the linkers in LINKERS that the compiler can use '''
+    return [l for l in LINKERS
+            if supports_flag(env, '-fuse-ld=' + l, link=True)]
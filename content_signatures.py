@@ -0,0 +1,189 @@
+# Copyright 2013 MakerBot Industries
+
+import atexit
+import hashlib
+import os
+import re
+import time
+
+import persistent
+
+'''
+A decider that ignores comments and whitespace in C and C++ files, for
+--token-signatures.
+
+Editing a comment in a header that everything includes rebuilds
+everything, even though the compiler produces the same code. With this
+decider, a C or C++ dependency that changed only counts as changed if its
+normalized text changed as well:
+
+  * a comment within a line becomes a single space, like the preprocessor
+    does. A comment over several lines becomes an empty one with the same
+    line breaks.
+  * runs of spaces and tabs become a single space, except in string and
+    character literals
+  * the spaces at the starts and ends of lines are dropped
+
+Every line break is kept, so the code stays on the lines it was on, and
+anything that depends on line numbers (__LINE__ in assert and logging
+macros, debug info) is the same. Adding or removing a comment line is a
+change. Only columns can move, which debug info can be off by until the
+code is compiled again. Files with raw string literals or digit separators
+(which the tokenizer can't tell from character literals) are compared byte
+for byte.
+
+The signature of a version of a file is kept in the project's .mb_cache
+keyed by its content signature in SCons, so files are only normalized
+when they change. The decider runs after the one the environment had,
+which decides anything that isn't a C or C++ file.
+'''
+
+NAME = 'content_signatures'
+
+# Changes whenever normalize does, so signatures of the old normalization
+# aren't compared with new ones
+VERSION = 2
+
+SUFFIXES = frozenset([
+    '.h', '.hh', '.hpp', '.hxx', '.h++', '.inl', '.ipp', '.tcc',
+    '.c', '.cc', '.cpp', '.cxx', '.c++', '.C', '.m', '.mm',
+])
+
+# Signatures not used for this long are dropped from the cache
+EXPIRE_SECONDS = 30 * 24 * 60 * 60
+
+_TOKEN = re.compile(r'''
+    (?P<comment>//(?:\\\n|[^\n])*|/\*.*?\*/)
+    |(?P<literal>"(?:\\.|[^"\\\n])*"|'(?:\\.|[^'\\\n])*')
+    |(?P<splice>\\\n)
+    |(?P<newline>\n)
+    |(?P<space>[ \t\f\v\r]+)
+    |(?P<code>[^\s"'/\\]+|.)
+    ''', re.S | re.X)
+
+# Text where comments and literals can't be found reliably
+_LITERAL = re.compile(r'''\bu?8?[LUu]?R"|[0-9a-fA-F]'[0-9a-fA-F]''')
+
+_path = None
+_now = None
+_dirty = False
+# content signature of a file -> (its signature, when it was last used)
+_signatures = None
+
+def normalize(text):
+    ''' text without comments and extra whitespace, None if it has to be
+        compared as is. Has the same line breaks as text. '''
+    text = text.replace('\r\n', '\n')
+    if _LITERAL.search(text):
+        return None
+    result = []
+    # Spaces at the start of a line don't separate anything, unless the
+    # line is continued from the one before
+    line_start = True
+    space = False
+    for match in _TOKEN.finditer(text):
+        kind = match.lastgroup
+        token = match.group()
+        if kind == 'space':
+            space = True
+        elif kind == 'comment':
+            lines = token.count('\n')
+            if lines:
+                result.append('/*' + '\n' * lines + '*/')
+                line_start = False
+            space = True
+        elif kind == 'newline':
+            result.append('\n')
+            line_start = True
+            space = False
+        else:
+            if space and not line_start:
+                result.append(' ')
+            result.append(token)
+            line_start = False
+            space = False
+    return ''.join(result)
+
+def _md5(data):
+    return hashlib.md5(data).hexdigest()
+
+def signature(contents):
+    ''' The signature of a C or C++ file whose bytes are contents '''
+    try:
+        text = contents.decode('utf-8')
+    except UnicodeDecodeError:
+        return _md5(contents)
+    normalized = normalize(text)
+    if normalized is None:
+        return _md5(contents)
+    return _md5(normalized.encode('utf-8'))
+
+def _load(env):
+    global _path, _signatures, _now
+    if _signatures is None:
+        _path = persistent.cache_path(env, NAME)
+        version, _signatures = persistent.load(_path, (VERSION, {}))
+        if version != VERSION:
+            _signatures = {}
+        _now = time.time()
+        atexit.register(_save)
+    return _signatures
+
+def _save():
+    if not _dirty:
+        return
+    expired = _now - EXPIRE_SECONDS
+    persistent.save(_path, (VERSION, dict(
+        (csig, entry) for csig, entry in _signatures.items()
+        if entry[1] > expired)))
+
+def _cached(csig):
+    ''' The signature of the version of a file with content signature csig,
+        None if it was never normalized '''
+    global _dirty
+    entry = _signatures.get(csig)
+    if entry is None:
+        return None
+    # Only write the cache for entries that are about to expire
+    if entry[1] < _now - EXPIRE_SECONDS // 2:
+        _signatures[csig] = (entry[0], _now)
+        _dirty = True
+    return entry[0]
+
+def _signature(node):
+    global _dirty
+    csig = node.get_csig()
+    result = _cached(csig)
+    if result is None:
+        result = signature(node.get_contents())
+        _signatures[csig] = (result, _now)
+        _dirty = True
+    return result
+
+def _is_source(node):
+    return os.path.splitext(node.name)[1] in SUFFIXES
+
+def _decider(previous):
+    def changed(dependency, target, prev_ni):
+        if not _is_source(dependency):
+            return previous(dependency, target, prev_ni)
+        # The signature of this version is needed when it changes, even
+        # if it's the first one built
+        new = _signature(dependency)
+        if not previous(dependency, target, prev_ni):
+            return False
+        try:
+            old = _cached(prev_ni.csig)
+        except AttributeError:
+            return True
+        return old is None or old != new
+    changed.mb_token_signatures = True
+    return changed
+
+def setup(env):
+    ''' Make comment and whitespace edits of C and C++ files rebuild nothing
+        env builds '''
+    if getattr(env.decide_source, 'mb_token_signatures', False):
+        return
+    _load(env)
+    env.Decider(_decider(env.decide_source))
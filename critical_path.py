@@ -0,0 +1,215 @@
+# Copyright 2013 MakerBot Industries
+
+import atexit
+import json
+
+import SCons.Node
+import SCons.Node.Alias
+import SCons.Node.FS
+import SCons.Script
+
+import action_durations
+
+'''
+Critical path analysis of the build graph, for --critical-path-report.
+
+When SCons exits, the graph below the targets of the build is walked, and
+each action is given the duration it took the last time it ran. Actions
+that never ran are estimated at the median duration. The report has:
+
+  * the longest chain of dependent actions. No -j can finish the build
+    faster than that.
+  * the best possible wall time at the current -j: the larger of the
+    critical path and the total work divided by the number of jobs.
+  * the bottlenecks: the actions that the most other work waits for,
+    ranked by duration times the number of actions that depend on them.
+    Those are where splitting a library or dropping a dependency pays.
+
+Running with -n gives the report from the recorded durations, without
+building anything.
+'''
+
+# How many bottlenecks to report
+BOTTLENECKS = 10
+
+def _target_nodes():
+    fs = SCons.Node.FS.get_default_fs()
+    nodes = []
+    for target in list(SCons.Script.BUILD_TARGETS) or ['.']:
+        if isinstance(target, SCons.Node.Node):
+            nodes.append(target)
+            continue
+        alias = SCons.Node.Alias.default_ans.lookup(target)
+        if alias is not None:
+            nodes.append(alias)
+        else:
+            nodes.append(fs.Entry(target, fs.Top))
+    return nodes
+
+def _action_key(node):
+    ''' The node that stands for the action building node '''
+    # Directories and aliases only collect their children
+    if not node.has_builder() or isinstance(node, SCons.Node.FS.Dir):
+        return None
+    executor = node.get_executor()
+    if not executor.get_action_list():
+        return None
+    return executor.get_all_targets()[0]
+
+def _walk(roots):
+    ''' Returns (nodes in post-order, node -> children) '''
+    order = []
+    children = {}
+    stack = [(r, False) for r in roots]
+    while stack:
+        node, expanded = stack.pop()
+        if expanded:
+            order.append(node)
+            continue
+        if node in children:
+            continue
+        kids = node.children(scan=0)
+        children[node] = kids
+        stack.append((node, True))
+        for kid in kids:
+            if kid not in children:
+                stack.append((kid, False))
+    return order, children
+
+def _median(values):
+    values = sorted(values)
+    if not values:
+        return 0.0
+    return values[len(values) // 2]
+
+def analyze(roots, durations, jobs):
+    ''' Returns the report as a dict '''
+    order, children = _walk(roots)
+
+    costs = {}
+    known = []
+    unknown = 0
+    for node in order:
+        key = _action_key(node)
+        if key is None or key in costs:
+            continue
+        seconds = durations.get(key.get_abspath())
+        if seconds is None:
+            unknown += 1
+        else:
+            known.append(seconds)
+        costs[key] = seconds
+    estimate = _median(known)
+    for key, seconds in costs.items():
+        if seconds is None:
+            costs[key] = estimate
+
+    # Longest chain finishing at each node. Targets of the same action
+    # share its cost, it's only counted once on any chain through them.
+    finish = {}
+    via = {}
+    for node in order:
+        best = None
+        best_finish = 0.0
+        for kid in children[node]:
+            if finish.get(kid, 0.0) > best_finish:
+                best = kid
+                best_finish = finish[kid]
+        key = _action_key(node)
+        cost = 0.0
+        if key is not None and not (best is not None and
+                                    _action_key(best) is key):
+            cost = costs[key]
+        finish[node] = best_finish + cost
+        via[node] = best
+
+    end = max(roots, key=lambda r: finish.get(r, 0.0))
+    chain = []
+    node = end
+    while node is not None:
+        key = _action_key(node)
+        if key is not None and (not chain or chain[-1][0] is not key):
+            chain.append((key, costs[key]))
+        node = via.get(node)
+
+    # Actions waiting on each action, directly or not
+    parents = {}
+    for node, kids in children.items():
+        for kid in kids:
+            parents.setdefault(kid, []).append(node)
+    def dependents(key):
+        seen = set()
+        stack = [key]
+        while stack:
+            for parent in parents.get(stack.pop(), []):
+                if parent not in seen:
+                    seen.add(parent)
+                    stack.append(parent)
+        return len(set(_action_key(n) for n in seen) - set([None, key]))
+    # Only the expensive actions and the critical path are candidates,
+    # counting dependents for every action would take too long
+    candidates = sorted(costs, key=lambda k: costs[k], reverse=True)
+    candidates = set(candidates[:BOTTLENECKS * 3] + [k for k, s in chain])
+    bottlenecks = []
+    for key in candidates:
+        count = dependents(key)
+        bottlenecks.append((costs[key] * count, key, count))
+    bottlenecks.sort(key=lambda b: b[0], reverse=True)
+
+    total = sum(costs.values())
+    critical = finish.get(end, 0.0)
+    return {
+        'jobs': jobs,
+        'actions': len(costs),
+        'estimated_actions': unknown,
+        'estimate_seconds': estimate,
+        'total_seconds': total,
+        'critical_path_seconds': critical,
+        'best_wall_seconds': max(critical, total / max(jobs, 1)),
+        'critical_path': [
+            {'target': str(key), 'seconds': seconds}
+            for key, seconds in reversed(chain)],
+        'bottlenecks': [
+            {'target': str(key), 'seconds': costs[key], 'dependents': count,
+             'score': score}
+            for score, key, count in bottlenecks[:BOTTLENECKS]],
+    }
+
+def _print_report(report):
+    print('Critical path report ({} actions, {} without a recorded '
+          'duration, estimated at {:.1f}s):'.format(
+            report['actions'], report['estimated_actions'],
+            report['estimate_seconds']))
+    print('  Total work:           {:.1f}s'.format(report['total_seconds']))
+    print('  Critical path:        {:.1f}s'.format(
+        report['critical_path_seconds']))
+    print('  Best wall time at -j {}: {:.1f}s'.format(
+        report['jobs'], report['best_wall_seconds']))
+    print('  Longest chain of dependent actions:')
+    for step in report['critical_path']:
+        print('    {:8.1f}s  {}'.format(step['seconds'], step['target']))
+    print('  Bottlenecks (duration x actions waiting on it):')
+    for b in report['bottlenecks']:
+        print('    {:8.1f}s x {:5d}  {}'.format(
+            b['seconds'], b['dependents'], b['target']))
+
+def _report(env, json_path):
+    report = analyze(
+        _target_nodes(),
+        action_durations.durations(env),
+        env.GetOption('num_jobs'))
+    _print_report(report)
+    if json_path:
+        with open(json_path, 'w') as json_file:
+            json.dump(report, json_file, indent=2, sort_keys=True)
+
+_enabled = False
+
+def enable(env, json_path=None):
+    ''' Record durations and report on the build graph at exit '''
+    global _enabled
+    if _enabled:
+        return
+    _enabled = True
+    action_durations.record(env)
+    atexit.register(_report, env, json_path)
@@ -0,0 +1,142 @@
+# Copyright 2013 MakerBot Industries
+
+import atexit
+
+import SCons.Util
+
+'''
+Registry of the libraries set up by the MBDependsOn* methods.
+
+Each dependency is registered with a function that adds its flags to an
+environment and the list of dependencies it pulls in. Depending on something
+applies its whole closure once, in link order (a library comes before the
+libraries it needs), and skips anything that was already applied to that
+environment. Combining several components that share dependencies no longer
+piles up duplicate CPPPATH/LIBPATH/LIBS entries.
+
+The libraries of a dependency that was already applied are moved to the
+end of LIBS instead, so they still come after the library that needs them
+when it's applied later (OpenMesh, then thing).
+
+The applied dependencies, and the libraries each one added, are recorded in
+the environment itself, so a Clone starts with everything its parent
+already has.
+'''
+
+APPLIED = 'MB_APPLIED_DEPENDENCIES'
+# name -> the LIBS entries applying it added
+APPLIED_LIBS = 'MB_APPLIED_DEPENDENCY_LIBS'
+
+REPORTED_VARIABLES = ['CPPPATH', 'LIBPATH', 'LIBS', 'CPPDEFINES', 'CCFLAGS']
+
+# name -> (function adding the flags, names of required dependencies)
+_registry = {}
+_closures = {}
+
+def register(name, add_flags, requires=()):
+    ''' Register (or replace) a dependency '''
+    _registry[name] = (add_flags, tuple(requires))
+    _closures.clear()
+
+def closure(name):
+    ''' Returns name and everything it requires, in link order '''
+    try:
+        return _closures[name]
+    except KeyError:
+        pass
+    order = []
+    visiting = []
+    def visit(n):
+        if n in order:
+            return
+        if n in visiting:
+            raise Exception('Dependency cycle: ' + ' -> '.join(visiting + [n]))
+        if n not in _registry:
+            raise Exception('Unknown dependency "' + n + '"')
+        visiting.append(n)
+        # Visited backwards so that siblings keep their order once the
+        # post-order is reversed
+        for required in reversed(_registry[n][1]):
+            visit(required)
+        visiting.pop()
+        order.append(n)
+    visit(name)
+    order.reverse()
+    _closures[name] = order
+    return order
+
+def _length(env, variable):
+    value = env.get(variable)
+    if not value:
+        return 0
+    if SCons.Util.is_String(value):
+        return len(value.split())
+    if SCons.Util.is_Dict(value):
+        return len(value)
+    return len(SCons.Util.flatten(value))
+
+def _libs(env):
+    value = env.get('LIBS')
+    if not value:
+        return []
+    if SCons.Util.is_String(value):
+        return value.split()
+    return SCons.Util.flatten(value)
+
+def _lengths(env):
+    return dict((v, _length(env, v)) for v in REPORTED_VARIABLES)
+
+def depend(env, name, report=False):
+    ''' Apply dependency name and its closure to env '''
+    applied = env.get(APPLIED) or []
+    added_libs = dict(env.get(APPLIED_LIBS) or {})
+    missing = [n for n in closure(name) if n not in applied]
+    before = _lengths(env) if report else None
+    for n in closure(name):
+        libs = _libs(env)
+        if n in applied:
+            # Keep it after the libraries that need it
+            moved = [l for l in added_libs.get(n, ()) if l in libs]
+            if moved:
+                env['LIBS'] = [l for l in libs if l not in moved] + moved
+        else:
+            _registry[n][0](env)
+            added_libs[n] = tuple(l for l in _libs(env) if l not in libs)
+    env[APPLIED] = applied + missing
+    env[APPLIED_LIBS] = added_libs
+    if report:
+        _record(env, name, before)
+
+# variable -> [entries without deduplication, entries actually added]
+_report = {}
+
+def _footprint(env, name):
+    ''' How many entries blindly applying name's closure would add '''
+    result = dict((v, 0) for v in REPORTED_VARIABLES)
+    for n in closure(name):
+        probe = env.Clone()
+        for v in REPORTED_VARIABLES:
+            probe[v] = []
+        _registry[n][0](probe)
+        for v, length in _lengths(probe).items():
+            result[v] += length
+    return result
+
+def _record(env, name, before):
+    if not _report:
+        atexit.register(_print_report)
+    after = _lengths(env)
+    naive = _footprint(env, name)
+    for v in REPORTED_VARIABLES:
+        totals = _report.setdefault(v, [0, 0])
+        totals[0] += naive[v]
+        totals[1] += after[v] - before[v]
+
+def _print_report():
+    print('Dependency report (entries added by MBDependsOn*):')
+    for v in REPORTED_VARIABLES:
+        naive, actual = _report[v]
+        if naive == 0:
+            continue
+        print('  {}: {} added, {} without deduplication ({}% shorter)'.format(
+            v, actual, naive, 100 * (naive - actual) // naive))
@@ -0,0 +1,129 @@
+# Copyright 2013 MakerBot Industries
+
+import os
+import re
+
+import SCons.Executor
+
+'''
+Implicit dependencies of compiles from the compiler instead of SCons' C
+scanner, for --depfiles.
+
+Objects of the MB builders are compiled with -MMD -MF <object>.d, so the
+compiler writes down the headers it read. When SCons looks for an object's
+implicit dependencies, they're read from that file instead of scanning the
+sources and everything they include against every CPPPATH entry.
+
+The sources are scanned like before when there's no depfile yet (the
+object was never built), when a source is newer than the depfile (it may
+include something new), and when a generated source is out of date.
+-MMD leaves out system headers, like the ones in /usr/include.
+
+Nothing is hooked without --depfiles. With it, the implicit dependencies
+of the MB objects are sorted, since the scanner and the compiler list
+headers in different orders and SCons compares dependencies in order.
+The flags are inside $( $), but the first build after turning --depfiles
+on or off rebuilds the objects once for the new order.
+
+Depfiles aren't nodes: SCons deletes files in a variant dir that it has a
+node for, no builder and no source for.
+'''
+
+SUFFIX = '.d'
+
+# Inside $( $) so they aren't part of the objects' signatures
+FLAGS = ['$(', '-MMD', '-MF', '${TARGET}' + SUFFIX, '$)']
+
+# A file name in a make rule, with backslash escapes
+_WORD = re.compile(r'(?:\\.|[^\s\\])+')
+_ESCAPE = re.compile(r'\\(.)')
+
+_original_scan_sources = None
+# path in a depfile -> node, most headers are in many depfiles
+_nodes = {}
+
+def parse(text):
+    ''' The prerequisites of the first rule in a depfile '''
+    text = text.replace('\\\r\n', ' ').replace('\\\n', ' ')
+    # -MP adds a rule without prerequisites for every header after it
+    rule = text.lstrip().split('\n', 1)[0]
+    # The targets are everything up to the first ': '
+    rule = rule.split(': ', 1)
+    if len(rule) < 2:
+        return []
+    prerequisites = rule[1]
+    if '\\' not in prerequisites and '$' not in prerequisites:
+        return prerequisites.split()
+    return [_ESCAPE.sub(r'\1', word).replace('$$', '$')
+            for word in _WORD.findall(prerequisites)]
+
+def _mtime(node):
+    try:
+        return os.path.getmtime(node.srcnode().get_abspath())
+    except OSError:
+        return None
+
+def _depfile(executor):
+    return getattr(executor.get_all_targets()[0].attributes, 'mb_depfile',
+                   None)
+
+def _recorded(executor, depfile):
+    ''' The dependencies in depfile, None if executor's sources have to be
+        scanned '''
+    try:
+        written = os.path.getmtime(depfile)
+        with open(depfile) as f:
+            text = f.read()
+    except (IOError, OSError):
+        return None
+    sources = executor.get_all_sources()
+    for source in sources:
+        if source.has_builder():
+            if not source.is_up_to_date():
+                return None
+        else:
+            mtime = _mtime(source)
+            if mtime is None or mtime > written:
+                return None
+    top = executor.get_all_targets()[0].fs.Top
+    sources = set(sources)
+    deps = []
+    for path in parse(text):
+        node = _nodes.get(path)
+        if node is None:
+            node = _nodes[path] = top.File(path)
+        # Headers that were removed since, the source changed too
+        if node in sources or not (node.exists() or node.has_builder()):
+            continue
+        deps.append(node)
+    return deps
+
+def _scan_sources(self, scanner):
+    depfile = _depfile(self)
+    if depfile is None:
+        return _original_scan_sources(self, scanner)
+    deps = _recorded(self, depfile)
+    if deps is None:
+        _original_scan_sources(self, scanner)
+    else:
+        # The same as Executor.scan does with the scanned dependencies
+        deps.extend(self.get_implicit_deps())
+        for target in self.get_all_targets():
+            target.add_to_implicit(deps)
+    for target in self.get_all_targets():
+        target.implicit.sort(key=str)
+
+def use(env, objects):
+    ''' Get the implicit dependencies of objects from their depfiles.
+        objects have to be compiled with FLAGS. '''
+    for node in objects:
+        node.attributes.mb_depfile = node.get_abspath() + SUFFIX
+
+def enable():
+    ''' Get the implicit dependencies of the objects depfiles are used for
+        from the depfiles, sorted '''
+    global _original_scan_sources
+    if _original_scan_sources is not None:
+        return
+    _original_scan_sources = SCons.Executor.Executor.scan_sources
+    SCons.Executor.Executor.scan_sources = _scan_sources
@@ -0,0 +1,151 @@
+# Copyright 2013 MakerBot Industries
+
+import atexit
+import fnmatch
+import os
+import time
+
+import persistent
+
+'''
+A persistent index of directory listings used by the globbing methods.
+
+Each directory's listing is stored along with the directory's mtime. Adding,
+removing or renaming an entry updates the mtime of the directory that holds
+it, so on later runs a single stat per directory tells us whether the stored
+listing is still good. Only directories whose mtime changed are read again.
+
+Glob results are also memoized for the rest of the run, so SConscripts that
+glob the same tree over and over only walk it once.
+'''
+
+try:
+    from os import scandir
+except ImportError:
+    try:
+        from scandir import scandir
+    except ImportError:
+        scandir = None
+
+INDEX_NAME = 'dir_index'
+
+# A directory modified this recently might be modified again within the same
+# mtime tick, which we couldn't detect. Listings like that are used for this
+# run but re-read on the next one.
+_RACY_SECONDS = 2
+
+def _read_directory(path):
+    ''' Returns (dirnames, filenames) like one step of os.walk
+
+        Symlinks to directories are left out of both lists, since os.walk
+        doesn't descend into them and doesn't report them as files. '''
+    dirnames = []
+    filenames = []
+    if scandir is not None:
+        for entry in scandir(path):
+            if entry.is_dir():
+                if not entry.is_symlink():
+                    dirnames.append(entry.name)
+            else:
+                filenames.append(entry.name)
+    else:
+        for name in os.listdir(path):
+            full_path = os.path.join(path, name)
+            if os.path.isdir(full_path):
+                if not os.path.islink(full_path):
+                    dirnames.append(name)
+            else:
+                filenames.append(name)
+    dirnames.sort()
+    filenames.sort()
+    return dirnames, filenames
+
+class DirectoryIndex(object):
+    ''' Directory listings validated by mtime, persisted between runs '''
+
+    def __init__(self, path):
+        self.path = path
+        self._listings = persistent.load(path, {})
+        self._globs = {}
+        # Directories listed too soon after they changed, see _RACY_SECONDS
+        self._racy = set()
+        self._dirty = False
+
+    def listdir(self, path):
+        ''' Returns (dirnames, filenames) for path
+
+            Unreadable directories are treated as empty, like os.walk. '''
+        try:
+            mtime = os.stat(path).st_mtime
+        except OSError:
+            return [], []
+        listing = self._listings.get(path)
+        if listing is not None and listing[0] == mtime:
+            return listing[1], listing[2]
+        try:
+            dirnames, filenames = _read_directory(path)
+        except OSError:
+            return [], []
+        if time.time() - mtime < _RACY_SECONDS:
+            self._racy.add(path)
+        else:
+            self._racy.discard(path)
+        self._listings[path] = (mtime, dirnames, filenames)
+        self._dirty = True
+        return dirnames, filenames
+
+    def walk(self, top):
+        ''' Like os.walk(top), pruning dirnames in place works the same way '''
+        dirnames, filenames = self.listdir(top)
+        dirnames = list(dirnames)
+        yield top, dirnames, list(filenames)
+        for dirname in dirnames:
+            for result in self.walk(os.path.join(top, dirname)):
+                yield result
+
+    def recursive_glob(self, root, pattern, exclude=None):
+        ''' Returns the paths under root whose file names match pattern
+
+            exclude is a glob or list of globs of file names to leave out.
+            Returned paths are relative to root, and the result is shared
+            between callers, so don't modify it. '''
+        if isinstance(exclude, str):
+            exclude = [exclude]
+        exclude = tuple(exclude or ())
+        key = (root, pattern, exclude)
+        try:
+            return self._globs[key]
+        except KeyError:
+            pass
+        matches = []
+        for parent, dirnames, filenames in self.walk(root):
+            for filename in fnmatch.filter(filenames, pattern):
+                if any(fnmatch.fnmatch(filename, e) for e in exclude):
+                    continue
+                matches.append(os.path.relpath(
+                    os.path.join(parent, filename), root))
+        self._globs[key] = matches
+        return matches
+
+    def save(self):
+        if self._dirty:
+            listings = dict(self._listings)
+            for path in self._racy:
+                listing = listings[path]
+                listings[path] = (None,) + listing[1:]
+            persistent.save(self.path, listings)
+            self._dirty = False
+
+_indexes = {}
+
+def get_index(env):
+    ''' Returns the directory index for env's project, loading it if needed '''
+    path = persistent.cache_path(env, INDEX_NAME)
+    try:
+        return _indexes[path]
+    except KeyError:
+        pass
+    index = DirectoryIndex(path)
+    _indexes[path] = index
+    atexit.register(index.save)
+    return index
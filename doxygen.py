@@ -3,6 +3,10 @@ import collections
 import os
 import re
 import subprocess
+import sys
+
+sys.path.append(os.path.dirname(__file__))
+import pools
 
 def warning(message, path, line_number = None):
     """Print a gcc-style warning"""
@@ -152,9 +156,10 @@ def generate(env):
         """Run Doxygen using configuration on specified sources"""
         if env.MBGetOption('doxygen'):
             all_source = (configuration,) + sources
-            env.DoxygenBuilder(
+            html = env.DoxygenBuilder(
                 'doxygen/' + expected_output,
                 all_source)
+            pools.tag(html, 'doxygen')
             # Ensure that documentation is built if only the
             # "install" target is specified
             # TODO: that ^ is not what this v does.
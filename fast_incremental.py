@@ -0,0 +1,128 @@
+# Copyright 2013 MakerBot Industries
+
+import atexit
+import hashlib
+import os
+
+import SCons.Node.FS
+import SCons.Script
+import SCons.Taskmaster
+
+import persistent
+
+'''
+Settings for fast no-op and one-file-changed builds, for --fast-incremental.
+
+  * The implicit dependencies of every target (the headers its sources
+    include) are taken from the .sconsign file instead of scanning the
+    sources again, unless a source changed (SCons' --implicit-cache).
+  * A file whose timestamp didn't change is taken as unchanged without
+    hashing it (the MD5-timestamp decider).
+  * The content signature of a file that didn't change is reused as long
+    as the file is older than MAX_DRIFT seconds, instead of two days.
+
+On its own, --implicit-cache misses a header that starts shadowing another
+one: a new directory in CPPPATH, or a header installed under
+MB_INCLUDE_DIR with the same name as one found later in CPPPATH. So the
+cached dependencies of a target are only used if its CPPPATH is the same
+as when they were scanned, and everything is scanned again when the list
+of headers under MB_INCLUDE_DIR changes.
+'''
+
+NAME = 'fast_incremental'
+
+# Files edited in the last second might change again within the same
+# timestamp
+MAX_DRIFT = 1
+
+_path = None
+_original_init = None
+_original_get_stored_implicit = None
+_original_visited = None
+_include_dirs = set()
+_dirty = False
+# {'headers': fingerprint of the installed headers,
+#  'targets': {target path: CPPPATH its dependencies were scanned with}}
+_state = None
+# id(env) -> env's CPPPATH
+_cpppaths = {}
+
+def _cpppath(node):
+    env = node.get_build_env()
+    try:
+        return _cpppaths[id(env)]
+    except KeyError:
+        cpppath = _cpppaths[id(env)] = env.subst('$CPPPATH')
+        return cpppath
+
+def _headers_fingerprint():
+    md5 = hashlib.md5()
+    for include_dir in sorted(_include_dirs):
+        md5.update(include_dir.encode('utf-8') + b'\0')
+        names = []
+        for root, dirs, files in os.walk(include_dir):
+            relative = os.path.relpath(root, include_dir)
+            names.extend(os.path.join(relative, name) for name in files)
+        for name in sorted(names):
+            md5.update(name.encode('utf-8') + b'\0')
+    return md5.hexdigest()
+
+def _get_stored_implicit(self):
+    if _state is not None:
+        targets = _state['targets']
+        if targets.get(str(self)) != _cpppath(self):
+            return None
+    return _original_get_stored_implicit(self)
+
+def _visited(self):
+    global _dirty
+    _original_visited(self)
+    if _state is not None and self.has_builder():
+        path = str(self)
+        cpppath = _cpppath(self)
+        if _state['targets'].get(path) != cpppath:
+            _state['targets'][path] = cpppath
+            _dirty = True
+
+def _init(self, targets=[], tasker=None, order=None, trace=None):
+    global _state, _dirty
+    _original_init(self, targets, tasker, order, trace)
+    if _state is not None:
+        return
+    headers = _headers_fingerprint()
+    _state = persistent.load(_path, {})
+    if _state.get('headers') != headers:
+        if _state:
+            print('Fast incremental: the headers in {} changed, scanning '
+                  'for dependencies again'.format(
+                    ', '.join(sorted(_include_dirs))))
+        _state = {'headers': headers, 'targets': {}}
+        _dirty = True
+
+def _finish():
+    if _dirty and not SCons.Script.GetOption('no_exec'):
+        persistent.save(_path, _state)
+
+def watch_headers(include_dir):
+    ''' Scan for dependencies again when the headers in include_dir
+        change '''
+    if _path is not None:
+        _include_dirs.add(os.path.abspath(include_dir))
+
+def setup(env):
+    ''' Make incremental builds of everything built with env fast '''
+    global _path, _original_init
+    global _original_get_stored_implicit, _original_visited
+    env.Decider('MD5-timestamp')
+    if _path is not None:
+        return
+    env.SetOption('implicit_cache', 1)
+    env.SetOption('max_drift', MAX_DRIFT)
+    _path = persistent.cache_path(env, NAME)
+    _original_init = SCons.Taskmaster.Taskmaster.__init__
+    SCons.Taskmaster.Taskmaster.__init__ = _init
+    _original_get_stored_implicit = SCons.Node.FS.File.get_stored_implicit
+    SCons.Node.FS.File.get_stored_implicit = _get_stored_implicit
+    _original_visited = SCons.Node.FS.File.visited
+    SCons.Node.FS.File.visited = _visited
+    atexit.register(_finish)
@@ -0,0 +1,101 @@
+# Copyright 2013 MakerBot Industries
+
+import os
+
+import SCons.Action
+import SCons.Util
+
+'''
+Settings for --fast-link, which cuts the time spent linking debug builds.
+
+Binaries are linked with lld or gold instead of the default bfd linker when
+the compiler can use them. Debug builds also compile with -gsplit-dwarf, so
+most of the debug info goes into a .dwo file next to each object and the
+linker never has to copy it. The linker then writes a --gdb-index, so gdb
+doesn't have to index the binary again every time it loads it.
+
+The .dwo files of each binary are packed into a .dwp next to it, which is
+what gets installed.
+'''
+
+# Fastest first, bfd isn't worth asking for
+FAST_LINKERS = ['lld', 'gold']
+
+SPLIT_DWARF_FLAG = '-gsplit-dwarf'
+
+def linker(env):
+    ''' Returns the fastest linker the compiler can use, or None '''
+    linkers = env.MBCompilerLinkers()
+    for l in FAST_LINKERS:
+        if l in linkers:
+            return l
+    return None
+
+def _dwp_tool(env):
+    for tool in ['llvm-dwp', 'dwp']:
+        path = env.WhereIs(tool) or SCons.Util.WhereIs(tool)
+        if path is not None:
+            return path
+    return None
+
+def debug_flags(env, compress=False):
+    ''' Compiler flags to use along with -g '''
+    flags = []
+    if env.MBCompilerSupportsFlag(SPLIT_DWARF_FLAG):
+        flags.append(SPLIT_DWARF_FLAG)
+        dwp_tool = _dwp_tool(env)
+        # binutils' dwp crashes on DWARF 5, which newer compilers default to
+        if (dwp_tool is not None and
+                os.path.basename(dwp_tool) == 'dwp' and
+                env.MBCompilerSupportsFlag('-gdwarf-4')):
+            flags.append('-gdwarf-4')
+    elif compress and env.MBCompilerSupportsFlag('-gz'):
+        # Neither dwp tool can read compressed .dwo files, so with split
+        # DWARF only the linked binary gets compressed
+        flags.append('-gz')
+    return flags
+
+def link_flags(env, compress=False):
+    ''' Linker flags for the fastest available linker '''
+    flags = []
+    fast_linker = linker(env)
+    if fast_linker is not None:
+        flags.append('-fuse-ld=' + fast_linker)
+        if env.MBDebugBuild():
+            gdb_index = flags + ['-Wl,--gdb-index']
+            if env.MBCompilerSupportsFlag(' '.join(gdb_index), link=True):
+                flags = gdb_index
+    if compress and env.MBCompilerSupportsFlag('-gz', link=True):
+        flags.append('-gz')
+    return flags
+
+def uses_split_dwarf(env):
+    return SPLIT_DWARF_FLAG in env.subst('$CCFLAGS $CXXFLAGS').split()
+
+def package_debug_info(env, binary):
+    ''' Pack the .dwo files of binary into a .dwp next to it
+
+        Returns the .dwp, or an empty list if there's no dwp tool. The
+        .dwo files are cleaned with the binary either way. '''
+    for b in binary:
+        for o in b.sources:
+            if o.has_builder():
+                env.Clean(binary, os.path.splitext(o.abspath)[0] + '.dwo')
+    dwp_tool = _dwp_tool(env)
+    if dwp_tool is None:
+        return []
+    dwp = env.Command(
+        binary[0].abspath + '.dwp',
+        binary,
+        SCons.Action.Action(
+            '$MB_DWP -e $SOURCE -o $TARGET', '$MB_DWPCOMSTR'),
+        MB_DWP=dwp_tool)
+    binary[0].attributes.mb_dwp = dwp
+    return dwp
+
+def debug_info(env, source):
+    ''' Returns the .dwp files packaged for the binaries in source '''
+    result = []
+    for node in env.arg2nodes(SCons.Util.flatten(source), env.fs.Entry):
+        result.extend(getattr(node.attributes, 'mb_dwp', []))
+    return result
@@ -0,0 +1,199 @@
+# Copyright 2013 MakerBot Industries
+
+import atexit
+import binascii
+import hashlib
+import os
+import threading
+import time
+
+import SCons.Node.FS
+import SCons.Script
+import SCons.Taskmaster
+
+import persistent
+import system_resources
+import workers
+
+'''
+Content signatures of big files from a cache, for --hash-cache.
+
+SCons hashes a file with MD5 whenever it can't reuse the signature it
+stored (by default, for every file changed in the last two days). For the
+meshes, images and other resources that get installed or compiled into
+.qrc files, that's most of the time of a build that changes little.
+
+With the hash cache, the content signature of a resource (a file with one
+of SUFFIXES) or of any file of at least LARGE_FILE bytes comes from a
+table keyed on the file's path, size, mtime and inode. The table is kept
+in the project's .mb_cache. Misses are hashed with MD5, like SCons does:
+the signatures are the ones SCons would compute, so the build cache keys
+and .sconsign stay the same with or without the hash cache, on every
+machine.
+
+When the build starts, every such source file SCons knows of that isn't
+in the table is hashed ahead, by a thread per CPU. Every decider compares
+content signatures, so they all use the table from then on. Files that
+were changed less than RACY_SECONDS before they were hashed aren't put in
+the table, since they could change again without their mtime changing.
+'''
+
+NAME = 'hash_cache'
+
+SUFFIXES = frozenset([
+    # Images
+    '.png', '.jpg', '.jpeg', '.gif', '.bmp', '.tga', '.tif', '.tiff',
+    '.svg', '.ico', '.icns', '.webp',
+    # Meshes and prints
+    '.stl', '.ply', '.3mf', '.amf', '.gcode', '.makerbot', '.thing',
+    # Fonts, sounds and movies
+    '.ttf', '.otf', '.wav', '.mp3', '.ogg', '.mp4', '.mov',
+    # Archives
+    '.zip', '.gz', '.bz2', '.xz', '.tar',
+])
+
+LARGE_FILE = 1024 * 1024
+
+RACY_SECONDS = 2
+
+_BLOCK_SIZE = 1024 * 1024
+
+# Kept with the table, tables of other hashes are dropped
+ALGORITHM = 'md5'
+
+_lock = threading.Lock()
+_path = None
+_dirty = False
+# path -> (size, mtime in ns, inode, digest)
+_table = None
+# path -> Event set once the file was hashed ahead
+_pending = {}
+_original_get_csig = None
+_original_init = None
+_prefetched = False
+
+def _stamp(st):
+    mtime = getattr(st, 'st_mtime_ns', None)
+    if mtime is None:
+        mtime = int(st.st_mtime * 1000000000)
+    return (st.st_size, mtime, st.st_ino)
+
+def _hash(path):
+    result = hashlib.md5()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(_BLOCK_SIZE), b''):
+            result.update(block)
+    return result.digest()
+
+def _compute(path):
+    ''' Hash the file at path, and remember it unless it was just changed '''
+    global _dirty
+    # The stat is taken before reading, so a change while reading shows
+    # up as a different stamp next time
+    st = os.stat(path)
+    digest = _hash(path)
+    if time.time() - st.st_mtime >= RACY_SECONDS:
+        with _lock:
+            _table[path] = _stamp(st) + (digest,)
+            _dirty = True
+    return digest
+
+def _hash_ahead(path):
+    try:
+        _compute(path)
+    except (IOError, OSError):
+        pass
+    finally:
+        _pending[path].set()
+
+def _eligible(node, st):
+    return (st is not None and
+            (os.path.splitext(node.name)[1].lower() in SUFFIXES or
+             st.st_size >= LARGE_FILE))
+
+def digest(node):
+    ''' The content signature of node, from the table if it's there '''
+    path = node.get_abspath()
+    event = _pending.get(path)
+    if event is not None:
+        event.wait()
+    entry = _table.get(path)
+    if entry is not None and entry[:3] == _stamp(node.stat()):
+        result = entry[3]
+    else:
+        result = _compute(path)
+    return str(binascii.hexlify(result).decode('ascii'))
+
+def _get_csig(self):
+    ninfo = self.get_ninfo()
+    try:
+        return ninfo.csig
+    except AttributeError:
+        pass
+    if not _eligible(self, self.stat()):
+        return _original_get_csig(self)
+    try:
+        csig = digest(self)
+    except (IOError, OSError):
+        return _original_get_csig(self)
+    ninfo.csig = csig
+    return csig
+
+def _known_files(fs):
+    ''' The source files SCons has nodes for '''
+    stack = list(set(fs.Root.values()))
+    while stack:
+        directory = stack.pop()
+        for name, entry in list(directory.entries.items()):
+            if name in ('.', '..'):
+                continue
+            if isinstance(entry, SCons.Node.FS.Dir):
+                stack.append(entry)
+            elif not entry.has_builder():
+                yield entry
+
+def _prefetch(fs):
+    pool = None
+    for node in _known_files(fs):
+        st = node.stat()
+        if not _eligible(node, st) or not os.path.isfile(node.get_abspath()):
+            continue
+        path = node.get_abspath()
+        entry = _table.get(path)
+        if path in _pending or (entry is not None and entry[:3] == _stamp(st)):
+            continue
+        if pool is None:
+            pool = workers.Workers(system_resources.usable_cpus() or 1)
+        _pending[path] = threading.Event()
+        pool.put(_hash_ahead, path)
+
+def _init(self, targets=[], tasker=None, order=None, trace=None):
+    global _prefetched
+    _original_init(self, targets, tasker, order, trace)
+    if _prefetched or SCons.Script.GetOption('clean'):
+        return
+    _prefetched = True
+    _prefetch(SCons.Node.FS.get_default_fs())
+
+def _save():
+    if not _dirty:
+        return
+    with _lock:
+        table = dict((path, entry) for path, entry in _table.items()
+                     if os.path.exists(path))
+    persistent.save(_path, (ALGORITHM, table))
+
+def setup(env):
+    ''' Get the content signatures of big files from the hash cache '''
+    global _path, _table, _original_get_csig, _original_init
+    if _path is not None:
+        return
+    _path = persistent.cache_path(env, NAME)
+    algorithm, _table = persistent.load(_path, (ALGORITHM, {}))
+    if algorithm != ALGORITHM:
+        _table = {}
+    _original_get_csig = SCons.Node.FS.File.get_csig
+    SCons.Node.FS.File.get_csig = _get_csig
+    _original_init = SCons.Taskmaster.Taskmaster.__init__
+    SCons.Taskmaster.Taskmaster.__init__ = _init
+    atexit.register(_save)
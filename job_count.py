@@ -0,0 +1,170 @@
+# Copyright 2013 MakerBot Industries
+
+import atexit
+import errno
+import os
+import sys
+import threading
+
+import SCons.Platform.posix
+import SCons.Script.Main
+
+import build_hooks
+import persistent
+import system_resources
+
+'''
+Picks -j when it isn't given.
+
+The number of jobs is the number of CPUs we may use (affinity and cgroup
+quotas included), lowered if that many compiles wouldn't fit in the
+available memory. The memory a compile takes is learned: in builds that
+pick -j, the peak RSS of every compile (the actions in the compile pool) is
+recorded in the project's .mb_cache, and the biggest one is used. Until
+there is one, DEFAULT_COMPILE_MEMORY is used. Builds given -j spawn
+processes the way SCons does.
+
+Peak RSS is measured by waiting for the compiler with wait4(), so it is
+only learned where SCons spawns with spawnvpe (POSIX in SCons 2.x).
+'''
+
+NAME = 'compile_memory'
+
+DEFAULT_COMPILE_MEMORY = 1024 ** 3
+
+# ru_maxrss is in kilobytes on Linux, bytes on OS X
+RSS_UNIT = 1 if sys.platform == 'darwin' else 1024
+
+_lock = threading.Lock()
+# peak RSS of the processes the current task of each thread ran
+_local = threading.local()
+# absolute target path -> peak bytes
+_peaks = None
+_path = None
+_dirty = False
+_original_exec_spawnvpe = None
+_enabled = False
+
+def _load(env):
+    global _peaks, _path
+    if _peaks is None:
+        _path = persistent.cache_path(env, NAME)
+        _peaks = persistent.load(_path, {})
+    return _peaks
+
+def _save():
+    if _dirty:
+        with _lock:
+            persistent.save(_path, _peaks)
+
+def _wait4(pid):
+    while True:
+        try:
+            return os.wait4(pid, 0)
+        except OSError as e:
+            if e.errno != errno.EINTR:
+                raise
+
+def _exec_spawnvpe(l, env):
+    peaks = getattr(_local, 'peaks', None)
+    if peaks is None:
+        return _original_exec_spawnvpe(l, env)
+    pid = os.spawnvpe(os.P_NOWAIT, l[0], l, env)
+    pid, status, usage = _wait4(pid)
+    peaks.append(usage.ru_maxrss * RSS_UNIT)
+    # The same as os.spawnvpe with P_WAIT returns
+    if os.WIFSIGNALED(status):
+        return -os.WTERMSIG(status)
+    return os.WEXITSTATUS(status)
+
+def _is_compile(task):
+    return any(getattr(t.attributes, 'mb_pool', None) == 'compile'
+               for t in task.targets)
+
+def _measure(task, execute):
+    global _dirty
+    if not _is_compile(task):
+        return execute()
+    _local.peaks = []
+    try:
+        return execute()
+    finally:
+        peaks = _local.peaks
+        _local.peaks = None
+        if peaks:
+            with _lock:
+                _peaks[task.targets[0].get_abspath()] = max(peaks)
+                _dirty = True
+
+def measure(env):
+    ''' Record the peak memory of compiles from now on '''
+    global _original_exec_spawnvpe
+    if _original_exec_spawnvpe is not None:
+        return
+    if not (hasattr(os, 'wait4') and
+            hasattr(SCons.Platform.posix, 'exec_spawnvpe')):
+        return
+    _load(env)
+    _original_exec_spawnvpe = SCons.Platform.posix.exec_spawnvpe
+    SCons.Platform.posix.exec_spawnvpe = _exec_spawnvpe
+    build_hooks.add(_measure)
+    atexit.register(_save)
+
+def compile_memory(env):
+    ''' Bytes the biggest recorded compile took, or None '''
+    peaks = _load(env)
+    if not peaks:
+        return None
+    return max(peaks.values())
+
+def _megabytes(size):
+    return '{} MiB'.format(size // 1024 ** 2)
+
+def choose(env):
+    ''' Returns (jobs, [why]) '''
+    reasons = []
+    cpus = system_resources.usable_cpus()
+    if cpus is None:
+        jobs = 1
+        reasons.append('the number of CPUs is unknown')
+    else:
+        jobs = cpus
+        reasons.append('{} usable CPUs'.format(cpus))
+    memory = system_resources.available_memory()
+    per_compile = compile_memory(env)
+    if per_compile is None:
+        per_compile = DEFAULT_COMPILE_MEMORY
+        learned = 'guessed, no compile was measured yet'
+    else:
+        learned = 'the biggest compile measured'
+    if memory is None:
+        reasons.append('available memory is unknown')
+    else:
+        fit = max(1, memory // per_compile)
+        reasons.append('{} available fits {} compiles of {} ({})'.format(
+            _megabytes(memory), fit, _megabytes(per_compile), learned))
+        jobs = min(jobs, fit)
+    return jobs, reasons
+
+def _jobs_given():
+    values = SCons.Script.Main.OptionsParser.values
+    try:
+        return ('num_jobs' in values.__dict__ or
+                'num_jobs' in values.__dict__['__SConscript_settings__'])
+    except (AttributeError, KeyError):
+        # SCons keeps these to itself, if they moved leave -j alone
+        return True
+
+def enable(env):
+    ''' Set -j, unless it was given on the command line or by SetOption '''
+    global _enabled
+    if _enabled:
+        return
+    _enabled = True
+    if _jobs_given():
+        env.MBLogSpam('Using -j {} as given'.format(env.GetOption('num_jobs')))
+        return
+    measure(env)
+    jobs, reasons = choose(env)
+    env.SetOption('num_jobs', jobs)
+    env.MBLogSpam('Using -j {}: {}'.format(jobs, ', '.join(reasons)))
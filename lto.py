@@ -0,0 +1,130 @@
+# Copyright 2013 MakerBot Industries
+
+import os
+import re
+
+import SCons.Script
+import SCons.Util
+
+'''
+Link-time optimization for --lto=full|thin.
+
+The flags are set on the whole environment, so every object, static
+archive and binary agrees on them. Static archives are created with the
+compiler's own ar and ranlib wrappers (gcc-ar or llvm-ar). Plain ar can't
+index the symbols of objects that only contain LTO bitcode.
+
+The optimizing link runs as many jobs as SCons runs (-j), read when the
+link runs, so an SConstruct that sets -j after the tools are set up is
+taken into account.
+'''
+
+MODES = ['off', 'full', 'thin']
+
+# The tools set up every environment the same way, only say things once
+_warnings = set()
+
+def _warn(message):
+    if message not in _warnings:
+        _warnings.add(message)
+        print(message)
+
+def _compiler(env):
+    command = SCons.Util.CLVar(env.subst('$CXX'))
+    # Skip launchers like ccache
+    for word in command:
+        if re.search(r'(g\+\+|clang\+\+)', os.path.basename(word)):
+            return os.path.basename(word)
+    return os.path.basename(command[-1]) if command else ''
+
+def _find_tool(env, names):
+    for name in names:
+        path = env.WhereIs(name) or SCons.Util.WhereIs(name)
+        if path is not None:
+            return path
+    return None
+
+def _archive_tools(env, family):
+    ''' Returns (ar, ranlib) matching the compiler, or (None, None) '''
+    compiler = _compiler(env)
+    if family == 'gcc':
+        # g++-9 goes with gcc-ar-9, x86_64-linux-gnu-g++ with
+        # x86_64-linux-gnu-gcc-ar
+        match = re.match(r'(.*)g\+\+(.*)', compiler)
+        prefix, suffix = match.groups() if match else ('', '')
+        names = [prefix + 'gcc-{}' + suffix, 'gcc-{}']
+    else:
+        # clang++-14 goes with llvm-ar-14
+        match = re.match(r'.*clang\+\+(.*)', compiler)
+        suffix = match.group(1) if match else ''
+        names = ['llvm-{}' + suffix, 'llvm-{}']
+    ar = _find_tool(env, [n.format('ar') for n in names])
+    ranlib = _find_tool(env, [n.format('ranlib') for n in names])
+    if ar is None or ranlib is None:
+        return None, None
+    return ar, ranlib
+
+def _jobs(target, source, env, for_signature):
+    return str(SCons.Script.GetOption('num_jobs') or 1)
+
+def setup(env, mode):
+    ''' Set env up for link-time optimization
+
+        mode is one of MODES. Returns the mode actually used. '''
+    if mode == 'off':
+        return mode
+    family = env.MBCompilerFamily()
+    if family not in ['gcc', 'clang']:
+        _warn('LTO is only set up for gcc and clang, building without it')
+        return 'off'
+
+    if family == 'gcc':
+        if mode == 'thin':
+            # gcc has no ThinLTO; its regular LTO is already partitioned
+            # and runs in parallel
+            _warn('gcc has no ThinLTO, using its parallel LTO instead')
+            mode = 'full'
+        compile_flags = ['-flto']
+        link_flags = ['-flto']
+        job_flags = ['-flto={}']
+    else:
+        if mode == 'thin' and not env.MBCompilerSupportsFlag(
+                '-flto=thin', link=True):
+            _warn('{} has no ThinLTO, using full LTO instead'.format(
+                env.subst('$CXX')))
+            mode = 'full'
+        compile_flags = ['-flto=thin' if mode == 'thin' else '-flto']
+        link_flags = list(compile_flags)
+        job_flags = []
+        # Full LTO in clang is a single job
+        if mode == 'thin' and env.MBIsLinux():
+            # Understood by lld and by the LLVM gold plugin
+            job_flags = ['-Wl,--plugin-opt=jobs={}']
+
+    # The job count doesn't change whether it links
+    link_command = ' '.join(link_flags + [f.format(2) for f in job_flags])
+    if not env.MBCompilerSupportsFlag(link_command, link=True):
+        _warn('{} can\'t link with {}, building without LTO'.format(
+            env.subst('$CXX'), link_command))
+        return 'off'
+    if job_flags:
+        # The job count doesn't change the result, so keep it out of the
+        # signature; otherwise changing -j would relink everything
+        env['MB_LTO_JOBS'] = _jobs
+        link_flags += (['$('] + [f.format('$MB_LTO_JOBS') for f in job_flags]
+                       + ['$)'])
+
+    # The Mac archiver understands bitcode already
+    if not env.MBIsMac():
+        ar, ranlib = _archive_tools(env, family)
+        if ar is not None:
+            env.Replace(AR=ar, RANLIB=ranlib)
+        elif family == 'gcc':
+            # Without gcc-ar, keep real object code in the objects too,
+            # plain ar can index that
+            compile_flags.append('-ffat-lto-objects')
+        else:
+            _warn('llvm-ar not found, static libraries may not link with LTO')
+
+    env.Append(CCFLAGS=compile_flags, LINKFLAGS=link_flags)
+    return mode
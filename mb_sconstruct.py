@@ -1,5 +1,21 @@
 
+import os
 import re
+import sys
+
+import SCons.Util
+
+sys.path.append(os.path.dirname(__file__))
+import build_cache
+import build_trace
+import content_signatures
+import critical_path
+import fast_incremental
+import hash_cache
+import job_count
+import remote_cache
+import scheduler
+import stat_prefetch
 
 NO_VARIANT = 'no_variant'
 
@@ -12,6 +28,115 @@ def common_arguments(env):
         help='Turns off the variant dir if it would be used. Mainly for use with IDEs. '
                 'Note that for python projects and on windows this is on by default.')
 
+    env.MBAddOption(
+        '--build-cache',
+        dest='build_cache',
+        metavar='DIR',
+        type='string',
+        action='store',
+        default='',
+        help='Caches built files in DIR, shared between builds, branches and '
+                'checkouts, and retrieves them instead of building them again.')
+
+    env.MBAddOption(
+        '--build-cache-size',
+        dest='build_cache_size',
+        metavar='SIZE',
+        type='string',
+        action='store',
+        default=build_cache.DEFAULT_MAX_SIZE,
+        help='Removes the least recently used files from the --build-cache when '
+                'it grows above SIZE (like 500M or 10G). Defaults to ' +
+                build_cache.DEFAULT_MAX_SIZE + '.')
+
+    env.MBAddOption(
+        '--build-cache-remote',
+        dest='build_cache_remote',
+        metavar='URL',
+        type='string',
+        action='store',
+        default='',
+        help='Also gets built files from, and puts them on, the cache server at URL '
+                '(see cache_server.py). Without --build-cache, the local cache is '
+                'kept in .mb_cache.')
+
+    env.MBAddOption(
+        '--build-cache-timeout',
+        dest='build_cache_timeout',
+        metavar='SECONDS',
+        type='float',
+        action='store',
+        default=remote_cache.DEFAULT_TIMEOUT,
+        help='Builds locally when the --build-cache-remote takes longer than SECONDS '
+                'to answer.')
+
+    env.MBAddOption(
+        '--build-trace',
+        dest='build_trace',
+        metavar='FILE',
+        type='string',
+        action='store',
+        default='',
+        help='Records when each action runs into FILE, in Chrome\'s trace event format '
+                '(open it with chrome://tracing or Perfetto).')
+
+    env.MBAddOption(
+        '--critical-path-report',
+        dest='critical_path_report',
+        action='store_true',
+        help='Records how long each action takes, and reports the critical path, '
+                'the best possible wall time at this -j and the biggest bottlenecks of '
+                'the build graph when done. Use with -n to report without building.')
+
+    env.MBAddOption(
+        '--critical-path-json',
+        dest='critical_path_json',
+        metavar='FILE',
+        type='string',
+        action='store',
+        default='',
+        help='Also writes the critical path report to FILE as JSON. '
+                'Implies --critical-path-report.')
+
+    env.MBAddOption(
+        '--duration-order',
+        dest='duration_order',
+        action='store_true',
+        help='Starts the actions that took longest last time first, instead of '
+                'building in the order the SConscripts list things. Helps most with -j.')
+
+    env.MBAddOption(
+        '--fast-incremental',
+        dest='fast_incremental',
+        action='store_true',
+        help='Makes builds that change little faster: reuses the header dependencies '
+                'found last time unless a source or its include path changed, and '
+                'skips hashing files whose timestamp didn\'t change.')
+
+    env.MBAddOption(
+        '--token-signatures',
+        dest='token_signatures',
+        action='store_true',
+        help='Ignores changes to comments and whitespace within lines of C and C++ '
+                'files when deciding what to rebuild. Adding or removing lines still '
+                'rebuilds. Columns in debug info may be off until the code is compiled '
+                'again.')
+
+    env.MBAddOption(
+        '--hash-cache',
+        dest='hash_cache',
+        action='store_true',
+        help='Keeps the signatures of resources and other big files in a cache keyed '
+                'on their size and mtime, and hashes the ones that changed ahead, in '
+                'parallel, with MD5, like SCons.')
+
+    env.MBAddOption(
+        '--stat-prefetch',
+        dest='stat_prefetch',
+        action='store_true',
+        help='Stats all known files at once when the build starts, instead of one '
+                'at a time as SCons gets to them. Helps most on network file systems.')
+
 def mb_use_variant_dir(env):
     return (not env.MBIsWindows() and not env.MBGetOption(NO_VARIANT))
 
@@ -21,6 +146,20 @@ def mb_variant_dir(env):
     else:
         return ''
 
+def mb_generated_dir(env, kind, target, shared=False):
+    ''' A directory in the variant dir for the files of kind that are
+        generated for target
+
+        It's named after the path of target in the project, so targets
+        with the same name in different SConscripts get different ones. '''
+    node = env.File(SCons.Util.flatten([target])[0]).srcnode()
+    return os.path.join(
+        '#',
+        env.MBVariantDir(),
+        kind,
+        'shared' if shared else 'static',
+        node.get_path(env.Dir('#')))
+
 def mb_strip_variant_dir(env, path):
     ''' If path starts with the variant dir, remove the dir '''
     return re.sub('^(\\\\|/)*' + env.MBVariantDir() + '(\\\\|/)*', '', path)
@@ -35,11 +174,42 @@ def generate(env):
     env.Tool('options')
     env.Tool('common')
     env.Tool('version')
+    env.Tool('log')
 
     common_arguments(env)
 
+    job_count.enable(env)
+
+    build_cache_dir = env.MBGetOption('build_cache')
+    if env.MBGetOption('build_cache_remote'):
+        remote_cache.setup(
+            env.MBGetOption('build_cache_remote'),
+            env.MBGetOption('build_cache_timeout'))
+        build_cache_dir = build_cache_dir or build_cache.default_path(env)
+    if build_cache_dir:
+        build_cache.setup(
+            env,
+            build_cache_dir,
+            build_cache.parse_size(env.MBGetOption('build_cache_size')))
+    if env.MBGetOption('build_trace'):
+        build_trace.enable(env.MBGetOption('build_trace'))
+    if (env.MBGetOption('critical_path_report') or
+            env.MBGetOption('critical_path_json')):
+        critical_path.enable(env, env.MBGetOption('critical_path_json'))
+    if env.MBGetOption('duration_order'):
+        scheduler.enable(env)
+    if env.MBGetOption('fast_incremental'):
+        fast_incremental.setup(env)
+    if env.MBGetOption('token_signatures'):
+        content_signatures.setup(env)
+    if env.MBGetOption('hash_cache'):
+        hash_cache.setup(env)
+    if env.MBGetOption('stat_prefetch'):
+        stat_prefetch.enable()
+
     env.AddMethod(mb_use_variant_dir, 'MBUseVariantDir')
     env.AddMethod(mb_variant_dir, 'MBVariantDir')
+    env.AddMethod(mb_generated_dir, 'MBGeneratedDir')
     env.AddMethod(mb_strip_variant_dir, 'MBStripVariantDir')
     env.AddMethod(mb_sconscript, 'MBSConscript')
 
@@ -40,17 +40,22 @@ def set_test_paths(env):
         env.AppendENVPath('PATH', env['MB_BIN_DIR'])
 
 
-def mb_add_test(env, name, action, deps=(), **kwargs):
+def mb_add_test(env, name, action, deps=(), pgo_training=False, **kwargs):
     """
     Add a test that will always be run when the "test" target is
     selected.  You can specify targets that must be built before
     the test is run with deps, but the test will still run even
     if no dependency has changed.
+
+    Tests with pgo_training=True are also run by the "pgo-train"
+    target, as the workload for profile-guided optimization.
     """
     target = env.Command('run_' + name, deps, action, **kwargs)
     env.Depends(env['_test_alias'], target)
     env.AlwaysBuild(target)
     env.Ignore('.', target)
+    if pgo_training:
+        env.MBAddPGOTraining(target)
 
 
 def generate(env):
@@ -0,0 +1,125 @@
+# Copyright 2013 MakerBot Industries
+
+import os
+
+import SCons.Defaults
+
+'''
+Keeps the location of the checkout out of build signatures and compiler
+outputs, for --normalize-paths, so checkouts in different places share
+build cache entries.
+
+SCons leaves the include and library paths out of signatures already
+($_CPPINCFLAGS and $_LIBDIRFLAGS are inside $( $)). The absolute paths
+that did get into them were the -include of a compiled header's wrapper,
+and the #include lines of the generated wrapper and unity files (the
+Value nodes they're built from). Each of those made every object of the
+target miss the cache in another checkout.
+
+The base directory is the common parent of the project and the install
+prefix (the same one ccache gets). With normalization on:
+
+  * generated files (compiled header wrappers, unity files) include
+    sources by relative paths, and -include names the wrapper relative to
+    the project root, where SCons runs commands.
+  * include paths under the base directory are passed to the compiler
+    relative to the project root too. That doesn't change a signature,
+    but keeps the command lines the same for compiler caches, and the
+    paths the compiler writes out relative. CPPPATH itself isn't touched,
+    so the scanner still finds the same headers.
+  * -ffile-prefix-map (-fdebug-prefix-map on older compilers) rewrites
+    the base directory and the project root in debug info and __FILE__,
+    to the same relative paths. The flags are inside $( $), so they don't
+    change any signature themselves.
+
+Paths outside the base directory (system and third party paths) are the
+same on every machine and are left alone.
+'''
+
+ENABLED = 'MB_NORMALIZE_PATHS'
+
+# SCons' own _CPPINCFLAGS, with relative_dirs instead of RDirs
+CPPINCFLAGS = ('$( ${_concat(INCPREFIX, CPPPATH, INCSUFFIX, __env__, '
+               'MB_RELATIVE_DIRS, TARGET, SOURCE)} $)')
+
+_root = None
+_base = None
+
+def common_parent(paths):
+    ''' The deepest directory all of paths are in '''
+    return os.path.dirname(os.path.commonprefix(
+        [os.path.join(os.path.abspath(p), '') for p in paths]))
+
+def _under_base(path):
+    return path == _base or path.startswith(os.path.join(_base, ''))
+
+def _relative(path):
+    if os.path.isabs(path) and _under_base(path):
+        return os.path.relpath(path, _root)
+    return path
+
+def relative_dirs(dirs):
+    ''' RDirs, rendering the directories under the base relative to the
+        project root '''
+    # RDirs finds TARGET up the stack, in the subst() we're called from
+    nodes = SCons.Defaults.ConstructionEnvironment['RDirs'](dirs)
+    if nodes is None:
+        nodes = dirs
+    result = []
+    for node in nodes:
+        if hasattr(node, 'get_abspath'):
+            relative = _relative(node.get_abspath())
+            result.append(node if os.path.isabs(relative) else relative)
+        else:
+            result.append(node)
+    return result
+
+def enabled(env):
+    return bool(env.get(ENABLED))
+
+def relative(env, path):
+    ''' path relative to the project root, if normalizing applies to it '''
+    if not enabled(env):
+        return path
+    return _relative(path)
+
+def include_path(env, path, directory):
+    ''' How a file generated in directory should #include path '''
+    if not enabled(env) or not _under_base(path):
+        return path
+    return os.path.relpath(path, directory)
+
+def prefix_map_flags(env):
+    ''' Flags mapping the base directory and the project root to relative
+        paths in the compiler's output '''
+    if not enabled(env) or env.MBIsWindows():
+        return []
+    if env.MBCompilerSupportsFlag('-ffile-prefix-map=/a=b'):
+        option = '-ffile-prefix-map'
+    elif env.MBCompilerSupportsFlag('-fdebug-prefix-map=/a=b'):
+        option = '-fdebug-prefix-map'
+    else:
+        return []
+    # The last map that matches is used, so the more specific root goes
+    # after the base
+    maps = []
+    if _base != _root:
+        maps.append((_base, os.path.relpath(_base, _root)))
+    maps.append((_root, '.'))
+    return (['$('] +
+            ['{}={}={}'.format(option, old, new) for old, new in maps] +
+            ['$)'])
+
+def setup(env, base_paths):
+    ''' Normalize paths in everything built with env. base_paths are the
+        directories outside the project whose paths end up in commands. '''
+    global _root, _base
+    if _root is None:
+        _root = env.Dir('#').abspath
+        _base = common_parent([_root] + base_paths)
+        # A base directory of / would make every path relative
+        if os.path.dirname(_base) == _base:
+            _base = _root
+    env[ENABLED] = True
+    env['MB_RELATIVE_DIRS'] = relative_dirs
+    env['_CPPINCFLAGS'] = CPPINCFLAGS
@@ -0,0 +1,47 @@
+# Copyright 2013 MakerBot Industries
+
+import os
+import pickle
+
+'''
+Helpers for state that the MB tools keep between SCons runs.
+
+Everything lives in a '.mb_cache' directory next to the .sconsign file at
+the top of the project. Any of it can be deleted at any time; the tools
+treat a missing or unreadable file as a cold cache.
+'''
+
+CACHE_DIR = '.mb_cache'
+
+# Protocol 2 is the newest one python 2 can read
+_PICKLE_PROTOCOL = 2
+
+def cache_path(env, name):
+    ''' Returns the path of the cache file called name for this project '''
+    return os.path.join(env.Dir('#').abspath, CACHE_DIR, name)
+
+def load(path, default):
+    ''' Load a cache file, returning default if it can't be read '''
+    try:
+        with open(path, 'rb') as cache_file:
+            return pickle.load(cache_file)
+    except Exception:
+        return default
+
+def save(path, data):
+    ''' Atomically replace the cache file at path with data '''
+    directory = os.path.dirname(path)
+    try:
+        os.makedirs(directory)
+    except OSError:
+        if not os.path.isdir(directory):
+            raise
+    temp_path = '{}.{}.tmp'.format(path, os.getpid())
+    with open(temp_path, 'wb') as cache_file:
+        pickle.dump(data, cache_file, _PICKLE_PROTOCOL)
+    try:
+        os.rename(temp_path, path)
+    except OSError:
+        # Windows won't rename over an existing file
+        os.remove(path)
+        os.rename(temp_path, path)
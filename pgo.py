@@ -0,0 +1,253 @@
+# Copyright 2013 MakerBot Industries
+
+import glob
+import hashlib
+import json
+import os
+
+import SCons.Action
+import SCons.Errors
+import SCons.Util
+
+'''
+Profile-guided optimization for --pgo=generate|use.
+
+With --pgo=generate everything is built instrumented, and the 'pgo-train'
+target runs the tests added with MBAddTest(..., pgo_training=True) as the
+training workload. Profiles from earlier training are removed first, and
+afterwards the raw profiles are merged (clang needs llvm-profdata for that,
+gcc merges as it goes).
+
+Training also writes a manifest with the content signature of every source
+of every MB binary the training tests depend on, the binaries they run and
+the libraries those link. With --pgo=use everything is rebuilt with the
+profiles. Binaries the training didn't run are reported, and so are ones
+whose sources changed since the training, since the compiler quietly
+ignores the profile for functions that changed.
+'''
+
+MODES = ['off', 'generate', 'use']
+
+TRAIN_ALIAS = 'pgo-train'
+
+MANIFEST_NAME = 'manifest.json'
+
+CLANG_PROFILE_NAME = 'default.profdata'
+
+_PROFILE_PATTERNS = ['*.gcda', '*.profraw', CLANG_PROFILE_NAME]
+
+# profile directory -> (reset node, merge node)
+_training = {}
+# binary path -> its source nodes, for the binaries built in this run
+_binaries = {}
+# profile directory -> manifest read for --pgo=use
+_manifests = {}
+# binaries we already warned about
+_warned = set()
+
+def _warn(key, message):
+    if key not in _warned:
+        _warned.add(key)
+        print(message)
+
+def _profile_dir(env):
+    return env['MB_PGO_DIR']
+
+def _profdata_tool(env):
+    return env.WhereIs('llvm-profdata') or SCons.Util.WhereIs('llvm-profdata')
+
+def _has_profiles(env, family):
+    directory = _profile_dir(env)
+    if family == 'clang':
+        return os.path.exists(os.path.join(directory, CLANG_PROFILE_NAME))
+    for parent, dirnames, filenames in os.walk(directory):
+        if any(f.endswith('.gcda') for f in filenames):
+            return True
+    return False
+
+def _flags(env, mode, family):
+    directory = _profile_dir(env)
+    if mode == 'generate':
+        flags = ['-fprofile-generate=' + directory]
+        # Our OpenMP code would lose counts without this
+        if env.MBCompilerSupportsFlag('-fprofile-update=atomic'):
+            flags.append('-fprofile-update=atomic')
+        return flags
+    if family == 'clang':
+        return ['-fprofile-use=' + os.path.join(directory, CLANG_PROFILE_NAME)]
+    flags = ['-fprofile-use=' + directory, '-fprofile-correction']
+    # Code the training never ran has no profile, that's fine
+    if env.MBCompilerSupportsFlag('-Wno-missing-profile'):
+        flags.append('-Wno-missing-profile')
+    return flags
+
+def setup(env, mode, directory):
+    ''' Set env up for PGO mode (one of MODES), keeping profiles in
+        directory. Returns the mode actually used. '''
+    env['MB_PGO_MODE'] = 'off'
+    env['MB_PGO_DIR'] = directory
+    if mode == 'off':
+        return mode
+    family = env.MBCompilerFamily()
+    if family not in ['gcc', 'clang']:
+        _warn(family, 'PGO is only set up for gcc and clang, building without it')
+        return 'off'
+    if mode == 'use' and not _has_profiles(env, family):
+        _warn(directory, 'No profiles in {}, run "scons {} --pgo=generate" '
+              'first. Building without PGO.'.format(directory, TRAIN_ALIAS))
+        return 'off'
+    flags = _flags(env, mode, family)
+    env.Append(CCFLAGS=flags, LINKFLAGS=flags)
+    env['MB_PGO_MODE'] = mode
+    return mode
+
+def _sources(binary):
+    ''' The source files of the objects binary is built from '''
+    sources = []
+    for b in binary:
+        for o in b.sources:
+            if o.has_builder():
+                sources.extend(s.srcnode() for s in o.sources)
+    return sources
+
+def _signatures(sources):
+    ''' Hashes the contents of sources
+
+        Asking SCons for content signatures while the SConscripts are
+        still being read keeps it from saving its own, so this reads the
+        files itself. '''
+    signatures = {}
+    for s in sources:
+        # Generated sources are covered by whatever they're generated from
+        if s.has_builder() or not os.path.isfile(s.abspath):
+            continue
+        with open(s.abspath, 'rb') as source_file:
+            signatures[s.path] = hashlib.md5(source_file.read()).hexdigest()
+    return signatures
+
+def _load_manifest(directory):
+    try:
+        return _manifests[directory]
+    except KeyError:
+        pass
+    try:
+        with open(os.path.join(directory, MANIFEST_NAME), 'r') as manifest:
+            result = json.load(manifest)
+    except (IOError, ValueError):
+        result = {}
+    _manifests[directory] = result
+    return result
+
+def track(env, binary):
+    ''' Take note of binary for the manifest, or check its profile '''
+    mode = env.get('MB_PGO_MODE', 'off')
+    if mode == 'generate':
+        _binaries[binary[0].abspath] = _sources(binary)
+    elif mode == 'use':
+        manifest = _load_manifest(_profile_dir(env))
+        name = binary[0].path
+        trained = manifest.get(binary[0].abspath)
+        if trained is None:
+            _warn(name, 'PGO: {} wasn\'t run by the last training, '
+                  'it has no profile'.format(name))
+            return
+        current = _signatures(_sources(binary))
+        changed = [p for p, csig in current.items() if trained.get(p) != csig]
+        if changed:
+            _warn(name, 'PGO: the profile for {} is stale, {} of its {} '
+                  'sources changed since the training ({}...)'.format(
+                    name, len(changed), len(current), sorted(changed)[0]))
+
+def _reset(target, source, env):
+    ''' Remove the profiles of an earlier training '''
+    directory = _profile_dir(env)
+    for parent, dirnames, filenames in os.walk(directory):
+        for pattern in _PROFILE_PATTERNS:
+            for path in glob.glob(os.path.join(parent, pattern)):
+                os.remove(path)
+    manifest = os.path.join(directory, MANIFEST_NAME)
+    if os.path.exists(manifest):
+        os.remove(manifest)
+
+def _dependencies(nodes):
+    ''' The absolute paths of everything nodes depend on '''
+    paths = set()
+    seen = set()
+    stack = list(nodes)
+    while stack:
+        node = stack.pop()
+        if id(node) in seen:
+            continue
+        seen.add(id(node))
+        path = getattr(node, 'abspath', None)
+        if path is not None:
+            paths.add(path)
+        stack.extend(node.children())
+    return paths
+
+def _merge(target, source, env):
+    ''' Merge the raw profiles and write the manifest '''
+    directory = _profile_dir(env)
+    raw_profiles = glob.glob(os.path.join(directory, '*.profraw'))
+    if raw_profiles:
+        tool = _profdata_tool(env)
+        if tool is None:
+            raise SCons.Errors.UserError(
+                'llvm-profdata is needed to merge the clang profiles')
+        result = env.Execute(SCons.Action.Action(
+            [[tool, 'merge', '-output=' +
+              os.path.join(directory, CLANG_PROFILE_NAME)] + raw_profiles]))
+        if result:
+            return result
+    # Only the binaries the training tests ran have a profile
+    trained = _dependencies(target[0].children())
+    manifest = dict((path, _signatures(sources))
+                    for path, sources in _binaries.items()
+                    if path in trained)
+    with open(os.path.join(directory, MANIFEST_NAME), 'w') as manifest_file:
+        json.dump(manifest, manifest_file, indent=2, sort_keys=True)
+    with open(str(target[0]), 'w') as stamp:
+        stamp.write('{} binaries trained\n'.format(len(manifest)))
+
+def _not_generating(target, source, env):
+    raise SCons.Errors.UserError(
+        'Training builds instrumented binaries, run it with --pgo=generate')
+
+def _training_nodes(env):
+    directory = _profile_dir(env)
+    try:
+        return _training[directory]
+    except KeyError:
+        pass
+    stamp = os.path.join(directory, 'trained')
+    if env.get('MB_PGO_MODE') == 'generate':
+        reset = env.Command(
+            os.path.join(directory, 'reset'),
+            [],
+            SCons.Action.Action(_reset, 'Removing old profiles'))
+        merge = env.Command(
+            stamp,
+            [],
+            SCons.Action.Action(_merge, 'Merging profiles'))
+        env.AlwaysBuild(reset, merge)
+    else:
+        reset = []
+        merge = env.Command(
+            stamp,
+            [],
+            SCons.Action.Action(_not_generating, None))
+        env.AlwaysBuild(merge)
+    env.Alias(TRAIN_ALIAS, merge)
+    # Only train when asked to
+    profile_dir = env.Dir(directory)
+    env.Ignore(profile_dir.up(), profile_dir)
+    nodes = (reset, merge)
+    _training[directory] = nodes
+    return nodes
+
+def add_training(env, target):
+    ''' Make target (a test run) part of the training workload '''
+    reset, merge = _training_nodes(env)
+    if reset:
+        env.Depends(target, reset)
+    env.Depends(merge, target)
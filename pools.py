@@ -0,0 +1,155 @@
+# Copyright 2013 MakerBot Industries
+
+import collections
+
+import SCons.Errors
+import SCons.Script
+import SCons.Taskmaster
+
+import system_resources
+
+'''
+Pools: named limits on how many actions of a kind run at once, like
+ninja's pools.
+
+Targets are put in a pool with MBSetPool (the MB builders do that for
+links, compiles, doxygen, msbuild and wheels). When the Taskmaster hands
+out a task whose pool is full, the task is held back and the Taskmaster is
+asked for another one, so a waiting link doesn't keep one of the -j slots
+from compiling. Held back tasks go first once their pool has room, in the
+order they were held back. The Taskmaster is only hooked once a target is
+put in a pool with a size, and a Taskmaster only holds tasks back if one of
+those pools is smaller than -j as it is when the Taskmaster is built (after
+any SetOption), since other pools never fill up.
+
+Pools without a size only have -j as their limit. The link pool is sized
+from the available memory by default, the pools of tools that are parallel
+or not safe to run twice at once get a size of 1. --pool=NAME:N sets the
+size of any pool.
+'''
+
+# Guess at the memory one link can take, for sizing the link pool. Debug
+# links of big shared libraries are the ones that matter.
+LINK_MEMORY = 2 * 1024 ** 3
+
+DEFAULT_SIZES = {
+    'doxygen': 1,
+    # msbuild runs its own parallel build
+    'msbuild': 1,
+    # setup.py bdist_wheel shares build/ between wheels of the same tree
+    'wheel': 1,
+}
+
+# pool -> most actions that can run at once, None for no limit
+_sizes = {}
+# pool -> actions running now
+_running = {}
+# pools targets were put in
+_tagged = set()
+_original_next_task = None
+_original_init = None
+
+def _limits(pool, jobs):
+    size = _sizes.get(pool)
+    return size is not None and size < jobs
+
+def tag(targets, pool):
+    ''' Put the actions building targets in pool '''
+    for target in targets:
+        target.attributes.mb_pool = pool
+    _tagged.add(pool)
+    if _original_next_task is None and _sizes.get(pool) is not None:
+        _hook()
+
+def _pool(task):
+    for target in task.targets:
+        pool = getattr(target.attributes, 'mb_pool', None)
+        if pool is not None:
+            return pool
+    return None
+
+def _has_room(pool):
+    size = _sizes.get(pool)
+    return size is None or _running.get(pool, 0) < size
+
+def _not_started(task):
+    raise SCons.Errors.BuildError(
+        task.targets[0], errstr='Not started, the build was stopped')
+
+def _start(task, pool, stopped=False):
+    if stopped:
+        # The task was held back and the build stopped since: its parents
+        # still have to hear that it didn't get built
+        task.execute = lambda: _not_started(task)
+        return task
+    _running[pool] = _running.get(pool, 0) + 1
+    postprocess = task.postprocess
+    def release():
+        _running[pool] -= 1
+        postprocess()
+    task.postprocess = release
+    return task
+
+def _init(self, targets=[], tasker=None, order=None, trace=None):
+    _original_init(self, targets, tasker, order, trace)
+    jobs = SCons.Script.GetOption('num_jobs') or 1
+    self.mb_limited = any(_limits(pool, jobs) for pool in _tagged)
+
+def _next_task(tm):
+    if not getattr(tm, 'mb_limited', True):
+        return _original_next_task(tm)
+    # Taskmaster.stop() makes it look for candidates with this
+    stopped = tm.next_candidate == tm.no_next_candidate
+    # pool -> the tasks held back for it, oldest first
+    held = tm.__dict__.setdefault('mb_held_tasks', {})
+    for pool, tasks in held.items():
+        if stopped or _has_room(pool):
+            task = tasks.popleft()
+            if not tasks:
+                del held[pool]
+            return _start(task, pool, stopped)
+    while True:
+        task = _original_next_task(tm)
+        if task is None:
+            return None
+        pool = _pool(task)
+        if (pool is None or task.exc_info()[0] is not None or
+                not task.needs_execute()):
+            return task
+        if _has_room(pool):
+            return _start(task, pool)
+        held.setdefault(pool, collections.deque()).append(task)
+
+def parse(specs):
+    ''' Returns {pool: size} for a list of 'pool:size' strings '''
+    sizes = {}
+    for spec in specs:
+        pool, sep, size = spec.partition(':')
+        if not sep or not pool or not size.isdigit() or int(size) < 1:
+            raise SCons.Errors.UserError(
+                '--pool takes NAME:N with N at least 1, not ' + repr(spec))
+        sizes[pool] = int(size)
+    return sizes
+
+def default_sizes():
+    sizes = dict(DEFAULT_SIZES)
+    memory = system_resources.available_memory()
+    if memory is not None:
+        sizes['link'] = max(1, memory // LINK_MEMORY)
+    return sizes
+
+def _hook():
+    global _original_next_task, _original_init
+    _original_next_task = SCons.Taskmaster.Taskmaster.next_task
+    SCons.Taskmaster.Taskmaster.next_task = _next_task
+    _original_init = SCons.Taskmaster.Taskmaster.__init__
+    SCons.Taskmaster.Taskmaster.__init__ = _init
+
+def enable(specs):
+    ''' Start limiting pools, with the sizes from --pool added to the defaults '''
+    _sizes.update(default_sizes())
+    _sizes.update(parse(specs))
+
+def sizes():
+    ''' Returns {pool: size} of the pools that are limited '''
+    return dict(_sizes)
@@ -0,0 +1,139 @@
+# Copyright 2013 MakerBot Industries
+
+import atexit
+import os
+import time
+
+import SCons.Action
+import SCons.Builder
+import SCons.Tool
+
+import path_normalization
+
+'''
+Precompiled headers for the C++ sources of MBProgram, MBSharedLibrary and
+MBStaticLibrary.
+
+A target that names a header gets a wrapper header that includes it, in a
+directory of the variant dir named after the target's path in the project
+(see MBGeneratedDir). The wrapper is compiled with the same command line as
+the target's C++ sources, with -x c++-header added. The sources are then
+compiled with -include of the wrapper. gcc and clang both use the compiled
+wrapper next to it (wrapper.h.gch or wrapper.h.pch) instead of parsing the
+headers again.
+
+The compiled header is scanned like a source file, so it depends on every
+header it pulls in, and every C++ object of the target depends on it.
+'''
+
+# C++ sources the compiled header applies to, like SCons' c++ tool
+CXX_SUFFIXES = ['.cpp', '.cc', '.cxx', '.c++', '.C++', '.mm', '.C']
+
+# $MB_COMPILER_LAUNCHER is set by --compiler-cache, $MB_TOOLCHAIN_* by
+# toolchain.py
+_STATIC_COMMAND = ('$( $MB_COMPILER_LAUNCHER $) '
+                   '$CXX -o $TARGET -x c++-header -c '
+                   '$CXXFLAGS $CCFLAGS $_CCCOMCOM $SOURCE $MB_TOOLCHAIN_CXX')
+_SHARED_COMMAND = ('$( $MB_COMPILER_LAUNCHER $) '
+                   '$SHCXX -o $TARGET -x c++-header -c '
+                   '$SHCXXFLAGS $SHCCFLAGS $_CCCOMCOM $SOURCE '
+                   '$MB_TOOLCHAIN_SHCXX')
+
+# absolute path of a compiled header -> time it started building
+_started = {}
+# absolute path of a compiled header -> seconds it took to build in this run
+_build_times = {}
+# absolute path of a compiled header -> number of objects compiled with it
+_users = {}
+_reporting = False
+
+def _write_wrapper(target, source, env):
+    with open(str(target[0]), 'w') as wrapper:
+        wrapper.write('#include "{}"\n'.format(source[0].read()))
+
+def _start_timer(target, source, env):
+    _started[target[0].abspath] = time.time()
+
+def _stop_timer(target, source, env):
+    path = target[0].abspath
+    _build_times[path] = time.time() - _started.pop(path)
+
+def _compile_builder(command, command_string):
+    return SCons.Builder.Builder(
+        action=[
+            SCons.Action.Action(_start_timer, None),
+            SCons.Action.Action(command, command_string),
+            SCons.Action.Action(_stop_timer, None)],
+        source_scanner=SCons.Tool.CScanner)
+
+_wrapper_builder = SCons.Builder.Builder(
+    action=SCons.Action.Action(_write_wrapper, None))
+_static_builder = _compile_builder(_STATIC_COMMAND, '$MB_PCHCOMSTR')
+_shared_builder = _compile_builder(_SHARED_COMMAND, '$MB_SHPCHCOMSTR')
+
+def precompiled_header(env, target, header, shared=False, **overrides):
+    ''' Build header as a precompiled header for target
+
+        overrides are the construction variables the target itself is
+        built with, so that the header is compiled the same way. Returns
+        (pch, flags), where flags make a C++ compile use the compiled
+        header. pch is empty if the compiler isn't gcc or clang. '''
+    global _reporting
+    family = env.MBCompilerFamily()
+    if family == 'clang':
+        suffix = '.pch'
+    elif family == 'gcc':
+        suffix = '.gch'
+    else:
+        return [], []
+    if not _reporting:
+        _reporting = True
+        atexit.register(_print_report)
+
+    header = env.File(header)
+    directory = env.MBGeneratedDir('pch', target, shared)
+    wrapper = _wrapper_builder(
+        env,
+        os.path.join(directory, header.name),
+        env.Value(path_normalization.include_path(
+            env, header.abspath, env.Dir(directory).abspath)))
+    builder = _shared_builder if shared else _static_builder
+    pch = builder(env, wrapper[0].abspath + suffix, wrapper, **overrides)
+
+    flags = ['-include',
+             path_normalization.relative(env, wrapper[0].abspath)]
+    if family == 'gcc' and env.MBCompilerSupportsFlag('-Winvalid-pch'):
+        # gcc silently parses the header instead if it can't use the
+        # compiled one; make sure we find out
+        flags.append('-Winvalid-pch')
+    return pch, flags
+
+def _is_cxx_object(node):
+    return (node.has_builder() and
+            len(node.sources) > 0 and
+            os.path.splitext(str(node.sources[0]))[1] in CXX_SUFFIXES)
+
+def use(env, binary, pch):
+    ''' Make the C++ objects that binary is built from depend on pch '''
+    objects = [o for b in binary for o in b.sources if _is_cxx_object(o)]
+    env.Depends(objects, pch)
+    for p in pch:
+        path = p.abspath
+        _users[path] = _users.get(path, 0) + len(objects)
+
+def _print_report():
+    if not _build_times:
+        return
+    print('Precompiled headers built in this run:')
+    total = 0
+    for path in sorted(_build_times):
+        seconds = _build_times[path]
+        users = _users.get(path, 0)
+        # Without the compiled header every object would have parsed the
+        # headers itself, which takes about as long as compiling them once
+        saved = seconds * max(users - 1, 0)
+        total += saved
+        print('  {}: {:.1f}s to build, used by {} objects, '
+              '~{:.0f}s of compiling saved'.format(
+                os.path.relpath(path), seconds, users, saved))
+    print('  Estimated total compile time saved: ~{:.0f}s'.format(total))
@@ -42,6 +42,12 @@ import SCons.Scanner
 import SCons.Tool
 import SCons.Util
 
+try:
+    import stat_prefetch
+except ImportError:
+    # Loaded without the MB tools
+    stat_prefetch = None
+
 class ToolQt5Warning(SCons.Warnings.Warning):
     pass
 
@@ -106,6 +112,8 @@ def checkMocIncluded(target, source, env):
             (str(moc), str(cpp)))
 
 def find_file(filename, paths, node_factory):
+    if stat_prefetch is not None and stat_prefetch.enabled():
+        stat_prefetch.prefetch([node_factory(filename, dir) for dir in paths])
     for dir in paths:
         node = node_factory(filename, dir)
         if node.rexists():
@@ -467,9 +475,9 @@ def __moc_generator_from_h(source, target, env, for_signature):
         pass
     
     if pass_defines:
-        return '$QT5_MOC $QT5_MOCDEFINES $QT5_MOCFROMHFLAGS $QT5_MOCINCFLAGS -o $TARGET $SOURCE'
+        return '$QT5_MOC $QT5_MOCDEFINES $QT5_MOCFROMHFLAGS $QT5_MOCINCFLAGS -o $TARGET $SOURCE $MB_TOOLCHAIN_QT5_MOC'
     else:
-        return '$QT5_MOC $QT5_MOCFROMHFLAGS $QT5_MOCINCFLAGS -o $TARGET $SOURCE'
+        return '$QT5_MOC $QT5_MOCFROMHFLAGS $QT5_MOCINCFLAGS -o $TARGET $SOURCE $MB_TOOLCHAIN_QT5_MOC'
 
 def __moc_generator_from_cxx(source, target, env, for_signature):
     pass_defines = False
@@ -480,10 +488,10 @@ def __moc_generator_from_cxx(source, target, env, for_signature):
         pass
     
     if pass_defines:
-        return ['$QT5_MOC $QT5_MOCDEFINES $QT5_MOCFROMCXXFLAGS $QT5_MOCINCFLAGS -o $TARGET $SOURCE',
+        return ['$QT5_MOC $QT5_MOCDEFINES $QT5_MOCFROMCXXFLAGS $QT5_MOCINCFLAGS -o $TARGET $SOURCE $MB_TOOLCHAIN_QT5_MOC',
                 SCons.Action.Action(checkMocIncluded,None)]
     else:
-        return ['$QT5_MOC $QT5_MOCFROMCXXFLAGS $QT5_MOCINCFLAGS -o $TARGET $SOURCE',
+        return ['$QT5_MOC $QT5_MOCFROMCXXFLAGS $QT5_MOCINCFLAGS -o $TARGET $SOURCE $MB_TOOLCHAIN_QT5_MOC',
                 SCons.Action.Action(checkMocIncluded,None)]
 
 def __mocx_generator_from_h(source, target, env, for_signature):
@@ -495,9 +503,9 @@ def __mocx_generator_from_h(source, target, env, for_signature):
         pass
     
     if pass_defines:
-        return '$QT5_MOC $QT5_MOCDEFINES $QT5_MOCFROMHFLAGS $QT5_MOCINCFLAGS -o $TARGET $SOURCE'
+        return '$QT5_MOC $QT5_MOCDEFINES $QT5_MOCFROMHFLAGS $QT5_MOCINCFLAGS -o $TARGET $SOURCE $MB_TOOLCHAIN_QT5_MOC'
     else:
-        return '$QT5_MOC $QT5_MOCFROMHFLAGS $QT5_MOCINCFLAGS -o $TARGET $SOURCE'
+        return '$QT5_MOC $QT5_MOCFROMHFLAGS $QT5_MOCINCFLAGS -o $TARGET $SOURCE $MB_TOOLCHAIN_QT5_MOC'
 
 def __mocx_generator_from_cxx(source, target, env, for_signature):
     pass_defines = False
@@ -508,10 +516,10 @@ def __mocx_generator_from_cxx(source, target, env, for_signature):
         pass
     
     if pass_defines:
-        return ['$QT5_MOC $QT5_MOCDEFINES $QT5_MOCFROMCXXFLAGS $QT5_MOCINCFLAGS -o $TARGET $SOURCE',
+        return ['$QT5_MOC $QT5_MOCDEFINES $QT5_MOCFROMCXXFLAGS $QT5_MOCINCFLAGS -o $TARGET $SOURCE $MB_TOOLCHAIN_QT5_MOC',
                 SCons.Action.Action(checkMocIncluded,None)]
     else:
-        return ['$QT5_MOC $QT5_MOCFROMCXXFLAGS $QT5_MOCINCFLAGS -o $TARGET $SOURCE',
+        return ['$QT5_MOC $QT5_MOCFROMCXXFLAGS $QT5_MOCINCFLAGS -o $TARGET $SOURCE $MB_TOOLCHAIN_QT5_MOC',
                 SCons.Action.Action(checkMocIncluded,None)]
 
 def __qrc_generator(source, target, env, for_signature):
@@ -523,7 +531,7 @@ def __qrc_generator(source, target, env, for_signature):
         pass
     
     if name_defined:
-        return '$QT5_RCC $QT5_QRCFLAGS $SOURCE -o $TARGET'
+        return '$QT5_RCC $QT5_QRCFLAGS $SOURCE -o $TARGET $MB_TOOLCHAIN_QT5_RCC'
     else:
         qrc_suffix = env.subst('$QT5_QRCSUFFIX')
         src = str(source[0])
@@ -535,7 +543,7 @@ def __qrc_generator(source, target, env, for_signature):
             qrc_stem = src[:-len(qrc_suffix)]
         else:
             qrc_stem = src
-        return '$QT5_RCC $QT5_QRCFLAGS -name %s $SOURCE -o $TARGET' % qrc_stem
+        return '$QT5_RCC $QT5_QRCFLAGS -name %s $SOURCE -o $TARGET $MB_TOOLCHAIN_QT5_RCC' % qrc_stem
 
 #
 # Builders
@@ -747,9 +755,10 @@ def generate(env):
         QT5_MOCINCFLAGS = '$( ${_concat(QT5_MOCINCPREFIX, QT5_MOCCPPPATH, INCSUFFIX, __env__, RDirs)} $)',
 
         # Commands for the qt5 support ...
-        QT5_UICCOM = '$QT5_UIC $QT5_UICFLAGS -o $TARGET $SOURCE',
-        QT5_LUPDATECOM = '$QT5_LUPDATE $QT5_LUPDATEFLAGS $SOURCES -ts $TARGET',
-        QT5_LRELEASECOM = '$QT5_LRELEASE $QT5_LRELEASEFLAGS -qm $TARGET $SOURCES',
+        # ($MB_TOOLCHAIN_* is only in signatures, see toolchain.py)
+        QT5_UICCOM = '$QT5_UIC $QT5_UICFLAGS -o $TARGET $SOURCE $MB_TOOLCHAIN_QT5_UIC',
+        QT5_LUPDATECOM = '$QT5_LUPDATE $QT5_LUPDATEFLAGS $SOURCES -ts $TARGET $MB_TOOLCHAIN_QT5_LUPDATE',
+        QT5_LRELEASECOM = '$QT5_LRELEASE $QT5_LRELEASEFLAGS -qm $TARGET $SOURCES $MB_TOOLCHAIN_QT5_LRELEASE',
         
         # Specialized variables for the Extended Automoc support
         # (Strategy #1 for qtsolutions)
@@ -0,0 +1,242 @@
+# Copyright 2013 MakerBot Industries
+
+import atexit
+import os
+import socket
+import threading
+
+try:
+    from httplib import HTTPException
+    from urllib2 import HTTPError, Request, URLError, urlopen
+except ImportError:
+    from http.client import HTTPException
+    from urllib.error import HTTPError, URLError
+    from urllib.request import Request, urlopen
+
+import SCons.Action
+import SCons.CacheDir
+import SCons.Node.FS
+import SCons.Script
+import SCons.Taskmaster
+
+import workers
+
+'''
+A remote backend for the --build-cache, for --build-cache-remote=URL.
+
+Cache entries are blobs named by their build signature, read with
+GET URL/<signature> and written with PUT URL/<signature>. cache_server.py
+is a server that does just that.
+
+Before a local cache lookup, the entry is downloaded into the local cache
+if the server has it. When the build starts, the entries of every target
+that is out of date and only depends on source files (mostly compiles)
+are downloaded ahead, PREFETCH_THREADS at a time. Files pushed into the
+local cache are uploaded in the background, and the end of the build
+waits for the uploads for at most UPLOAD_WAIT_SECONDS.
+
+A request that takes longer than the timeout counts as a miss and the
+target is built. After MAX_FAILURES failed requests in a row, the server
+isn't asked again during this build.
+'''
+
+DEFAULT_TIMEOUT = 5.0
+PREFETCH_THREADS = 16
+UPLOAD_THREADS = 4
+UPLOAD_WAIT_SECONDS = 60
+MAX_FAILURES = 3
+
+_lock = threading.Lock()
+_url = None
+_timeout = DEFAULT_TIMEOUT
+_failures = 0
+_given_up = False
+# local cache file -> Event set once it was looked up on the server
+_fetches = {}
+_prefetch_workers = None
+_upload_workers = None
+_original_init = None
+_prefetched = False
+_stats = {
+    'downloads': 0,
+    'bytes_downloaded': 0,
+    'uploads': 0,
+    'bytes_uploaded': 0,
+    'errors': 0,
+}
+
+def _failed(error):
+    global _failures, _given_up
+    with _lock:
+        _stats['errors'] += 1
+        _failures += 1
+        if _failures < MAX_FAILURES or _given_up:
+            return
+        _given_up = True
+    print('Remote build cache {} is not answering ({}), building '
+          'without it'.format(_url, error))
+
+def _request(method, key, data=None):
+    ''' Returns the body, or None if there's no such entry or the request
+        failed '''
+    global _failures
+    if _given_up:
+        return None
+    request = Request(_url + '/' + key, data=data)
+    request.get_method = lambda: method
+    if data is not None:
+        request.add_header('Content-Type', 'application/octet-stream')
+    try:
+        response = urlopen(request, timeout=_timeout)
+        try:
+            body = response.read()
+        finally:
+            response.close()
+    except HTTPError as e:
+        if e.code == 404:
+            with _lock:
+                _failures = 0
+        else:
+            _failed(e)
+        return None
+    except (URLError, HTTPException, socket.error, socket.timeout) as e:
+        _failed(e)
+        return None
+    with _lock:
+        _failures = 0
+    return body
+
+def _key(cachefile):
+    return os.path.basename(cachefile)
+
+def _download(cachefile):
+    data = _request('GET', _key(cachefile))
+    if data is None:
+        return
+    cachedir = os.path.dirname(cachefile)
+    if not os.path.isdir(cachedir):
+        try:
+            os.makedirs(cachedir)
+        except OSError:
+            # Another thread or build may have made it
+            pass
+    # The same way CacheDir pushes, so nobody sees half a file
+    tempfile = '{}.tmp{}_{}'.format(
+        cachefile, os.getpid(), threading.current_thread().ident)
+    try:
+        with open(tempfile, 'wb') as f:
+            f.write(data)
+        os.rename(tempfile, cachefile)
+    except (IOError, OSError) as e:
+        # Like a miss, the target gets built
+        print('Remote build cache: could not store {}: {}'.format(
+            cachefile, e))
+        return
+    with _lock:
+        _stats['downloads'] += 1
+        _stats['bytes_downloaded'] += len(data)
+
+def fetch(cachefile):
+    ''' Download cachefile from the server if it has it and we haven't
+        tried yet '''
+    if _url is None or _given_up or not SCons.Action.execute_actions:
+        return
+    with _lock:
+        event = _fetches.get(cachefile)
+        mine = event is None
+        if mine:
+            event = threading.Event()
+            _fetches[cachefile] = event
+    if not mine:
+        # Being prefetched, or looked up already
+        event.wait(_timeout)
+        return
+    try:
+        if not os.path.exists(cachefile):
+            _download(cachefile)
+    finally:
+        event.set()
+
+def _upload(cachefile):
+    try:
+        with open(cachefile, 'rb') as f:
+            data = f.read()
+    except (IOError, OSError):
+        return
+    if _request('PUT', _key(cachefile), data) is not None:
+        with _lock:
+            _stats['uploads'] += 1
+            _stats['bytes_uploaded'] += len(data)
+
+def upload(cachefile):
+    ''' Upload cachefile to the server in the background '''
+    if _url is None or _given_up or not os.path.exists(cachefile):
+        return
+    _upload_workers.put(_upload, cachefile)
+
+def _prefetch_candidates(roots):
+    ''' Out of date files that only depend on source files '''
+    seen = set()
+    stack = list(roots)
+    while stack:
+        node = stack.pop()
+        if node in seen:
+            continue
+        seen.add(node)
+        # Visiting scans, the same as the Taskmaster does on its first
+        # visit of each node
+        children = node.children()
+        stack.extend(children)
+        if (not isinstance(node, SCons.Node.FS.File) or
+                not node.has_builder() or node.nocache or node.always_build):
+            continue
+        if any(child.has_builder() for child in children):
+            continue
+        if node.exists() and not node.changed():
+            continue
+        yield node
+
+def _prefetch(roots):
+    for node in _prefetch_candidates(roots):
+        cache = node.get_build_env().get_CacheDir()
+        if not cache.is_enabled():
+            continue
+        cachefile = cache.cachepath(node)[1]
+        if not os.path.exists(cachefile):
+            _prefetch_workers.put(fetch, cachefile)
+
+def _init(self, targets=[], tasker=None, order=None, trace=None):
+    global _prefetched
+    _original_init(self, targets, tasker, order, trace)
+    if (_prefetched or SCons.Script.GetOption('clean') or
+            not SCons.Action.execute_actions or
+            not SCons.CacheDir.cache_enabled):
+        return
+    _prefetched = True
+    _prefetch(targets)
+
+def _finish():
+    if not _upload_workers.wait(UPLOAD_WAIT_SECONDS):
+        print('Remote build cache: gave up waiting for uploads')
+    if _stats['downloads'] or _stats['uploads'] or _stats['errors']:
+        print('Remote build cache: {} downloaded ({:.1f} MiB), {} uploaded '
+              '({:.1f} MiB), {} failed requests'.format(
+                _stats['downloads'],
+                _stats['bytes_downloaded'] / float(1024 ** 2),
+                _stats['uploads'],
+                _stats['bytes_uploaded'] / float(1024 ** 2),
+                _stats['errors']))
+
+def setup(url, timeout=DEFAULT_TIMEOUT):
+    ''' Use the cache server at url for the local build cache '''
+    global _url, _timeout, _prefetch_workers, _upload_workers
+    global _original_init
+    if _url is not None:
+        return
+    _url = url.rstrip('/')
+    _timeout = timeout
+    _prefetch_workers = workers.Workers(PREFETCH_THREADS)
+    _upload_workers = workers.Workers(UPLOAD_THREADS)
+    _original_init = SCons.Taskmaster.Taskmaster.__init__
+    SCons.Taskmaster.Taskmaster.__init__ = _init
+    atexit.register(_finish)
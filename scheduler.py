@@ -0,0 +1,104 @@
+# Copyright 2013 MakerBot Industries
+
+import os
+
+import SCons.Node.FS
+import SCons.Taskmaster
+
+import action_durations
+
+'''
+Starts the longest actions first, for --duration-order.
+
+The Taskmaster walks the graph depth first, and looks at the children of
+each node in the order the SConscripts listed them. With -j, that often
+leaves the slowest compiles and links of the build for last, with every
+other core idle while they finish.
+
+Every Taskmaster gets an order function (the same hook --random uses)
+that puts the children with the longest remaining chain of work first.
+The chain below a node is its own duration plus the longest chain below
+any of its children, using the durations action_durations recorded the
+last time each action ran. Targets that never ran are estimated at the
+median duration of targets with the same suffix (so compiles and links are
+estimated separately), or at the median of everything if there are none.
+When nothing was recorded yet every child weighs the same, and the order
+is left as it was.
+'''
+
+_durations = None
+# suffix -> estimated seconds for targets without a recorded duration
+_estimates = {}
+_default_estimate = 0.0
+# node -> seconds of the longest chain of actions ending at node
+_chains = {}
+
+def _median(values):
+    values = sorted(values)
+    if not values:
+        return 0.0
+    return values[len(values) // 2]
+
+def _make_estimates(durations):
+    global _default_estimate
+    by_suffix = {}
+    for path, seconds in durations.items():
+        by_suffix.setdefault(os.path.splitext(path)[1], []).append(seconds)
+    for suffix, values in by_suffix.items():
+        _estimates[suffix] = _median(values)
+    _default_estimate = _median(list(durations.values()))
+
+def _duration(node):
+    if not node.has_builder() or isinstance(node, SCons.Node.FS.Dir):
+        return 0.0
+    path = node.get_abspath()
+    try:
+        return _durations[path]
+    except KeyError:
+        return _estimates.get(os.path.splitext(path)[1], _default_estimate)
+
+def chain(node):
+    ''' Seconds of the longest chain of recorded actions ending at node '''
+    if node in _chains:
+        return _chains[node]
+    # Without recursion, the graph can be deeper than Python's stack
+    stack = [(node, False)]
+    while stack:
+        current, expanded = stack.pop()
+        if current in _chains:
+            continue
+        children = current.children(scan=0)
+        if expanded:
+            longest = 0.0
+            for child in children:
+                longest = max(longest, _chains.get(child, 0.0))
+            _chains[current] = _duration(current) + longest
+            continue
+        stack.append((current, True))
+        for child in children:
+            if child not in _chains:
+                stack.append((child, False))
+    return _chains[node]
+
+def _order(dependencies):
+    # The Taskmaster pops candidates from the end of the list, so the
+    # longest chain goes last. The sort is stable, ties keep their order.
+    return sorted(dependencies, key=chain)
+
+_original_init = None
+
+def _init(self, targets=[], tasker=None, order=None, trace=None):
+    _original_init(self, targets, tasker, order, trace)
+    self.order = _order
+
+def enable(env):
+    ''' Order the work of every Taskmaster from now on longest first '''
+    global _durations, _original_init
+    # --random wants the order to be random
+    if _original_init is not None or env.GetOption('random'):
+        return
+    action_durations.record(env)
+    _durations = action_durations.durations(env)
+    _make_estimates(_durations)
+    _original_init = SCons.Taskmaster.Taskmaster.__init__
+    SCons.Taskmaster.Taskmaster.__init__ = _init
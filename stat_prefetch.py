@@ -0,0 +1,168 @@
+# Copyright 2013 MakerBot Industries
+
+import errno
+import os
+
+import SCons.Node
+import SCons.Node.FS
+import SCons.Taskmaster
+
+import workers
+
+'''
+Stats files concurrently before SCons needs them, for --stat-prefetch.
+
+SCons stats every file it looks at and lists every directory it searches
+for headers one call at a time. On a network file system every one of
+those calls waits for a round trip, so a build that changes nothing can
+spend most of its time waiting.
+
+When the build starts, THREADS threads at once list every directory SCons
+has a node for, and stat every file and directory in them: the ones SCons
+has nodes for, and the ones in source dirs it doesn't have nodes for yet
+(mostly headers the scanner will find). From then on SCons gets those
+stats instead of asking the file system, so it still sees them after it
+forgets what it found (which it does a lot).
+
+Stats of targets are dropped just before the target is built. Files in
+variant dirs that aren't targets are left out, since the build copies
+sources into them, and so are directories that don't exist yet and
+anything that couldn't be stat'ed for another reason than not being
+there (SCons stats those itself, and sees the error). The
+qt5 tool's automoc also stats the places a header could be in at once
+(see prefetch).
+'''
+
+# Latency bound, not CPU bound
+THREADS = 32
+
+_workers = None
+_original_init = None
+_original_fs_stat = None
+_original_prepare = None
+_prefetched = False
+# path -> the stat taken ahead, or None if nothing was there
+_stats = {}
+# A stat that failed some other way, which SCons is left to take itself
+_UNKNOWN = object()
+
+def _stat(path):
+    try:
+        return os.stat(path)
+    except OSError as e:
+        if e.errno == errno.ENOENT:
+            return None
+        return _UNKNOWN
+    except (TypeError, ValueError):
+        return _UNKNOWN
+
+def _listdir(path):
+    try:
+        return os.listdir(path)
+    except OSError:
+        return None
+
+def _fs_stat(self, path):
+    st = _stats.get(path, _stats)
+    if st is _stats:
+        return _original_fs_stat(self, path)
+    if st is None:
+        raise OSError(errno.ENOENT, os.strerror(errno.ENOENT), path)
+    return st
+
+def _prepare(self):
+    # The target is about to change
+    _stats.pop(getattr(self, 'abspath', None), None)
+    _original_prepare(self)
+
+def _in_source_dir(node):
+    return node.dir.srcnode() is node.dir
+
+def _stat_files(paths):
+    paths = [path for path in set(paths) if path not in _stats]
+    for path, st in zip(paths, _workers.map(_stat, paths)):
+        if st is not _UNKNOWN:
+            _stats[path] = st
+
+def _stat_dirs(dirs):
+    paths = [d.abspath for d in dirs if d.abspath not in _stats]
+    for path, st in zip(paths, _workers.map(_stat, paths)):
+        # It could be made during the build
+        if st is not None and st is not _UNKNOWN:
+            _stats[path] = st
+
+def _list_dirs(dirs):
+    ''' Fill in SCons' listings of dirs, and returns the paths of the files
+        in the source dirs SCons has no nodes for '''
+    unlisted = [d for d in dirs if not hasattr(d, 'on_disk_entries')]
+    for directory, names in zip(unlisted, _workers.map(
+            _listdir, [d.abspath for d in unlisted])):
+        if names is not None:
+            directory.on_disk_entries = dict(
+                (SCons.Node.FS._my_normcase(name), True) for name in names)
+    paths = []
+    for directory in dirs:
+        if directory.srcnode() is not directory:
+            continue
+        for name in getattr(directory, 'on_disk_entries', ()):
+            if name not in directory.entries:
+                paths.append(os.path.join(directory.abspath, name))
+    return paths
+
+def enabled():
+    return _workers is not None
+
+def prefetch(nodes):
+    ''' Stat the files of nodes that are sources, or their sources in the
+        source dir, at once '''
+    if _workers is None:
+        return
+    paths = []
+    for node in nodes:
+        for n in (node, node.srcnode()):
+            if n.has_builder() or _in_source_dir(n):
+                paths.append(n.abspath)
+    _stat_files(paths)
+
+def _known_nodes(fs):
+    ''' The files and directories SCons has nodes for '''
+    dirs = []
+    files = []
+    stack = list(set(fs.Root.values()))
+    while stack:
+        directory = stack.pop()
+        dirs.append(directory)
+        for name, entry in list(directory.entries.items()):
+            if name in ('.', '..'):
+                continue
+            if isinstance(entry, SCons.Node.FS.Dir):
+                stack.append(entry)
+            else:
+                files.append(entry)
+    return dirs, files
+
+def _init(self, targets=[], tasker=None, order=None, trace=None):
+    global _prefetched
+    _original_init(self, targets, tasker, order, trace)
+    if _prefetched:
+        return
+    _prefetched = True
+    dirs, files = _known_nodes(SCons.Node.FS.get_default_fs())
+    dirs = set(dirs + [d.srcnode() for d in dirs])
+    unknown = _list_dirs(dirs)
+    _stat_dirs([d for d in dirs if d.srcnode() is d])
+    _stat_files(unknown + [f.abspath for f in files
+                           if f.has_builder() or _in_source_dir(f)])
+
+def enable():
+    ''' Stat every known file at once when the build starts '''
+    global _workers, _original_init, _original_fs_stat, _original_prepare
+    if _workers is not None:
+        return
+    _workers = workers.Workers(THREADS)
+    _original_init = SCons.Taskmaster.Taskmaster.__init__
+    SCons.Taskmaster.Taskmaster.__init__ = _init
+    _original_fs_stat = SCons.Node.FS.LocalFS.stat
+    SCons.Node.FS.LocalFS.stat = _fs_stat
+    _original_prepare = SCons.Node.Node.prepare
+    SCons.Node.Node.prepare = _prepare
@@ -0,0 +1,129 @@
+# Copyright 2013 MakerBot Industries
+
+import multiprocessing
+import os
+import subprocess
+import sys
+
+'''
+What the machine the build runs on has to offer.
+
+Everything here returns None when it can't be found out, so callers can
+fall back to not limiting anything.
+'''
+
+def _read(path):
+    try:
+        with open(path) as f:
+            return f.read().strip()
+    except (IOError, OSError):
+        return None
+
+def _cgroup_memory_limit():
+    ''' The memory limit of a container we run in, if any '''
+    # cgroup v2, then v1. Unlimited is 'max' or a huge number.
+    for path in ['/sys/fs/cgroup/memory.max',
+                 '/sys/fs/cgroup/memory/memory.limit_in_bytes']:
+        value = _read(path)
+        if value and value.isdigit() and int(value) < 2 ** 60:
+            return int(value)
+    return None
+
+def _affinity_cpus():
+    ''' How many CPUs this process may run on '''
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0))
+    status = _read('/proc/self/status')
+    if status is None:
+        return None
+    for line in status.splitlines():
+        if line.startswith('Cpus_allowed_list:'):
+            count = 0
+            for cpus in line.split(':', 1)[1].strip().split(','):
+                first, sep, last = cpus.partition('-')
+                count += int(last) - int(first) + 1 if sep else 1
+            return count
+    return None
+
+def _cgroup_cpus():
+    ''' The CPU quota of a container we run in, if any, rounded up '''
+    quota = period = None
+    value = _read('/sys/fs/cgroup/cpu.max')
+    if value:
+        fields = value.split()
+        if len(fields) == 2 and fields[0].isdigit():
+            quota, period = int(fields[0]), int(fields[1])
+    else:
+        value = _read('/sys/fs/cgroup/cpu/cpu.cfs_quota_us')
+        if value and value.isdigit():
+            quota = int(value)
+            period = int(_read('/sys/fs/cgroup/cpu/cpu.cfs_period_us') or 0)
+    if not quota or not period:
+        return None
+    return max(1, -(-quota // period))
+
+def usable_cpus():
+    ''' CPUs the build can use, honoring affinity and cgroup quotas '''
+    counts = []
+    if sys.platform.startswith('linux'):
+        counts = [_affinity_cpus(), _cgroup_cpus()]
+    counts = [c for c in counts if c]
+    if counts:
+        return min(counts)
+    try:
+        return multiprocessing.cpu_count()
+    except NotImplementedError:
+        return None
+
+def _linux_memory():
+    meminfo = _read('/proc/meminfo')
+    if meminfo is None:
+        return None
+    values = {}
+    for line in meminfo.splitlines():
+        fields = line.split()
+        if len(fields) >= 2 and fields[1].isdigit():
+            values[fields[0].rstrip(':')] = int(fields[1]) * 1024
+    # MemAvailable counts the page cache the kernel would give up, it's
+    # only missing on kernels older than 3.14
+    return values.get('MemAvailable', values.get('MemTotal'))
+
+def _mac_memory():
+    try:
+        return int(subprocess.check_output(['sysctl', '-n', 'hw.memsize']))
+    except (OSError, ValueError, subprocess.CalledProcessError):
+        return None
+
+def _windows_memory():
+    import ctypes
+    class MemoryStatusEx(ctypes.Structure):
+        _fields_ = [
+            ('dwLength', ctypes.c_ulong),
+            ('dwMemoryLoad', ctypes.c_ulong),
+            ('ullTotalPhys', ctypes.c_ulonglong),
+            ('ullAvailPhys', ctypes.c_ulonglong),
+            ('ullTotalPageFile', ctypes.c_ulonglong),
+            ('ullAvailPageFile', ctypes.c_ulonglong),
+            ('ullTotalVirtual', ctypes.c_ulonglong),
+            ('ullAvailVirtual', ctypes.c_ulonglong),
+            ('ullAvailExtendedVirtual', ctypes.c_ulonglong),
+        ]
+    status = MemoryStatusEx()
+    status.dwLength = ctypes.sizeof(status)
+    if not ctypes.windll.kernel32.GlobalMemoryStatusEx(ctypes.byref(status)):
+        return None
+    return status.ullAvailPhys
+
+def available_memory():
+    ''' Bytes of memory the build can use without swapping, or None '''
+    if sys.platform.startswith('linux'):
+        memory = _linux_memory()
+        limit = _cgroup_memory_limit()
+        if memory is None or limit is None:
+            return memory or limit
+        return min(memory, limit)
+    elif sys.platform == 'darwin':
+        return _mac_memory()
+    elif sys.platform == 'win32':
+        return _windows_memory()
+    return None
@@ -0,0 +1,32 @@
+# Copyright 2013 MakerBot Industries
+
+import os
+import sys
+import time
+
+'''
+Helpers for the benchmarks among the tests.
+
+With the tests, a benchmark runs on a small generated workload and asserts
+on the work the fast path saves (files read, commands run), which doesn't
+depend on the machine. Set MB_BENCHMARK_SCALE to multiply the workload and
+print the timings, e.g.
+
+    MB_BENCHMARK_SCALE=20 python -m unittest discover -s tests -p 'test_dir_index.py'
+'''
+
+SCALE = int(os.environ.get('MB_BENCHMARK_SCALE', '1'))
+
+def timed(function, *args, **kwargs):
+    ''' Returns (seconds function took, what it returned) '''
+    start = time.time()
+    result = function(*args, **kwargs)
+    return time.time() - start, result
+
+def report(title, timings):
+    ''' Print [(name, seconds)] when running scaled up '''
+    if 'MB_BENCHMARK_SCALE' not in os.environ:
+        return
+    sys.stderr.write('\n{} (scale {}):\n'.format(title, SCALE))
+    for name, seconds in timings:
+        sys.stderr.write('  {:<40} {:8.3f}s\n'.format(name, seconds))
@@ -0,0 +1,64 @@
+# Copyright 2013 MakerBot Industries
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+try:
+    import SCons.Environment
+    import SCons.Node.FS
+except ImportError:
+    raise unittest.SkipTest('SCons is not installed')
+
+import mb_sconstruct
+
+'''
+A project in a temporary directory for tests that need SCons nodes.
+'''
+
+def new_project(tools=()):
+    ''' Returns (top, env) for an empty project in a temporary directory,
+        which SCons looks nodes up in from now on. env is set up like one
+        of ours, without options or a compiler. '''
+    top = os.path.realpath(tempfile.mkdtemp(prefix='mb_test'))
+    os.chdir(top)
+    SCons.Node.FS.default_fs = SCons.Node.FS.FS(top)
+    env = SCons.Environment.Environment(tools=list(tools))
+    env.AddMethod(lambda env: 'obj', 'MBVariantDir')
+    env.AddMethod(mb_sconstruct.mb_generated_dir, 'MBGeneratedDir')
+    env.AddMethod(lambda env: 'gcc', 'MBCompilerFamily')
+    env.AddMethod(lambda env, flag, link=False: False,
+                  'MBCompilerSupportsFlag')
+    return top, env
+
+class ProjectTestCase(unittest.TestCase):
+    ''' Runs each test in an empty project with an environment set up
+        like one of ours, without options or a compiler '''
+
+    tools = []
+
+    def setUp(self):
+        self.addCleanup(os.chdir, os.getcwd())
+        self.new_project()
+
+    def new_project(self):
+        ''' Switch to another empty project, in self.top '''
+        self.top, self.env = new_project(self.tools)
+        self.addCleanup(shutil.rmtree, self.top, True)
+
+    def write(self, path, contents=''):
+        ''' Make the file at path in the project '''
+        path = os.path.join(self.top, path)
+        if not os.path.isdir(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        with open(path, 'w') as f:
+            f.write(contents)
+
+    def in_sconscript_dir(self, path):
+        ''' Look up nodes relative to path, like SCons does while it reads
+            the SConscript there '''
+        self.env.fs.chdir(self.env.Dir('#' + path))
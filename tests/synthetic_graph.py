@@ -0,0 +1,110 @@
+# Copyright 2013 MakerBot Industries
+
+import argparse
+import os
+import shutil
+import sys
+import time
+
+import scons_env
+
+import SCons.Action
+import SCons.Job
+import SCons.Taskmaster
+
+import scheduler
+
+'''
+A synthetic build graph for timing --duration-order.
+
+A program links QUICK_LIBRARIES libraries of quick compiles, listed first,
+and one library with a slow compile and a slow link, listed last. Actions
+sleep instead of running a compiler. With -j, SCons' own order starts the
+slow library last, and every other job is idle while it finishes.
+
+Run it to time the build of the graph in SCons' order and in the
+duration order, with the durations the actions actually take as the
+recorded ones:
+
+    PYTHONPATH=<scons lib dir> python tests/synthetic_graph.py -j 4
+'''
+
+QUICK_LIBRARIES = 8
+QUICK_SOURCES = 4
+
+# Seconds each kind of action sleeps
+QUICK_COMPILE = 0.05
+QUICK_ARCHIVE = 0.02
+SLOW_COMPILE = 0.6
+SLOW_ARCHIVE = 0.3
+LINK = 0.1
+
+def _sleep(target, source, env):
+    time.sleep(env['MB_SECONDS'])
+    with open(target[0].abspath, 'w'):
+        pass
+
+_action = SCons.Action.Action(_sleep, None)
+
+def generate(env, scale=1.0):
+    ''' Returns (the program, target path -> seconds its action takes) '''
+    durations = {}
+    def command(target, sources, seconds):
+        seconds *= scale
+        node = env.Command(target, sources, _action, MB_SECONDS=seconds)
+        durations[node[0].abspath] = seconds
+        return node
+    libraries = []
+    for l in range(QUICK_LIBRARIES):
+        objects = [command('quick{}/{}.o'.format(l, s), [], QUICK_COMPILE)
+                   for s in range(QUICK_SOURCES)]
+        libraries += command('quick{}/lib.a'.format(l), objects,
+                             QUICK_ARCHIVE)
+    slow = command('slow/big.o', [], SLOW_COMPILE)
+    libraries += command('slow/lib.a', slow, SLOW_ARCHIVE)
+    return command('program', libraries, LINK), durations
+
+def build(targets, jobs, order=None):
+    ''' Build targets with -j jobs, returning the seconds it took '''
+    taskmaster = SCons.Taskmaster.Taskmaster(targets, order=order)
+    start = time.time()
+    SCons.Job.Jobs(jobs, taskmaster).run()
+    return time.time() - start
+
+def duration_order(durations):
+    ''' The order function --duration-order gives Taskmasters, as if
+        durations were recorded by the last build '''
+    scheduler._durations = durations
+    scheduler._estimates.clear()
+    scheduler._chains.clear()
+    scheduler._make_estimates(durations)
+    return scheduler._order
+
+def time_builds(jobs, scale=1.0):
+    ''' Returns (seconds in SCons' order, seconds in duration order) '''
+    seconds = []
+    for ordered in (False, True):
+        top, env = scons_env.new_project()
+        try:
+            program, durations = generate(env, scale)
+            order = duration_order(durations) if ordered else None
+            seconds.append(build(program, jobs, order))
+        finally:
+            shutil.rmtree(top, True)
+    return tuple(seconds)
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Times a build with and without --duration-order')
+    parser.add_argument('-j', dest='jobs', type=int, default=4)
+    parser.add_argument('--scale', type=float, default=1.0,
+                        help='multiplies the duration of every action')
+    options = parser.parse_args()
+    cwd = os.getcwd()
+    unordered, ordered = time_builds(options.jobs, options.scale)
+    os.chdir(cwd)
+    print('-j {}: {:.2f}s in SCons\' order, {:.2f}s longest first'.format(
+        options.jobs, unordered, ordered))
+
+if __name__ == '__main__':
+    sys.exit(main())
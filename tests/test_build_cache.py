@@ -0,0 +1,97 @@
+# Copyright 2013 MakerBot Industries
+
+import os
+import time
+import unittest
+
+import scons_env
+
+import SCons.Errors
+
+import build_cache
+
+class ParseSizeTest(unittest.TestCase):
+    def test_suffixes(self):
+        self.assertEqual(build_cache.parse_size('123'), 123)
+        self.assertEqual(build_cache.parse_size('2K'), 2048)
+        self.assertEqual(build_cache.parse_size('1.5k'), 1536)
+        self.assertEqual(build_cache.parse_size('500M'), 500 * 1024 ** 2)
+        self.assertEqual(build_cache.parse_size(' 10GB '), 10 * 1024 ** 3)
+        self.assertEqual(build_cache.parse_size('1t'), 1024 ** 4)
+
+    def test_bad_sizes(self):
+        for text in ['', 'G', 'ten', '10X', '10 G B', '1e']:
+            self.assertRaises(SCons.Errors.UserError,
+                              build_cache.parse_size, text)
+
+class EvictTest(scons_env.ProjectTestCase):
+    ENTRY_SIZE = 100
+
+    def setUp(self):
+        super(EvictTest, self).setUp()
+        self.cache = os.path.join(self.top, 'cache')
+        # Oldest first, in subdirectories like SCons' CacheDir
+        self.entries = []
+        now = time.time()
+        for i in range(10):
+            path = 'cache/{:02X}/entry{}'.format(i % 3, i)
+            self.write(path, 'x' * self.ENTRY_SIZE)
+            mtime = now - 1000 + i
+            os.utime(os.path.join(self.top, path), (mtime, mtime))
+            self.entries.append(path)
+
+    def left(self):
+        return [p for p in self.entries
+                if os.path.exists(os.path.join(self.top, p))]
+
+    def test_least_recently_used_first(self):
+        # 1000 bytes, evicting down to below 90% of 500
+        self.assertEqual(build_cache.evict(self.cache, 500), (6, 600))
+        self.assertEqual(self.left(), self.entries[6:])
+
+    def test_touched_entries_stay(self):
+        os.utime(os.path.join(self.top, self.entries[0]), None)
+        build_cache.evict(self.cache, 500)
+        self.assertEqual(self.left(), [self.entries[0]] + self.entries[7:])
+
+    def test_under_the_maximum(self):
+        self.assertEqual(build_cache.evict(self.cache, 1000), (0, 0))
+        self.assertEqual(self.left(), self.entries)
+        # Over the low water mark isn't enough
+        self.assertEqual(build_cache.evict(self.cache, 1050), (0, 0))
+
+    def test_low_water(self):
+        # 1000 bytes, over 950, evicting down to below 855
+        self.assertEqual(build_cache.evict(self.cache, 950), (2, 200))
+
+    def test_skipped_files(self):
+        self.write('cache/config', 'x' * 10000)
+        self.write('cache/' + build_cache.LOCK_NAME + '.old', 'x' * 10000)
+        self.write('cache/00/entry.tmp', 'x' * 10000)
+        self.write('cache/00/entry99.1234.tmp', 'x' * 10000)
+        self.assertEqual(build_cache.evict(self.cache, 1000), (0, 0))
+        self.assertEqual(build_cache.evict(self.cache, 500), (6, 600))
+        for path in ['config', build_cache.LOCK_NAME + '.old',
+                     '00/entry.tmp', '00/entry99.1234.tmp']:
+            self.assertTrue(os.path.exists(os.path.join(self.cache, path)))
+
+    def test_another_build_is_evicting(self):
+        self.write('cache/' + build_cache.LOCK_NAME)
+        self.assertEqual(build_cache.evict(self.cache, 500), (0, 0))
+        self.assertEqual(self.left(), self.entries)
+
+    def test_stale_lock(self):
+        self.write('cache/' + build_cache.LOCK_NAME)
+        stale = time.time() - build_cache.STALE_LOCK_SECONDS - 10
+        os.utime(os.path.join(self.cache, build_cache.LOCK_NAME),
+                 (stale, stale))
+        self.assertEqual(build_cache.evict(self.cache, 500), (6, 600))
+        self.assertFalse(os.path.exists(
+            os.path.join(self.cache, build_cache.LOCK_NAME)))
+
+    def test_missing_cache(self):
+        self.assertEqual(build_cache.evict(
+            os.path.join(self.top, 'nothing'), 0), (0, 0))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,50 @@
+# Copyright 2013 MakerBot Industries
+
+import unittest
+
+import scons_env
+
+import common
+import dir_index
+
+class MagicPythonGlobTest(scons_env.ProjectTestCase):
+    def setUp(self):
+        super(MagicPythonGlobTest, self).setUp()
+        self.addCleanup(dir_index._indexes.clear)
+        for path in ['pkg/__init__.py', 'pkg/mod.py', 'pkg/mod_test.py',
+                     'pkg/data.json', 'pkg/sub/__init__.py',
+                     'pkg/__pycache__/mod.py', 'pkg/.git/hook.py',
+                     'pkg/tests/test_mod.py', 'pkg/tests/helper.json']:
+            self.write(path)
+
+    def glob(self, **kwargs):
+        return [f.get_path(self.env.Dir('#pkg')) for f in
+                common.mb_magic_python_glob(self.env, 'pkg', **kwargs)]
+
+    def test_defaults(self):
+        self.assertEqual(self.glob(), [
+            '__init__.py', 'mod.py', 'mod_test.py', 'sub/__init__.py',
+            'tests/test_mod.py'])
+
+    def test_include(self):
+        self.assertEqual(self.glob(include=['*.py', '*.json']), [
+            '__init__.py', 'data.json', 'mod.py', 'mod_test.py',
+            'sub/__init__.py', 'tests/helper.json', 'tests/test_mod.py'])
+
+    def test_exclude_matches_file_names(self):
+        self.assertEqual(self.glob(exclude='*_test.py'), [
+            '__init__.py', 'mod.py', 'sub/__init__.py', 'tests/test_mod.py'])
+        # Not directory names
+        self.assertEqual(self.glob(exclude='tests'), self.glob())
+
+    def test_exclude_dirs(self):
+        # Given ones replace the defaults
+        self.assertEqual(self.glob(exclude_dirs=['tests', 'sub']), [
+            '.git/hook.py', '__init__.py', '__pycache__/mod.py', 'mod.py',
+            'mod_test.py'])
+        self.assertEqual(self.glob(exclude_dirs=[]), [
+            '.git/hook.py', '__init__.py', '__pycache__/mod.py', 'mod.py',
+            'mod_test.py', 'sub/__init__.py', 'tests/test_mod.py'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+# Copyright 2013 MakerBot Industries
+
+import os
+import stat
+import unittest
+
+import scons_env
+
+import compiler_features
+
+# Counts its runs in a file next to it, and accepts anything
+_COMPILER = '''#!/bin/sh
+echo "$@" >> "$(dirname "$0")/runs"
+'''
+
+class ProbeCacheTest(scons_env.ProjectTestCase):
+    def setUp(self):
+        super(ProbeCacheTest, self).setUp()
+        self.addCleanup(self.forget)
+        self.bin = os.path.join(self.top, 'bin')
+        self.env['ENV']['PATH'] = self.bin + os.pathsep + '/bin:/usr/bin'
+        self.env['CXX'] = 'mbcxx'
+
+    def forget(self):
+        ''' Drop what this run learned without saving it '''
+        for cache in compiler_features._caches.values():
+            cache.dirty = False
+        compiler_features._caches.clear()
+        compiler_features._fingerprints.clear()
+
+    def new_run(self):
+        for cache in compiler_features._caches.values():
+            cache.save()
+        self.forget()
+
+    def install_compiler(self, mtime=None):
+        self.write('bin/mbcxx', _COMPILER)
+        path = os.path.join(self.bin, 'mbcxx')
+        os.chmod(path, os.stat(path).st_mode | stat.S_IXUSR)
+        if mtime is not None:
+            os.utime(path, (mtime, mtime))
+
+    def runs(self):
+        try:
+            with open(os.path.join(self.bin, 'runs')) as runs:
+                return len(runs.readlines())
+        except IOError:
+            return 0
+
+    def test_same_fingerprint_doesnt_run_the_compiler(self):
+        self.install_compiler()
+        self.assertTrue(compiler_features.supports_flag(self.env, '-Wall'))
+        self.assertEqual(self.runs(), 1)
+        self.assertTrue(compiler_features.supports_flag(self.env, '-Wall'))
+        self.new_run()
+        self.assertTrue(compiler_features.supports_flag(self.env, '-Wall'))
+        self.assertEqual(self.runs(), 1)
+
+    def test_new_fingerprint_runs_the_compiler(self):
+        self.install_compiler(mtime=1000000000)
+        compiler_features.supports_flag(self.env, '-Wall')
+        self.new_run()
+        self.install_compiler(mtime=1000000001)
+        compiler_features.supports_flag(self.env, '-Wall')
+        self.assertEqual(self.runs(), 2)
+
+    def test_flags_are_part_of_the_key(self):
+        self.install_compiler()
+        compiler_features.supports_flag(self.env, '-Wall')
+        self.env.Append(CXXFLAGS=['-std=c++11'])
+        compiler_features.supports_flag(self.env, '-Wall')
+        self.assertEqual(self.runs(), 2)
+
+    def test_unrunnable_compiler_isnt_cached(self):
+        self.assertEqual(compiler_features.supports_flag(self.env, '-Wall'),
+                         None)
+        results = compiler_features._cache(self.env).results
+        self.assertFalse(any(results.values()))
+        self.new_run()
+        self.install_compiler()
+        self.assertTrue(compiler_features.supports_flag(self.env, '-Wall'))
+        self.assertEqual(self.runs(), 1)
+
+if __name__ == '__main__':
+    unittest.main()
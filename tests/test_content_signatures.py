@@ -0,0 +1,75 @@
+# Copyright 2013 MakerBot Industries
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import content_signatures
+
+_SOURCE = b'''#include <cassert>
+
+int half(int n)
+{
+    assert(n % 2 == 0);
+    return n / 2;
+}
+'''
+
+def _signature(source):
+    return content_signatures.signature(source)
+
+class SignatureTest(unittest.TestCase):
+    def assertSame(self, before, after):
+        self.assertEqual(_signature(before), _signature(after))
+
+    def assertChanged(self, before, after):
+        self.assertNotEqual(_signature(before), _signature(after))
+
+    def test_comment_within_a_line(self):
+        self.assertSame(_SOURCE, _SOURCE.replace(
+            b'return n / 2;', b'return n / 2; // rounds down'))
+        self.assertSame(_SOURCE, _SOURCE.replace(
+            b'int half(int n)', b'int half(int /* even */ n)'))
+
+    def test_whitespace_within_a_line(self):
+        self.assertSame(_SOURCE, _SOURCE.replace(
+            b'    return n / 2;', b'\treturn  n / 2;   '))
+        self.assertSame(_SOURCE, _SOURCE.replace(b'\n', b'\r\n'))
+
+    def test_comment_line_above_an_assert(self):
+        # assert expands __LINE__ in this file, the object has to change
+        self.assertChanged(_SOURCE, _SOURCE.replace(
+            b'    assert', b'    // Odd numbers are a bug\n    assert'))
+
+    def test_blank_line(self):
+        self.assertChanged(_SOURCE, _SOURCE.replace(b'{\n', b'{\n\n'))
+
+    def test_comment_over_several_lines(self):
+        before = _SOURCE.replace(b'int half', b'/* Halves n\n */\nint half')
+        self.assertSame(before, before.replace(b'Halves n', b'Divides n by 2'))
+        self.assertChanged(before, before.replace(b'n\n */', b'n */'))
+
+    def test_code(self):
+        self.assertChanged(_SOURCE, _SOURCE.replace(b'n / 2', b'n >> 1'))
+        # Spaces between tokens can matter
+        self.assertChanged(b'int b = a + +c;\n', b'int b = a ++c;\n')
+
+    def test_literals(self):
+        before = b'const char *s = "a  // b";\n'
+        self.assertChanged(before, before.replace(b'a  //', b'a //'))
+
+    def test_line_splices(self):
+        before = b'#define ONE \\\n    1\n'
+        self.assertSame(before, before.replace(b'    1', b'  1'))
+        self.assertChanged(before, before.replace(b'    1', b'1'))
+        self.assertChanged(before, b'#define ONE\n    1\n')
+
+    def test_compared_as_is(self):
+        raw = b'const char *s = R"(a  b)";\n'
+        self.assertEqual(content_signatures.normalize(raw.decode('utf-8')), None)
+        self.assertChanged(raw, raw.replace(b'a  b', b'a b'))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+# Copyright 2013 MakerBot Industries
+
+import unittest
+
+import scons_env
+
+import critical_path
+
+class AnalyzeTest(scons_env.ProjectTestCase):
+    ''' A program linked from a library whose object includes a generated
+        header, and a main object whose duration wasn't recorded '''
+
+    def setUp(self):
+        super(AnalyzeTest, self).setUp()
+        command = self.env.Command
+        command('gen.h', 'gen.in', 'generate')
+        command('a.o', ['a.cpp', 'gen.h'], 'compile')
+        command('b.o', 'b.cpp', 'compile')
+        command('lib.a', ['a.o', 'b.o'], 'archive')
+        command('main.o', 'main.cpp', 'compile')
+        self.prog = command('prog', ['lib.a', 'main.o'], 'link')
+        self.durations = dict(
+            (self.env.File(name).abspath, seconds) for name, seconds in [
+                ('gen.h', 3.0), ('a.o', 2.0), ('b.o', 1.0), ('lib.a', 4.5),
+                ('prog', 5.0)])
+
+    def analyze(self, jobs=1):
+        return critical_path.analyze(self.prog, self.durations, jobs)
+
+    def test_unrecorded_actions_take_the_median(self):
+        report = self.analyze()
+        self.assertEqual(report['actions'], 6)
+        self.assertEqual(report['estimated_actions'], 1)
+        self.assertEqual(report['estimate_seconds'], 3.0)
+        self.assertEqual(report['total_seconds'], 18.5)
+
+    def test_longest_chain(self):
+        report = self.analyze()
+        self.assertEqual(report['critical_path_seconds'], 14.5)
+        self.assertEqual(
+            [(s['target'], s['seconds']) for s in report['critical_path']],
+            [('gen.h', 3.0), ('a.o', 2.0), ('lib.a', 4.5), ('prog', 5.0)])
+
+    def test_best_wall_time(self):
+        # All the work one action at a time
+        self.assertEqual(self.analyze(jobs=1)['best_wall_seconds'], 18.5)
+        # The longest chain can't be run in parallel
+        self.assertEqual(self.analyze(jobs=2)['best_wall_seconds'], 14.5)
+
+    def test_bottlenecks(self):
+        self.assertEqual(
+            [(b['target'], b['dependents'], b['score'])
+             for b in self.analyze()['bottlenecks']],
+            [('gen.h', 3, 9.0), ('lib.a', 1, 4.5), ('a.o', 2, 4.0),
+             ('main.o', 1, 3.0), ('b.o', 2, 2.0), ('prog', 0, 0.0)])
+
+if __name__ == '__main__':
+    unittest.main()
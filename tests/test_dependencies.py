@@ -0,0 +1,56 @@
+# Copyright 2013 MakerBot Industries
+
+import unittest
+
+import scons_env
+
+import dependencies
+
+def _libs(*libs):
+    return lambda env: env.AppendUnique(LIBS=list(libs))
+
+def _restore(registry):
+    dependencies._registry.clear()
+    dependencies._registry.update(registry)
+    dependencies._closures.clear()
+
+class LinkOrderTest(scons_env.ProjectTestCase):
+    def setUp(self):
+        super(LinkOrderTest, self).setUp()
+        self.addCleanup(_restore, dict(dependencies._registry))
+        dependencies.register('openmesh',
+                              _libs('OpenMeshCore', 'OpenMeshTools'))
+        dependencies.register('geomutils', _libs('geomutils'))
+        dependencies.register('meshutils', _libs('meshutils'))
+        dependencies.register('thing', _libs('thing'),
+                              requires=['meshutils', 'geomutils', 'openmesh'])
+
+    def libs(self, *names):
+        for name in names:
+            dependencies.depend(self.env, name)
+        return self.env['LIBS']
+
+    def test_closure(self):
+        self.assertEqual(self.libs('thing'), [
+            'thing', 'meshutils', 'geomutils', 'OpenMeshCore', 'OpenMeshTools'])
+
+    def test_prerequisite_applied_first(self):
+        self.assertEqual(self.libs('openmesh', 'thing'), [
+            'thing', 'meshutils', 'geomutils', 'OpenMeshCore', 'OpenMeshTools'])
+        self.assertEqual(self.libs('thing'), [
+            'thing', 'meshutils', 'geomutils', 'OpenMeshCore', 'OpenMeshTools'])
+
+    def test_library_applied_first(self):
+        self.assertEqual(self.libs('meshutils', 'thing'), [
+            'thing', 'meshutils', 'geomutils', 'OpenMeshCore', 'OpenMeshTools'])
+
+    def test_prerequisite_applied_to_the_parent(self):
+        dependencies.depend(self.env, 'meshutils')
+        self.env = self.env.Clone()
+        self.env.Append(LIBS=['m'])
+        self.assertEqual(self.libs('thing'), [
+            'm', 'thing', 'meshutils', 'geomutils', 'OpenMeshCore',
+            'OpenMeshTools'])
+
+if __name__ == '__main__':
+    unittest.main()
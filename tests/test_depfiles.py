@@ -0,0 +1,44 @@
+# Copyright 2013 MakerBot Industries
+
+import unittest
+
+import scons_env
+
+import depfiles
+
+class ParseTest(unittest.TestCase):
+    def test_plain(self):
+        self.assertEqual(depfiles.parse('a.o: a.cpp a.h\n'),
+                         ['a.cpp', 'a.h'])
+        self.assertEqual(depfiles.parse(''), [])
+        self.assertEqual(depfiles.parse('a.o:\n'), [])
+
+    def test_escaped_spaces(self):
+        self.assertEqual(
+            depfiles.parse('a.o: a.cpp my\\ dir/a\\ b.h c.h\n'),
+            ['a.cpp', 'my dir/a b.h', 'c.h'])
+        self.assertEqual(depfiles.parse('a.o: a.cpp cost$$.h \\#x.h\n'),
+                         ['a.cpp', 'cost$.h', '#x.h'])
+
+    def test_line_continuations(self):
+        for newline in ['\n', '\r\n']:
+            text = 'a.o: a.cpp \\{0}  a.h \\{0}  my\\ b.h{0}'.format(newline)
+            self.assertEqual(depfiles.parse(text), ['a.cpp', 'a.h', 'my b.h'])
+
+    def test_multiple_targets(self):
+        self.assertEqual(depfiles.parse('a.o a.o.d: a.cpp a.h\n'),
+                         ['a.cpp', 'a.h'])
+        self.assertEqual(depfiles.parse('my\\ a.o b.o: a.cpp\n'), ['a.cpp'])
+
+    def test_phony_rules(self):
+        # What gcc -MMD -MP writes
+        text = ('a.o: a.cpp a.h \\\n'
+                ' my\\ b.h\n'
+                '\n'
+                'a.h:\n'
+                '\n'
+                'my\\ b.h:\n')
+        self.assertEqual(depfiles.parse(text), ['a.cpp', 'a.h', 'my b.h'])
+
+if __name__ == '__main__':
+    unittest.main()
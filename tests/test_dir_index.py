@@ -0,0 +1,112 @@
+# Copyright 2013 MakerBot Industries
+
+import os
+import time
+import unittest
+
+import benchmark
+import scons_env
+
+import common
+import dir_index
+import persistent
+
+# Old enough that listings of it are kept between runs
+_SETTLED = time.time() - 60
+
+def _settle(path, mtime=_SETTLED):
+    os.utime(path, (mtime, mtime))
+
+class DirectoryIndexTest(scons_env.ProjectTestCase):
+    def setUp(self):
+        super(DirectoryIndexTest, self).setUp()
+        self.write('src/a.cpp')
+        self.src = os.path.join(self.top, 'src')
+        self.index_path = os.path.join(self.top, 'index')
+
+    def test_listing_kept_while_mtime_is_the_same(self):
+        _settle(self.src)
+        index = dir_index.DirectoryIndex(self.index_path)
+        self.assertEqual(index.listdir(self.src), ([], ['a.cpp']))
+        self.write('src/b.cpp')
+        _settle(self.src)
+        self.assertEqual(index.listdir(self.src), ([], ['a.cpp']))
+
+    def test_listing_read_again_when_mtime_changes(self):
+        _settle(self.src)
+        index = dir_index.DirectoryIndex(self.index_path)
+        index.listdir(self.src)
+        index.save()
+        self.write('src/b.cpp')
+        _settle(self.src, _SETTLED + 1)
+        index = dir_index.DirectoryIndex(self.index_path)
+        self.assertEqual(index.listdir(self.src), ([], ['a.cpp', 'b.cpp']))
+
+    def test_racy_listing_not_persisted(self):
+        self.write('old/a.cpp')
+        old = os.path.join(self.top, 'old')
+        _settle(old)
+        index = dir_index.DirectoryIndex(self.index_path)
+        self.assertEqual(index.listdir(self.src), ([], ['a.cpp']))
+        index.listdir(old)
+        index.save()
+        saved = persistent.load(self.index_path, None)
+        self.assertEqual(saved[self.src], (None, [], ['a.cpp']))
+        self.assertEqual(saved[old], (os.stat(old).st_mtime, [], ['a.cpp']))
+        # The run that listed it still uses the real mtime
+        self.assertEqual(index._listings[self.src][0],
+                         os.stat(self.src).st_mtime)
+
+class RecursiveGlobBenchmark(scons_env.ProjectTestCase):
+    ''' MBRecursiveFileGlob over a generated tree: the first run, a run
+        with nothing changed, and a run after a file was added '''
+
+    DIRS = 20 * benchmark.SCALE
+    FILES = 50
+
+    def setUp(self):
+        super(RecursiveGlobBenchmark, self).setUp()
+        for d in range(self.DIRS):
+            for f in range(self.FILES):
+                self.write('res/{}/{}/{}.png'.format(d % 5, d, f))
+        for parent, dirnames, filenames in os.walk(self.top):
+            _settle(parent)
+        self.env.AddMethod(common.mb_recursive_file_glob,
+                           'MBRecursiveFileGlob')
+        self.added = 0
+        self.reads = 0
+        original = dir_index._read_directory
+        def counting(path):
+            self.reads += 1
+            return original(path)
+        dir_index._read_directory = counting
+        self.addCleanup(setattr, dir_index, '_read_directory', original)
+        self.addCleanup(dir_index._indexes.clear)
+
+    def run_glob(self):
+        ''' One SCons run: a new index from the saved one, then a glob '''
+        for index in dir_index._indexes.values():
+            index.save()
+        dir_index._indexes.clear()
+        self.reads = 0
+        seconds, files = benchmark.timed(
+            self.env.MBRecursiveFileGlob, 'res', '*.png')
+        self.assertEqual(len(files), self.DIRS * self.FILES + self.added)
+        return seconds, self.reads
+
+    def test_cold_warm_incremental(self):
+        cold, cold_reads = self.run_glob()
+        warm, warm_reads = self.run_glob()
+        self.write('res/0/0/new.png')
+        self.added = 1
+        _settle(os.path.join(self.top, 'res/0/0'), _SETTLED + 1)
+        incremental, incremental_reads = self.run_glob()
+        self.assertEqual(cold_reads, self.DIRS + 6)
+        self.assertEqual(warm_reads, 0)
+        self.assertEqual(incremental_reads, 1)
+        benchmark.report('MBRecursiveFileGlob, {} files'.format(
+            self.DIRS * self.FILES), [('cold', cold), ('warm', warm),
+                                      ('one directory changed', incremental)])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,103 @@
+# Copyright 2013 MakerBot Industries
+
+import os
+import sys
+import unittest
+
+import scons_env
+
+import SCons.Defaults
+import SCons.Job
+import SCons.Node
+import SCons.Node.FS
+import SCons.Script.Main
+import SCons.Script.SConsOptions
+import SCons.Taskmaster
+import SCons.Tool
+
+import fast_incremental
+
+class StoredImplicitTest(scons_env.ProjectTestCase):
+    def setUp(self):
+        super(StoredImplicitTest, self).setUp()
+        File = SCons.Node.FS.File.__dict__
+        self.addCleanup(self.restore,
+                        SCons.Taskmaster.Taskmaster.__dict__['__init__'],
+                        File['get_stored_implicit'], File['visited'])
+        # SCons' stand-in parser can't set options
+        self.addCleanup(setattr, SCons.Script.Main, 'OptionsParser',
+                        SCons.Script.Main.OptionsParser)
+        parser = SCons.Script.Main.OptionsParser = (
+            SCons.Script.SConsOptions.Parser(''))
+        parser.parse_args([], SCons.Script.SConsOptions.SConsValues(
+            parser.get_default_values()))
+        fast_incremental.setup(self.env)
+        # Scanning again is printed
+        self.addCleanup(setattr, sys, 'stdout', sys.stdout)
+        sys.stdout = open(os.devnull, 'w')
+        self.addCleanup(sys.stdout.close)
+
+        self.write('include/installed.h')
+        fast_incremental.watch_headers('include')
+        self.write('inc/a.h')
+        self.write('a.cpp', '#include "a.h"\n')
+        self.object = self.env.Command(
+            'a.o', 'a.cpp', SCons.Defaults.Copy('$TARGET', '$SOURCE'),
+            CPPPATH=['inc'], source_scanner=SCons.Tool.CScanner)[0]
+        self.header = self.env.File('inc/a.h')
+
+    def restore(self, init, get_stored_implicit, visited):
+        SCons.Taskmaster.Taskmaster.__init__ = init
+        SCons.Node.FS.File.get_stored_implicit = get_stored_implicit
+        SCons.Node.FS.File.visited = visited
+        fast_incremental._path = None
+        fast_incremental._original_init = None
+        fast_incremental._original_get_stored_implicit = None
+        fast_incremental._original_visited = None
+        fast_incremental._include_dirs.clear()
+        fast_incremental._dirty = False
+        fast_incremental._state = None
+        fast_incremental._cpppaths.clear()
+
+    def build(self):
+        taskmaster = SCons.Taskmaster.Taskmaster([self.object])
+        SCons.Job.Jobs(1, taskmaster).run()
+        # What SCons does when it exits
+        self.object.dir.sconsign().merge()
+        fast_incremental._finish()
+
+    def new_run(self):
+        ''' Forget what was read in this run, then start the next one '''
+        fast_incremental._state = None
+        fast_incremental._dirty = False
+        fast_incremental._cpppaths.clear()
+        for node in [self.object] + self.object.sources:
+            node.set_state(SCons.Node.no_state)
+            node.implicit = None
+            node.clear()
+        SCons.Taskmaster.Taskmaster([])
+
+    def test_reused(self):
+        self.build()
+        self.new_run()
+        self.assertEqual(self.object.get_stored_implicit(), [self.header])
+
+    def test_cpppath_changed(self):
+        self.build()
+        self.write('other/a.h')
+        self.object.get_build_env()['CPPPATH'] = ['other', 'inc']
+        self.new_run()
+        self.assertEqual(self.object.get_stored_implicit(), None)
+
+    def test_header_installed(self):
+        self.build()
+        self.write('include/a.h')
+        self.new_run()
+        self.assertEqual(self.object.get_stored_implicit(), None)
+        # Until the target is built again
+        self.build()
+        self.new_run()
+        self.assertEqual(self.object.get_stored_implicit(), [self.header])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+# Copyright 2013 MakerBot Industries
+
+import os
+import time
+import unittest
+
+import benchmark
+import scons_env
+
+import SCons.Node.FS
+import SCons.Taskmaster
+
+import hash_cache
+import persistent
+
+# Old enough to be put in the table
+_SETTLED = time.time() - 60
+
+class DigestTest(scons_env.ProjectTestCase):
+    def setUp(self):
+        super(DigestTest, self).setUp()
+        self.addCleanup(setattr, hash_cache, '_table', hash_cache._table)
+        hash_cache._table = {}
+
+    def test_same_as_scons(self):
+        # The build cache keys have to match those of builds without it
+        self.write('meshes/part.stl', 'solid part\nendsolid part\n')
+        node = self.env.File('meshes/part.stl')
+        self.assertEqual(hash_cache.digest(node), node.get_csig())
+
+class ColdWarmBenchmark(scons_env.ProjectTestCase):
+    ''' Content signatures of generated resources: SCons' own, the first
+        run with the hash cache, and a run with nothing changed '''
+
+    FILES = 40 * benchmark.SCALE
+    SIZE = 256 * 1024
+
+    def setUp(self):
+        super(ColdWarmBenchmark, self).setUp()
+        self.addCleanup(self.restore,
+                        SCons.Node.FS.File.__dict__['get_csig'],
+                        SCons.Taskmaster.Taskmaster.__dict__['__init__'],
+                        hash_cache._hash)
+        self.hashed = []
+        original = hash_cache._hash
+        def counting(path):
+            self.hashed.append(path)
+            return original(path)
+        hash_cache._hash = counting
+        self.nodes = []
+        for i in range(self.FILES):
+            path = 'res/{}.png'.format(i)
+            self.write(path, chr(ord('a') + i % 26) * self.SIZE)
+            os.utime(path, (_SETTLED, _SETTLED))
+            self.nodes.append(self.env.File(path))
+
+    def restore(self, get_csig, init, hash):
+        SCons.Node.FS.File.get_csig = get_csig
+        SCons.Taskmaster.Taskmaster.__init__ = init
+        hash_cache._hash = hash
+        hash_cache._path = None
+        hash_cache._dirty = False
+        hash_cache._table = None
+        hash_cache._pending.clear()
+        hash_cache._original_get_csig = None
+        hash_cache._original_init = None
+        hash_cache._prefetched = False
+
+    def signatures(self):
+        ''' One SCons run: its Taskmaster is built, then every file's
+            content signature is read. Returns (seconds, signatures). '''
+        for node in self.nodes:
+            node.clear()
+        del self.hashed[:]
+        def run():
+            SCons.Taskmaster.Taskmaster([])
+            return [node.get_csig() for node in self.nodes]
+        return benchmark.timed(run)
+
+    def new_run(self):
+        hash_cache._save()
+        hash_cache._dirty = False
+        hash_cache._table = persistent.load(hash_cache._path, None)[1]
+        hash_cache._pending.clear()
+        hash_cache._prefetched = False
+
+    def test_cold_warm(self):
+        scons, expected = self.signatures()
+        hash_cache.setup(self.env)
+        cold, signatures = self.signatures()
+        self.assertEqual(signatures, expected)
+        self.assertEqual(len(self.hashed), self.FILES)
+        self.new_run()
+        warm, signatures = self.signatures()
+        self.assertEqual(signatures, expected)
+        self.assertEqual(self.hashed, [])
+        self.assertTrue(warm < scons)
+        benchmark.report('--hash-cache, {} files of {} KiB'.format(
+            self.FILES, self.SIZE // 1024),
+            [('SCons', scons),
+             ('cold, hashed ahead', cold),
+             ('warm', warm)])
+
+if __name__ == '__main__':
+    unittest.main()
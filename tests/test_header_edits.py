@@ -0,0 +1,121 @@
+# Copyright 2013 MakerBot Industries
+
+import time
+import unittest
+
+import benchmark
+import scons_env
+
+import SCons.Job
+import SCons.Node
+import SCons.Taskmaster
+import SCons.Tool
+
+import content_signatures
+
+_HEADER = '''#ifndef COMMON_H
+#define COMMON_H
+
+// Halves n
+inline int half(int n)
+{
+    return n / 2;
+}
+
+#endif
+'''
+
+class HeaderEditBenchmark(scons_env.ProjectTestCase):
+    ''' Rebuilds after editing a header that every object includes: a
+        comment, the whitespace, then the code '''
+
+    OBJECTS = 20 * benchmark.SCALE
+    # Seconds each compile takes
+    COMPILE = 0.01
+
+    def setUp(self):
+        super(HeaderEditBenchmark, self).setUp()
+        self.addCleanup(self.forget)
+        self.compiles = 0
+        self.write('common.h', _HEADER)
+        self.objects = []
+        for i in range(self.OBJECTS):
+            self.write('{}.cpp'.format(i), '#include "common.h"\n')
+
+    def forget(self):
+        content_signatures._path = None
+        content_signatures._now = None
+        content_signatures._dirty = False
+        content_signatures._signatures = None
+
+    def compile(self, target, source, env):
+        self.compiles += 1
+        time.sleep(self.COMPILE)
+        with open(target[0].abspath, 'w'):
+            pass
+
+    def declare(self):
+        for i in range(self.OBJECTS):
+            self.objects += self.env.Command(
+                '{}.o'.format(i), '{}.cpp'.format(i),
+                self.env.Action(self.compile, None),
+                CPPPATH=['.'], source_scanner=SCons.Tool.CScanner)
+        self.nodes = (self.objects +
+                      [s for o in self.objects for s in o.sources] +
+                      [self.env.File('common.h')])
+
+    def build(self):
+        ''' One SCons run, returns (seconds, objects compiled) '''
+        for node in self.nodes:
+            node.set_state(SCons.Node.no_state)
+            node.implicit = None
+            node.clear()
+        self.compiles = 0
+        taskmaster = SCons.Taskmaster.Taskmaster(self.objects)
+        seconds, result = benchmark.timed(SCons.Job.Jobs(1, taskmaster).run)
+        # What SCons does when it exits
+        self.objects[0].dir.sconsign().merge()
+        return seconds, self.compiles
+
+    def edit(self, old, new):
+        with open('common.h') as f:
+            text = f.read()
+        self.assertTrue(old in text)
+        self.write('common.h', text.replace(old, new))
+
+    def test_token_signatures(self):
+        content_signatures.setup(self.env)
+        self.declare()
+        self.assertEqual(self.build()[1], self.OBJECTS)
+        self.edit('// Halves n', '// Divides n by 2, rounding down')
+        comment, comment_compiles = self.build()
+        self.edit('    return n / 2;', '\treturn  n / 2; ')
+        whitespace, whitespace_compiles = self.build()
+        self.edit('n / 2', 'n >> 1')
+        code, code_compiles = self.build()
+        self.assertEqual(comment_compiles, 0)
+        self.assertEqual(whitespace_compiles, 0)
+        self.assertEqual(code_compiles, self.OBJECTS)
+        self.assertTrue(comment < code)
+        self.assertTrue(whitespace < code)
+        benchmark.report(
+            '--token-signatures, a header in {} objects'.format(
+                self.OBJECTS),
+            [('comment edited', comment),
+             ('whitespace edited', whitespace),
+             ('code edited', code)])
+
+    def test_byte_signatures(self):
+        # What a comment edit costs without --token-signatures
+        self.declare()
+        self.build()
+        self.edit('// Halves n', '// Divides n by 2, rounding down')
+        comment, comment_compiles = self.build()
+        self.assertEqual(comment_compiles, self.OBJECTS)
+        benchmark.report(
+            'Without --token-signatures, a header in {} objects'.format(
+                self.OBJECTS),
+            [('comment edited', comment)])
+
+if __name__ == '__main__':
+    unittest.main()
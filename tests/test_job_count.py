@@ -0,0 +1,57 @@
+# Copyright 2013 MakerBot Industries
+
+import unittest
+
+import scons_env
+
+import SCons.Script.Main
+
+import job_count
+import system_resources
+
+GIB = 1024 ** 3
+
+class ChooseTest(scons_env.ProjectTestCase):
+    def setUp(self):
+        super(ChooseTest, self).setUp()
+        for name in ['usable_cpus', 'available_memory']:
+            self.addCleanup(setattr, system_resources, name,
+                            getattr(system_resources, name))
+        self.addCleanup(setattr, job_count, '_peaks', job_count._peaks)
+
+    def choose(self, cpus, memory, peaks={}):
+        system_resources.usable_cpus = lambda: cpus
+        system_resources.available_memory = lambda: memory
+        job_count._peaks = dict(peaks)
+        return job_count.choose(self.env)[0]
+
+    def test_cpus_when_memory_is_plenty(self):
+        self.assertEqual(self.choose(8, 64 * GIB), 8)
+
+    def test_default_compile_memory(self):
+        self.assertEqual(job_count.DEFAULT_COMPILE_MEMORY, GIB)
+        self.assertEqual(self.choose(8, 5 * GIB + GIB // 2), 5)
+
+    def test_biggest_measured_compile(self):
+        peaks = {'/a.o': GIB // 2, '/b.o': 3 * GIB, '/c.o': GIB}
+        self.assertEqual(self.choose(8, 10 * GIB, peaks), 3)
+        self.assertEqual(self.choose(2, 10 * GIB, peaks), 2)
+
+    def test_at_least_one(self):
+        self.assertEqual(self.choose(8, GIB // 2), 1)
+
+    def test_unknowns(self):
+        self.assertEqual(self.choose(None, 64 * GIB), 1)
+        self.assertEqual(self.choose(6, None), 6)
+        self.assertEqual(self.choose(None, None), 1)
+
+class JobsGivenTest(unittest.TestCase):
+    def test_unknown_option_values(self):
+        # SCons' stand-in parser has none of the private settings, -j
+        # is left alone then
+        values = SCons.Script.Main.OptionsParser.values
+        self.assertFalse('__SConscript_settings__' in values.__dict__)
+        self.assertTrue(job_count._jobs_given())
+
+if __name__ == '__main__':
+    unittest.main()
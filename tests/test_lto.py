@@ -0,0 +1,41 @@
+# Copyright 2013 MakerBot Industries
+
+import unittest
+
+import scons_env
+
+import SCons.Script.Main
+import SCons.Subst
+
+import lto
+
+class JobCountTest(scons_env.ProjectTestCase):
+    def setUp(self):
+        super(JobCountTest, self).setUp()
+        self.env.AddMethod(lambda env, flag, link=False: True,
+                           'MBCompilerSupportsFlag')
+        self.env.AddMethod(lambda env: False, 'MBIsMac')
+        self.env.AddMethod(lambda env: True, 'MBIsLinux')
+        values = SCons.Script.Main.OptionsParser.values
+        self.addCleanup(values.__dict__.pop, 'num_jobs', None)
+
+    def set_jobs(self, jobs):
+        SCons.Script.Main.OptionsParser.values.num_jobs = jobs
+
+    def test_jobs_read_when_linking(self):
+        self.set_jobs(2)
+        self.assertEqual(lto.setup(self.env, 'full'), 'full')
+        self.set_jobs(8)
+        self.assertTrue('-flto=8' in self.env.subst('$LINKFLAGS').split())
+
+    def test_jobs_not_in_signature(self):
+        lto.setup(self.env, 'full')
+        signatures = []
+        for jobs in (2, 8):
+            self.set_jobs(jobs)
+            signatures.append(self.env.subst(
+                '$LINKFLAGS', SCons.Subst.SUBST_SIG))
+        self.assertEqual(signatures[0], signatures[1])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,51 @@
+# Copyright 2013 MakerBot Industries
+
+import os
+import unittest
+
+import scons_env
+
+import path_normalization
+import precompiled_headers
+import unity_build
+
+class TwoCheckoutsTest(scons_env.ProjectTestCase):
+    ''' The same project checked out in two places '''
+
+    tools = ['g++']
+
+    def signatures(self, normalize):
+        ''' The build signatures (the ones the build cache uses) of the
+            objects and compiled header of a target in a new checkout '''
+        self.new_project()
+        self.write('inc/a.h')
+        self.write('install/include/dep.h')
+        self.write('src/pch.h', '#include "a.h"\n')
+        self.write('src/a.cpp', '#include "a.h"\n#include "dep.h"\n')
+        self.write('src/b.cpp', 'int b() { return 0; }\n')
+        env = self.env
+        if normalize:
+            path_normalization._root = None
+            path_normalization.setup(env, [os.path.join(self.top, 'install')])
+        env.Append(CPPPATH=['#inc', os.path.join(self.top, 'install/include')])
+        self.in_sconscript_dir('src')
+        pch, flags = precompiled_headers.precompiled_header(
+            env, 'prog', 'pch.h')
+        sources = unity_build.unity_sources(env, 'prog', ['a.cpp', 'b.cpp'])
+        objects = env.Object(sources, CXXFLAGS=flags)
+        return [env.File(n).get_cachedir_bsig() for n in pch + objects]
+
+    def test_same_signatures(self):
+        first = self.signatures(normalize=True)
+        second = self.signatures(normalize=True)
+        self.assertEqual(first, second)
+
+    def test_different_signatures_without_normalizing(self):
+        # The -include of the compiled header wrapper, and the #includes
+        # in the wrapper and the unity files, are absolute paths
+        first = self.signatures(normalize=False)
+        second = self.signatures(normalize=False)
+        self.assertNotEqual(first, second)
+
+if __name__ == '__main__':
+    unittest.main()
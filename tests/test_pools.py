@@ -0,0 +1,157 @@
+# Copyright 2013 MakerBot Industries
+
+import unittest
+
+import scons_env
+
+import SCons.Errors
+import SCons.Script.Main
+import SCons.Taskmaster
+
+import pools
+
+class ParseTest(unittest.TestCase):
+    def test_sizes(self):
+        self.assertEqual(pools.parse([]), {})
+        self.assertEqual(pools.parse(['link:2', 'compile:16', 'link:3']),
+                         {'link': 3, 'compile': 16})
+
+    def test_bad_specs(self):
+        for spec in ['link', 'link:', ':2', 'link:0', 'link:-1', 'link:two']:
+            self.assertRaises(SCons.Errors.UserError, pools.parse, [spec])
+
+class _Attributes(object):
+    pass
+
+class _Target(object):
+    def __init__(self, pool):
+        self.attributes = _Attributes()
+        self.attributes.mb_pool = pool
+
+class _Task(object):
+    def __init__(self, name, pool=None):
+        self.name = name
+        self.targets = [_Target(pool)]
+        self.done = False
+
+    def exc_info(self):
+        return (None, None, None)
+
+    def needs_execute(self):
+        return True
+
+    def postprocess(self):
+        self.done = True
+
+class _Taskmaster(object):
+    ''' Hands out tasks in order, like SCons' would '''
+    def __init__(self, tasks):
+        self.tasks = list(tasks)
+        self.mb_limited = True
+        self.next_candidate = self.find_next_candidate
+
+    def find_next_candidate(self):
+        pass
+
+    def no_next_candidate(self):
+        pass
+
+    def next_task(self):
+        return self.tasks.pop(0) if self.tasks else None
+
+class PoolsTestCase(scons_env.ProjectTestCase):
+    def setUp(self):
+        super(PoolsTestCase, self).setUp()
+        taskmaster = SCons.Taskmaster.Taskmaster.__dict__
+        self.addCleanup(self.restore, dict(pools._sizes),
+                        taskmaster['next_task'], taskmaster['__init__'])
+        pools._sizes.clear()
+        pools._running.clear()
+
+    def restore(self, sizes, next_task, init):
+        pools._sizes.clear()
+        pools._sizes.update(sizes)
+        pools._running.clear()
+        pools._tagged.clear()
+        pools._original_next_task = None
+        pools._original_init = None
+        SCons.Taskmaster.Taskmaster.next_task = next_task
+        SCons.Taskmaster.Taskmaster.__init__ = init
+        SCons.Script.Main.OptionsParser.values.__dict__.pop('num_jobs', None)
+
+class AdmissionTest(PoolsTestCase):
+    def setUp(self):
+        super(AdmissionTest, self).setUp()
+        pools._sizes['link'] = 1
+        pools._original_next_task = _Taskmaster.next_task
+
+    def next_task(self, tm):
+        task = pools._next_task(tm)
+        return task.name if task is not None else None
+
+    def test_full_pool_holds_tasks_back(self):
+        links = [_Task('link{}'.format(i), 'link') for i in range(3)]
+        tm = _Taskmaster(links[:2] + [_Task('compile')] + links[2:])
+        self.assertEqual(self.next_task(tm), 'link0')
+        self.assertFalse(pools._has_room('link'))
+        # The other links wait, the compile doesn't
+        self.assertEqual(self.next_task(tm), 'compile')
+        self.assertEqual(self.next_task(tm), None)
+        links[0].postprocess()
+        self.assertTrue(links[0].done)
+        self.assertTrue(pools._has_room('link'))
+        self.assertEqual(self.next_task(tm), 'link1')
+        self.assertEqual(self.next_task(tm), None)
+        links[1].postprocess()
+        self.assertEqual(self.next_task(tm), 'link2')
+
+    def test_pools_without_size(self):
+        tm = _Taskmaster([_Task('doc{}'.format(i), 'doc') for i in range(3)])
+        self.assertEqual([self.next_task(tm) for i in range(3)],
+                         ['doc0', 'doc1', 'doc2'])
+
+    def test_held_tasks_fail_when_stopped(self):
+        links = [_Task('link0', 'link'), _Task('link1', 'link')]
+        tm = _Taskmaster(links)
+        self.next_task(tm)
+        self.assertEqual(self.next_task(tm), None)
+        tm.next_candidate = tm.no_next_candidate
+        task = pools._next_task(tm)
+        self.assertTrue(task is links[1])
+        self.assertRaises(SCons.Errors.BuildError, task.execute)
+
+    def test_not_limited(self):
+        links = [_Task('link0', 'link'), _Task('link1', 'link')]
+        tm = _Taskmaster(links)
+        tm.mb_limited = False
+        self.assertEqual([self.next_task(tm), self.next_task(tm)],
+                         ['link0', 'link1'])
+
+class HookTest(PoolsTestCase):
+    def set_jobs(self, jobs):
+        SCons.Script.Main.OptionsParser.values.num_jobs = jobs
+
+    def taskmaster(self):
+        return SCons.Taskmaster.Taskmaster([])
+
+    def test_hooked_for_pools_with_a_size(self):
+        pools._sizes['link'] = 2
+        pools.tag([self.env.File('doc')], 'doc')
+        self.assertEqual(pools._original_next_task, None)
+        pools.tag([self.env.File('prog')], 'link')
+        self.assertTrue(SCons.Taskmaster.Taskmaster.__dict__['next_task'] is
+                        pools._next_task)
+
+    def test_jobs_read_when_the_taskmaster_is_built(self):
+        pools._sizes['link'] = 2
+        self.set_jobs(1)
+        pools.tag([self.env.File('prog')], 'link')
+        self.assertFalse(self.taskmaster().mb_limited)
+        # Set by the SConstruct after the targets were tagged
+        self.set_jobs(8)
+        self.assertTrue(self.taskmaster().mb_limited)
+        self.set_jobs(2)
+        self.assertFalse(self.taskmaster().mb_limited)
+
+if __name__ == '__main__':
+    unittest.main()
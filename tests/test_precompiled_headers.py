@@ -0,0 +1,31 @@
+# Copyright 2013 MakerBot Industries
+
+import os
+import unittest
+
+import scons_env
+
+import precompiled_headers
+
+class PrecompiledHeaderTest(scons_env.ProjectTestCase):
+    def precompiled_header(self, sconscript_dir, shared=False):
+        self.write(sconscript_dir + '/pch.h')
+        self.in_sconscript_dir(sconscript_dir)
+        pch, flags = precompiled_headers.precompiled_header(
+            self.env, 'prog', 'pch.h', shared)
+        return pch[0].abspath
+
+    def test_same_named_targets(self):
+        a = self.precompiled_header('src/a')
+        b = self.precompiled_header('src/b')
+        self.assertNotEqual(a, b)
+        self.assertTrue(os.path.join('src', 'a', 'prog') in a)
+        self.assertTrue(os.path.join('src', 'b', 'prog') in b)
+
+    def test_shared_and_static(self):
+        static = self.precompiled_header('src')
+        shared = self.precompiled_header('src', shared=True)
+        self.assertNotEqual(static, shared)
+
+if __name__ == '__main__':
+    unittest.main()
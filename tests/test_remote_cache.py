@@ -0,0 +1,148 @@
+# Copyright 2013 MakerBot Industries
+
+import os
+import socket
+import sys
+import threading
+import time
+import unittest
+
+import scons_env
+
+try:
+    from urllib2 import HTTPError, Request, urlopen
+except ImportError:
+    from urllib.error import HTTPError
+    from urllib.request import Request, urlopen
+
+import cache_server
+import remote_cache
+import workers
+
+KEY = '0123456789abcdef0123456789abcdef'
+
+class RemoteCacheTestCase(scons_env.ProjectTestCase):
+    def setUp(self):
+        super(RemoteCacheTestCase, self).setUp()
+        self.addCleanup(self.forget)
+        self.local = os.path.join(self.top, 'local')
+        remote_cache._timeout = 1.0
+        remote_cache._upload_workers = workers.Workers(1)
+        # Giving up on the server is printed
+        self.addCleanup(setattr, sys, 'stdout', sys.stdout)
+        sys.stdout = open(os.devnull, 'w')
+        self.addCleanup(sys.stdout.close)
+
+    def forget(self):
+        remote_cache._url = None
+        remote_cache._timeout = remote_cache.DEFAULT_TIMEOUT
+        remote_cache._failures = 0
+        remote_cache._given_up = False
+        remote_cache._fetches.clear()
+        remote_cache._upload_workers = None
+        for name in remote_cache._stats:
+            remote_cache._stats[name] = 0
+
+    def cachefile(self, directory, key=KEY):
+        return os.path.join(directory, key[0].upper(), key)
+
+class RoundTripTest(RemoteCacheTestCase):
+    def setUp(self):
+        super(RoundTripTest, self).setUp()
+        self.remote = os.path.join(self.top, 'remote')
+        server = cache_server.CacheServer(
+            ('127.0.0.1', 0), self.remote, max_entry_size=1024)
+        thread = threading.Thread(target=server.serve_forever,
+                                  kwargs={'poll_interval': 0.05})
+        thread.daemon = True
+        thread.start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        remote_cache._url = 'http://127.0.0.1:{}'.format(
+            server.server_address[1])
+
+    def request(self, method, path, data=None):
+        ''' Returns (status, headers, body) '''
+        request = Request(remote_cache._url + path, data=data)
+        request.get_method = lambda: method
+        try:
+            response = urlopen(request, timeout=5)
+        except HTTPError as e:
+            return e.code, e.headers, b''
+        try:
+            return response.getcode(), response.info(), response.read()
+        finally:
+            response.close()
+
+    def test_put_get_head(self):
+        self.assertEqual(self.request('GET', '/' + KEY)[0], 404)
+        self.assertEqual(remote_cache._request('PUT', KEY, b'object'), b'')
+        self.assertEqual(remote_cache._request('GET', KEY), b'object')
+        status, headers, body = self.request('HEAD', '/' + KEY)
+        self.assertEqual((status, headers['Content-Length'], body),
+                         (200, '6', b''))
+        with open(self.cachefile(self.remote), 'rb') as f:
+            self.assertEqual(f.read(), b'object')
+
+    def test_bad_keys(self):
+        for path in ['/', '/abc', '/' + KEY + '.tmp', '/../' + KEY,
+                     '/x/' + KEY, '/' + 'g' * 32, '/' + 'a' * 65]:
+            self.assertEqual(self.request('PUT', path, b'object')[0], 400)
+            self.assertEqual(self.request('GET', path)[0], 400)
+        self.assertFalse(os.path.exists(self.remote))
+
+    def test_entry_too_big(self):
+        self.assertEqual(self.request('PUT', '/' + KEY, b'x' * 2048)[0], 413)
+
+    def test_upload_then_fetch(self):
+        pushed = self.cachefile(self.local)
+        self.write(pushed, 'object')
+        remote_cache.upload(pushed)
+        self.assertTrue(remote_cache._upload_workers.wait(5))
+        os.remove(pushed)
+        remote_cache.fetch(pushed)
+        with open(pushed, 'rb') as f:
+            self.assertEqual(f.read(), b'object')
+        self.assertEqual(remote_cache._stats['uploads'], 1)
+        self.assertEqual(remote_cache._stats['downloads'], 1)
+
+    def test_fetch_miss(self):
+        remote_cache.fetch(self.cachefile(self.local))
+        self.assertFalse(os.path.exists(self.cachefile(self.local)))
+        self.assertEqual(remote_cache._stats['errors'], 0)
+
+class ServerDownTest(RemoteCacheTestCase):
+    def fetch_all(self, count):
+        ''' Fetch count entries, returns the seconds it took '''
+        start = time.time()
+        for i in range(count):
+            remote_cache.fetch(self.cachefile(self.local, KEY[:-1] + str(i)))
+        return time.time() - start
+
+    def test_nothing_listening(self):
+        s = socket.socket()
+        s.bind(('127.0.0.1', 0))
+        remote_cache._url = 'http://127.0.0.1:{}'.format(s.getsockname()[1])
+        s.close()
+        self.fetch_all(5)
+        self.assertFalse(os.path.exists(self.local))
+        self.assertTrue(remote_cache._given_up)
+        self.assertEqual(remote_cache._stats['errors'],
+                         remote_cache.MAX_FAILURES)
+
+    def test_not_answering(self):
+        # Accepts connections, never replies
+        s = socket.socket()
+        self.addCleanup(s.close)
+        s.bind(('127.0.0.1', 0))
+        s.listen(16)
+        remote_cache._url = 'http://127.0.0.1:{}'.format(s.getsockname()[1])
+        remote_cache._timeout = 0.2
+        seconds = self.fetch_all(5)
+        self.assertFalse(os.path.exists(self.local))
+        self.assertTrue(remote_cache._given_up)
+        # Only the requests before giving up waited
+        self.assertTrue(seconds < 0.2 * remote_cache.MAX_FAILURES + 1.0)
+
+if __name__ == '__main__':
+    unittest.main()
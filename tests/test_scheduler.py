@@ -0,0 +1,89 @@
+# Copyright 2013 MakerBot Industries
+
+import unittest
+
+import benchmark
+import scons_env
+import synthetic_graph
+
+import scheduler
+
+class SchedulerTestCase(scons_env.ProjectTestCase):
+    def setUp(self):
+        super(SchedulerTestCase, self).setUp()
+        self.addCleanup(self.forget)
+
+    def forget(self):
+        scheduler._durations = None
+        scheduler._estimates.clear()
+        scheduler._chains.clear()
+        scheduler._default_estimate = 0.0
+
+class OrderTest(SchedulerTestCase):
+    def command(self, target, sources=[], seconds=None):
+        node = self.env.Command(target, sources, 'build')
+        if seconds is not None:
+            self.durations[node[0].abspath] = seconds
+        return node[0]
+
+    def order(self, nodes):
+        synthetic_graph.duration_order(self.durations)
+        return [str(n) for n in scheduler._order(nodes)]
+
+    def setUp(self):
+        super(OrderTest, self).setUp()
+        self.durations = {}
+
+    def test_chain(self):
+        a = self.command('a.o', seconds=1.0)
+        b = self.command('b.o', seconds=3.0)
+        lib = self.command('lib.a', [a, b], seconds=0.5)
+        synthetic_graph.duration_order(self.durations)
+        self.assertEqual(scheduler.chain(a), 1.0)
+        self.assertEqual(scheduler.chain(lib), 3.5)
+        # Sources don't take any time
+        self.assertEqual(scheduler.chain(self.env.File('a.cpp')), 0.0)
+
+    def test_longest_chain_popped_first(self):
+        quick = self.command('quick.a', [self.command('q.o', seconds=1.0)],
+                             seconds=1.0)
+        slow = self.command('slow.a', [self.command('s.o', seconds=5.0)],
+                            seconds=0.1)
+        medium = self.command('medium.o', seconds=3.0)
+        # The Taskmaster pops from the end
+        self.assertEqual(self.order([slow, quick, medium]),
+                         ['quick.a', 'medium.o', 'slow.a'])
+
+    def test_ties_keep_their_order(self):
+        nodes = [self.command(name, seconds=1.0)
+                 for name in ['c.o', 'a.o', 'b.o']]
+        self.assertEqual(self.order(nodes), ['c.o', 'a.o', 'b.o'])
+        # Nothing recorded weighs the same too
+        self.durations = {}
+        nodes = [self.command(name) for name in ['f.o', 'd.o', 'e.o']]
+        self.assertEqual(self.order(nodes), ['f.o', 'd.o', 'e.o'])
+
+    def test_estimates(self):
+        self.command('a.o', seconds=2.0)
+        self.command('b.o', seconds=4.0)
+        self.command('lib.a', seconds=1.0)
+        new_object = self.command('new.o')
+        new_library = self.command('new.a')
+        new_other = self.command('new.txt')
+        synthetic_graph.duration_order(self.durations)
+        self.assertEqual(scheduler.chain(new_object), 4.0)
+        self.assertEqual(scheduler.chain(new_library), 1.0)
+        self.assertEqual(scheduler.chain(new_other), 2.0)
+
+class DurationOrderBenchmark(SchedulerTestCase):
+    ''' The synthetic graph at -j 4, see synthetic_graph.py '''
+
+    def test_slow_library_started_first(self):
+        unordered, ordered = synthetic_graph.time_builds(
+            4, scale=benchmark.SCALE)
+        self.assertTrue(ordered < unordered)
+        benchmark.report('Synthetic graph at -j 4', [
+            ('SConscript order', unordered), ('--duration-order', ordered)])
+
+if __name__ == '__main__':
+    unittest.main()
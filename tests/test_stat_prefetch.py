@@ -0,0 +1,152 @@
+# Copyright 2013 MakerBot Industries
+
+import os
+import time
+import unittest
+
+import benchmark
+import scons_env
+
+import SCons.Defaults
+import SCons.Node
+import SCons.Node.FS
+import SCons.Taskmaster
+
+import stat_prefetch
+import workers
+
+class StatFilesTest(scons_env.ProjectTestCase):
+    def setUp(self):
+        super(StatFilesTest, self).setUp()
+        self.addCleanup(setattr, stat_prefetch, '_workers',
+                        stat_prefetch._workers)
+        self.addCleanup(setattr, stat_prefetch, '_stats', stat_prefetch._stats)
+        stat_prefetch._workers = workers.Workers(2)
+        stat_prefetch._stats = {}
+
+    def path(self, name):
+        return os.path.join(self.top, name)
+
+    def test_stats(self):
+        self.write('there')
+        stat_prefetch._stat_files([self.path('there'), self.path('missing')])
+        self.assertEqual(stat_prefetch._stats[self.path('there')].st_ino,
+                         os.stat(self.path('there')).st_ino)
+        self.assertEqual(stat_prefetch._stats[self.path('missing')], None)
+
+    def test_other_errors_are_left_to_scons(self):
+        os.symlink('loop', self.path('loop'))
+        paths = [self.path('loop'), self.path('nul\0')]
+        stat_prefetch._stat_files(paths)
+        for path in paths:
+            self.assertFalse(path in stat_prefetch._stats)
+
+class EnabledTestCase(scons_env.ProjectTestCase):
+    def setUp(self):
+        super(EnabledTestCase, self).setUp()
+        self.addCleanup(self.restore,
+                        SCons.Taskmaster.Taskmaster.__dict__['__init__'],
+                        SCons.Node.FS.LocalFS.__dict__['stat'],
+                        SCons.Node.Node.__dict__['prepare'])
+        stat_prefetch.enable()
+
+    def restore(self, init, stat, prepare):
+        SCons.Taskmaster.Taskmaster.__init__ = init
+        SCons.Node.FS.LocalFS.stat = stat
+        SCons.Node.Node.prepare = prepare
+        stat_prefetch._workers = None
+        stat_prefetch._original_init = None
+        stat_prefetch._original_fs_stat = None
+        stat_prefetch._original_prepare = None
+        stat_prefetch._prefetched = False
+        stat_prefetch._stats.clear()
+
+class HookTest(EnabledTestCase):
+    def test_prefetched_stat_is_served(self):
+        self.write('a.cpp', 'int a;\n')
+        node = self.env.File('a.cpp')
+        stat_prefetch.prefetch([node])
+        self.write('a.cpp', 'int a, b;\n')
+        # SCons forgets what it found
+        node.clear_memoized_values()
+        self.assertEqual(node.stat().st_size, len('int a;\n'))
+
+    def test_missing_file_is_remembered(self):
+        node = self.env.File('a.h')
+        stat_prefetch.prefetch([node])
+        self.write('a.h')
+        node.clear_memoized_values()
+        self.assertEqual(node.stat(), None)
+
+    def test_target_is_dropped_on_prepare(self):
+        self.write('a.in', 'a\n')
+        self.write('a.out', 'old\n')
+        target = self.env.Command('a.out', 'a.in',
+                                  SCons.Defaults.Copy('$TARGET', '$SOURCE'))[0]
+        stat_prefetch.prefetch([target])
+        self.assertTrue(target.abspath in stat_prefetch._stats)
+        target.prepare()
+        self.assertFalse(target.abspath in stat_prefetch._stats)
+
+    def test_unknown_paths_go_to_the_file_system(self):
+        self.write('a.cpp')
+        self.assertTrue(self.env.File('a.cpp').stat() is not None)
+        self.assertEqual(stat_prefetch._stats, {})
+
+class SlowFileSystemBenchmark(EnabledTestCase):
+    ''' Stats of every file of a generated tree on a file system where
+        every call waits DELAY seconds, one at a time like SCons and
+        prefetched '''
+
+    DIRS = 10
+    FILES = 10 * benchmark.SCALE
+    DELAY = 0.002
+
+    def setUp(self):
+        super(SlowFileSystemBenchmark, self).setUp()
+        self.nodes = []
+        for d in range(self.DIRS):
+            for f in range(self.FILES):
+                path = 'src/{}/{}.cpp'.format(d, f)
+                self.write(path)
+                self.nodes.append(self.env.File(path))
+        self.calls = []
+        self.slow_down('stat')
+        self.slow_down('listdir')
+
+    def slow_down(self, name):
+        ''' Make os.<name> wait like a round trip to a file server '''
+        original = getattr(os, name)
+        def slow(path):
+            self.calls.append(path)
+            time.sleep(self.DELAY)
+            return original(path)
+        setattr(os, name, slow)
+        self.addCleanup(setattr, os, name, original)
+
+    def stat_all(self):
+        ''' Returns (seconds, calls) to stat every file '''
+        for node in self.nodes:
+            node.clear_memoized_values()
+        del self.calls[:]
+        seconds, stats = benchmark.timed(
+            lambda: [node.stat() for node in self.nodes])
+        self.assertTrue(None not in stats)
+        return seconds, len(self.calls)
+
+    def test_serial_and_prefetched(self):
+        serial, serial_calls = self.stat_all()
+        prefetch, result = benchmark.timed(SCons.Taskmaster.Taskmaster, [])
+        prefetched, prefetched_calls = self.stat_all()
+        self.assertEqual(serial_calls, len(self.nodes))
+        self.assertEqual(prefetched_calls, 0)
+        self.assertTrue(prefetch < serial)
+        benchmark.report(
+            '--stat-prefetch, {} files, {:.0f}ms per call'.format(
+                len(self.nodes), self.DELAY * 1000),
+            [('one at a time', serial),
+             ('prefetch', prefetch),
+             ('after the prefetch', prefetched)])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,93 @@
+# Copyright 2013 MakerBot Industries
+
+import os
+import stat
+import unittest
+
+import scons_env
+
+import SCons.Subst
+
+import persistent
+import toolchain
+
+class FingerprintTest(scons_env.ProjectTestCase):
+    def setUp(self):
+        super(FingerprintTest, self).setUp()
+        self.addCleanup(self.forget)
+        self.bin = os.path.join(self.top, 'bin')
+        self.env['ENV']['PATH'] = self.bin + os.pathsep + '/bin:/usr/bin'
+        self.env['CXX'] = 'mbcxx'
+        for variable, commands in toolchain.COMMANDS.items():
+            for command in commands:
+                self.env[command] = '${} -o $TARGET -c $SOURCES'.format(
+                    variable)
+        self.install_compiler('1.0', mtime=1000000000)
+        toolchain.setup(self.env)
+
+    def forget(self):
+        ''' Drop what this run learned without saving it '''
+        toolchain._programs = None
+        toolchain._path = None
+        toolchain._dirty = False
+        toolchain._fingerprints.clear()
+
+    def new_run(self):
+        toolchain._save()
+        self.forget()
+
+    def install_compiler(self, version, mtime):
+        self.write('bin/mbcxx', '#!/bin/sh\necho mbcxx {}\n'.format(version))
+        path = os.path.join(self.bin, 'mbcxx')
+        os.chmod(path, os.stat(path).st_mode | stat.S_IXUSR)
+        os.utime(path, (mtime, mtime))
+
+    def command(self, mode):
+        return self.env.subst('$CXXCOM', mode, target=self.env.File('a.o'),
+                              source=self.env.File('a.cpp'))
+
+    def fingerprint(self):
+        return toolchain.fingerprint(self.env, 'mbcxx')
+
+    def test_only_in_signatures(self):
+        fingerprint = self.fingerprint()
+        self.assertTrue(fingerprint)
+        # The command line that is run and printed
+        self.assertEqual(self.command(SCons.Subst.SUBST_CMD).split(),
+                         ['mbcxx', '-o', 'a.o', '-c', 'a.cpp'])
+        # The one the target's signature is computed from
+        self.assertEqual(self.command(SCons.Subst.SUBST_SIG).split(),
+                         ['mbcxx', '-o', 'a.o', '-c', 'a.cpp', fingerprint])
+
+    def test_changed_binary(self):
+        before = self.fingerprint()
+        self.new_run()
+        # The same size, a new mtime
+        self.install_compiler('1.1', mtime=1000000001)
+        self.assertNotEqual(self.fingerprint(), before)
+
+    def test_touched_binary(self):
+        before = self.fingerprint()
+        self.new_run()
+        self.install_compiler('1.0', mtime=1000000001)
+        self.assertEqual(self.fingerprint(), before)
+
+    def test_read_from_the_cache(self):
+        self.fingerprint()
+        self.new_run()
+        # Only the cache knows this one
+        path = persistent.cache_path(self.env, toolchain.NAME)
+        programs = persistent.load(path, None)
+        program = os.path.join(self.bin, 'mbcxx')
+        self.assertEqual(list(programs), [program])
+        programs[program] = (programs[program][0], 'cached')
+        persistent.save(path, programs)
+        self.assertEqual(toolchain._program_fingerprint(self.env, program),
+                         'cached')
+        # Until the binary changes
+        self.install_compiler('1.1', mtime=1000000001)
+        self.assertNotEqual(
+            toolchain._program_fingerprint(self.env, program), 'cached')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,32 @@
+# Copyright 2013 MakerBot Industries
+
+import os
+import unittest
+
+import scons_env
+
+import unity_build
+
+class UnitySourcesTest(scons_env.ProjectTestCase):
+    def unity_sources(self, sconscript_dir, shared=False):
+        for name in ('main.cpp', 'x.cpp'):
+            self.write(os.path.join(sconscript_dir, name))
+        self.in_sconscript_dir(sconscript_dir)
+        return [n.abspath for n in unity_build.unity_sources(
+            self.env, 'prog', ['main.cpp', 'x.cpp'], shared=shared)]
+
+    def test_same_named_targets(self):
+        a = self.unity_sources('src/a')
+        b = self.unity_sources('src/b')
+        self.assertEqual(len(a), 1)
+        self.assertEqual(len(b), 1)
+        self.assertTrue(os.path.join('src', 'a', 'prog') in a[0])
+        self.assertTrue(os.path.join('src', 'b', 'prog') in b[0])
+
+    def test_shared_and_static(self):
+        static = self.unity_sources('src')
+        shared = self.unity_sources('src', shared=True)
+        self.assertNotEqual(static, shared)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,52 @@
+# Copyright 2013 MakerBot Industries
+
+import os
+import sys
+import threading
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import workers
+
+def _square(n):
+    return n * n
+
+def _fail_on_odd(n):
+    if n % 2:
+        raise ValueError(n)
+    return n
+
+class WorkersTest(unittest.TestCase):
+    def test_map(self):
+        pool = workers.Workers(3)
+        self.assertEqual(pool.map(_square, list(range(10))),
+                         [n * n for n in range(10)])
+        self.assertEqual(pool.map(_square, []), [])
+
+    def test_map_raises_on_the_calling_thread(self):
+        pool = workers.Workers(2)
+        self.assertRaises(ValueError, pool.map, _fail_on_odd, [0, 1, 2, 3])
+
+    def test_failing_jobs_keep_their_threads(self):
+        pool = workers.Workers(1)
+        for i in range(3):
+            self.assertRaises(ValueError, pool.map, _fail_on_odd, [1])
+        self.assertEqual(pool.map(_square, [2, 3]), [4, 9])
+
+    def test_failing_put_keeps_its_thread(self):
+        pool = workers.Workers(1)
+        ran = threading.Event()
+        stderr = sys.stderr
+        sys.stderr = open(os.devnull, 'w')
+        try:
+            pool.put(_fail_on_odd, 1)
+            pool.put(ran.set)
+            self.assertTrue(pool.wait(10))
+        finally:
+            sys.stderr.close()
+            sys.stderr = stderr
+        self.assertTrue(ran.is_set())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,148 @@
+# Copyright 2013 MakerBot Industries
+
+import atexit
+import hashlib
+import os
+import subprocess
+import threading
+
+import SCons.Util
+
+import persistent
+
+'''
+Folds a fingerprint of the toolchain into the signatures of the actions
+that run it, so upgrading g++ or Qt rebuilds exactly what they built.
+
+The commands that run a program get a $MB_TOOLCHAIN_<variable> word, where
+<variable> is the construction variable naming the program ($CXX, $QT5_MOC,
+...). It expands to nothing in the command that runs, and to the
+fingerprint of the program in the command's signature. Shared libraries
+depend on a Value of the linker's fingerprint instead, see
+depend_on_linker.
+
+A program's fingerprint is a hash of its binary and of its --version
+output. Both are kept in the project's .mb_cache keyed on the size and
+mtime of the binary, so they're only computed again when it changes.
+'''
+
+NAME = 'toolchain'
+
+PREFIX = 'MB_TOOLCHAIN_'
+
+# program variable -> the commands that run it
+COMMANDS = {
+    'CC': ['CCCOM'],
+    'SHCC': ['SHCCCOM'],
+    'CXX': ['CXXCOM'],
+    'SHCXX': ['SHCXXCOM'],
+    'LINK': ['LINKCOM'],
+    'SHLINK': ['SHLINKCOM'],
+}
+
+# The qt5 tool's commands have the $MB_TOOLCHAIN_ words already
+QT_PROGRAMS = ['QT5_MOC', 'QT5_UIC', 'QT5_RCC', 'QT5_LUPDATE', 'QT5_LRELEASE']
+
+_lock = threading.Lock()
+# realpath -> ((size, mtime), fingerprint)
+_programs = None
+_path = None
+_dirty = False
+# (command words, PATH) -> fingerprint of the command
+_fingerprints = {}
+
+def _load(env):
+    global _programs, _path
+    if _programs is None:
+        _path = persistent.cache_path(env, NAME)
+        _programs = persistent.load(_path, {})
+        atexit.register(_save)
+    return _programs
+
+def _save():
+    if _dirty:
+        with _lock:
+            persistent.save(_path, _programs)
+
+def _version(env, path):
+    try:
+        process = subprocess.Popen(
+            [path, '--version'],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            env=dict((str(k), str(v)) for k, v in env['ENV'].items()))
+    except OSError:
+        return b''
+    return process.communicate()[0]
+
+def _program_fingerprint(env, path):
+    global _dirty
+    st = os.stat(path)
+    stamp = (st.st_size, st.st_mtime)
+    programs = _load(env)
+    cached = programs.get(path)
+    if cached is not None and cached[0] == stamp:
+        return cached[1]
+    md5 = hashlib.md5()
+    with open(path, 'rb') as program:
+        for block in iter(lambda: program.read(1024 * 1024), b''):
+            md5.update(block)
+    md5.update(_version(env, path))
+    result = md5.hexdigest()
+    with _lock:
+        programs[path] = (stamp, result)
+        _dirty = True
+    return result
+
+def fingerprint(env, command):
+    ''' Identifies the programs in command, '' if there are none '''
+    words = [w.strip('"') for w in SCons.Util.CLVar(command)]
+    key = (tuple(words), env['ENV'].get('PATH'))
+    try:
+        return _fingerprints[key]
+    except KeyError:
+        pass
+    parts = []
+    for word in words:
+        path = env.WhereIs(word)
+        if path is None:
+            continue
+        path = os.path.realpath(path)
+        parts.append(_program_fingerprint(env, path))
+    result = (hashlib.md5(' '.join(parts).encode('ascii')).hexdigest()
+              if parts else '')
+    _fingerprints[key] = result
+    return result
+
+class _Fingerprint(object):
+    ''' The fingerprint of the program in variable, in signatures only '''
+    def __init__(self, variable):
+        self.variable = variable
+
+    def __call__(self, target, source, env, for_signature):
+        if not for_signature:
+            return ''
+        return fingerprint(
+            env, env.subst('$' + self.variable, target=target, source=source))
+
+def depend_on_linker(env, library):
+    ''' SCons links shared libraries with a python function, so neither
+        $SHLINKCOM nor its fingerprint is in their signature. This makes
+        library depend on the linker's fingerprint instead. '''
+    for node in library:
+        build_env = node.get_build_env()
+        command = build_env.subst('$SHLINK', target=node, source=node.sources)
+        env.Depends(node, env.Value(fingerprint(build_env, command)))
+
+def setup(env):
+    ''' Rebuild what env builds when its compilers, linkers or Qt tools
+        change '''
+    for variable, commands in COMMANDS.items():
+        env[PREFIX + variable] = _Fingerprint(variable)
+        word = '$' + PREFIX + variable
+        for command in commands:
+            if word not in env[command]:
+                env[command] = env[command] + ' ' + word
+    for variable in QT_PROGRAMS:
+        env[PREFIX + variable] = _Fingerprint(variable)
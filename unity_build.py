@@ -0,0 +1,124 @@
+# Copyright 2013 MakerBot Industries
+
+import fnmatch
+import hashlib
+import os
+
+import SCons.Action
+import SCons.Builder
+import SCons.Util
+
+import path_normalization
+
+'''
+Unity (jumbo) builds for MBProgram, MBSharedLibrary and MBStaticLibrary.
+
+A target's C++ sources are grouped into generated files that just #include
+a batch of them, so the headers they share are parsed once per batch
+instead of once per source. Moc outputs (from MBGetMocFiles) get batches of
+their own.
+
+A source's batch is picked by hashing its path, out of a power of two
+number of batches. Adding or removing a file only changes the batch it
+lands in, except when the number of batches doubles or halves. Even then
+every batch splits into (or merges from) exactly two others.
+'''
+
+# Sources that can be batched. Objective-C++ is left alone.
+CXX_SUFFIXES = ['.cpp', '.cc', '.cxx', '.c++', '.C']
+
+DEFAULT_BATCH_SIZE = 8
+
+_HEADER_SUFFIXES = ['.h', '.hpp', '.hh', '.hxx']
+
+def _write_unity_file(target, source, env):
+    with open(str(target[0]), 'w') as unity_file:
+        unity_file.write('// Generated unity build file, do not edit\n')
+        for path in source[0].read():
+            unity_file.write('#include "{}"\n'.format(path))
+
+_unity_builder = SCons.Builder.Builder(
+    action=SCons.Action.Action(_write_unity_file, None))
+
+def _excluded(node, exclude):
+    return any(fnmatch.fnmatch(node.name, e) or fnmatch.fnmatch(node.path, e)
+               for e in exclude)
+
+def _mentions_q_object(node):
+    ''' Whether the Qt automoc emitter might need to see this source '''
+    base = os.path.splitext(node.srcnode().abspath)[0]
+    for path in [node.srcnode().abspath] + [base + s for s in _HEADER_SUFFIXES]:
+        try:
+            with open(path, 'r') as f:
+                if 'Q_OBJECT' in f.read():
+                    return True
+        except IOError:
+            pass
+    return False
+
+def _is_moc_output(node):
+    return node.has_builder() and node.name.startswith('moc_')
+
+def _batch_index(node, batches):
+    digest = hashlib.md5(node.path.encode('utf-8')).hexdigest()
+    return int(digest, 16) % batches
+
+def _batch_count(sources, batch_size):
+    count = 1
+    while count * batch_size < len(sources):
+        count *= 2
+    return count
+
+def _batch(env, directory, group, sources, batch_size):
+    ''' Returns unity files (or lone sources) covering sources '''
+    if len(sources) < 2:
+        return sources
+    count = _batch_count(sources, batch_size)
+    batches = [[] for i in range(count)]
+    for source in sources:
+        batches[_batch_index(source, count)].append(source)
+    result = []
+    for i, batch in enumerate(batches):
+        if len(batch) == 0:
+            continue
+        if len(batch) == 1:
+            # No point in a unity file for a single source
+            result.extend(batch)
+            continue
+        batch.sort(key=lambda n: n.path)
+        unity_file = _unity_builder(
+            env,
+            os.path.join(directory, 'unity_{}_{}.cpp'.format(group, i)),
+            env.Value([path_normalization.include_path(
+                env, n.abspath, env.Dir(directory).abspath) for n in batch]))
+        result.extend(unity_file)
+    return result
+
+def unity_sources(env, target, sources, exclude=[], shared=False,
+                  batch_size=DEFAULT_BATCH_SIZE):
+    ''' Replace the C++ files in sources with unity files including them
+
+        Anything that isn't a C++ source or matches one of the globs in
+        exclude (by file name or path) is passed through unchanged. '''
+    automoc = (env.get('QT5_AUTOSCAN') and
+               int(env.subst('$QT5_AUTOSCAN')) != 0)
+    sources = env.arg2nodes(SCons.Util.flatten(sources), env.fs.File)
+    groups = {'src': [], 'moc': []}
+    others = []
+    for source in sources:
+        if (os.path.splitext(source.name)[1] not in CXX_SUFFIXES or
+                _excluded(source, exclude)):
+            others.append(source)
+        elif _is_moc_output(source):
+            groups['moc'].append(source)
+        elif automoc and _mentions_q_object(source):
+            # The automoc emitter looks for Q_OBJECT through the sources
+            # of each object, it wouldn't see through a unity file
+            others.append(source)
+        else:
+            groups['src'].append(source)
+    directory = env.MBGeneratedDir('unity', target, shared)
+    result = []
+    for group in sorted(groups):
+        result.extend(_batch(env, directory, group, groups[group], batch_size))
+    return result + others
@@ -591,6 +591,7 @@ def _run_msbuild_method(env, target, source, additional_properties=None):
     #import pdb
     #pdb.set_trace()
     result = env.Command(target, source, ' '.join(command))
+    env.MBSetPool(result, 'msbuild')
 
     return result
 
@@ -0,0 +1,80 @@
+# Copyright 2013 MakerBot Industries
+
+import threading
+import time
+import traceback
+
+try:
+    import Queue as queue
+except ImportError:
+    import queue
+
+'''
+A small thread pool for the MB tools' background work (downloads,
+uploads, hashing), which python 2 has no standard one for.
+
+A job that raises doesn't take its thread down with it. The exception of
+a job given to put is printed, the first one of the jobs of a map is
+raised again by map.
+'''
+
+class Workers(object):
+    ''' Threads that call the functions put in a queue '''
+    def __init__(self, count):
+        self.queue = queue.Queue()
+        for i in range(count):
+            thread = threading.Thread(target=self._run)
+            thread.daemon = True
+            thread.start()
+
+    def _run(self):
+        while True:
+            function, args = self.queue.get()
+            try:
+                function(*args)
+            except Exception:
+                traceback.print_exc()
+            finally:
+                self.queue.task_done()
+
+    def put(self, function, *args):
+        self.queue.put((function, args))
+
+    def map(self, function, items):
+        ''' function of every one of items, worked out by the threads
+
+            If function raises for any of them, the first exception is
+            raised here once all of them are done. '''
+        results = [None] * len(items)
+        if not results:
+            return results
+        lock = threading.Lock()
+        done = threading.Event()
+        remaining = [len(items)]
+        errors = []
+        def run(index, item):
+            try:
+                results[index] = function(item)
+            except Exception as e:
+                with lock:
+                    errors.append(e)
+            finally:
+                with lock:
+                    remaining[0] -= 1
+                    if not remaining[0]:
+                        done.set()
+        for index, item in enumerate(items):
+            self.put(run, index, item)
+        done.wait()
+        if errors:
+            raise errors[0]
+        return results
+
+    def wait(self, seconds):
+        ''' Returns False if the work didn't finish in time '''
+        deadline = time.time() + seconds
+        while self.queue.unfinished_tasks:
+            if time.time() > deadline:
+                return False
+            time.sleep(0.1)
+        return True